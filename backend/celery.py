@@ -1,10 +1,24 @@
 # backend/celery.py
+import logging
 import os
+import time
+from pathlib import Path
+
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_init, worker_ready, worker_shutdown
+from decouple import config
 
 # 1. Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# Keep numba's compiled librosa kernels in a directory that survives worker
+# restarts. This must be set before numba is first imported, so it is read
+# here rather than from Django settings.
+os.environ.setdefault(
+    'NUMBA_CACHE_DIR',
+    config('NUMBA_CACHE_DIR', default=str(Path(__file__).resolve().parent.parent / '.numba_cache')),
+)
+
 app = Celery('backend')
 
 # 2. Read broker & backend URLs from Django settings (using decouple in settings.py).
@@ -16,4 +30,79 @@ app.autodiscover_tasks()
 # Optional: define a debug task
 @app.task(bind=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}')
\ No newline at end of file
+    print(f'Request: {self.request!r}')
+
+
+# 4. Feature extraction warm-up
+logger = logging.getLogger('music')
+
+EXTRACTION_TASKS = {
+    'music.tasks.extract_features_task',
+    'music.tasks.extract_features_batch_task',
+}
+
+extraction_timings = {
+    'warmup_seconds': None,
+    'first_task_seconds': None,
+}
+_task_started = {}
+
+
+@worker_init.connect
+def warm_up_feature_extraction(**kwargs):
+    """
+    Compile the extraction path in the main worker process, before the pool
+    forks, so every child (including recycled ones) starts warm.
+    """
+    if not config('CELERY_WORKER_WARMUP', default=True, cast=bool):
+        return
+    from music.utils.feature_extraction import warm_up
+    extraction_timings['warmup_seconds'] = warm_up()
+
+
+@worker_ready.connect
+def report_warm_up(**kwargs):
+    if extraction_timings['warmup_seconds'] is not None:
+        logger.info(
+            f"Feature extraction warm-up took {extraction_timings['warmup_seconds']:.2f}s "
+            f"(NUMBA_CACHE_DIR={os.environ['NUMBA_CACHE_DIR']})"
+        )
+
+
+@task_prerun.connect
+def time_extraction_start(task_id=None, task=None, **kwargs):
+    if task is not None and task.name in EXTRACTION_TASKS:
+        _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def time_extraction_end(task_id=None, task=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is None or extraction_timings['first_task_seconds'] is not None:
+        return
+    extraction_timings['first_task_seconds'] = time.perf_counter() - started
+    warmup = extraction_timings['warmup_seconds']
+    logger.info(
+        f"First {task.name} in process {os.getpid()} took "
+        f"{extraction_timings['first_task_seconds']:.2f}s "
+        f"(warm-up: {'disabled' if warmup is None else f'{warmup:.2f}s'})"
+    )
+
+
+# 5. Buffered listening history
+@worker_shutdown.connect
+def drain_listen_buffer(**kwargs):
+    """
+    Write what is left in the listen buffer before the worker exits, so a
+    deploy doesn't leave plays waiting for the next scheduled drain.
+    """
+    from django.conf import settings
+    if settings.LISTENING_HISTORY_MODE != 'buffered':
+        return
+    from music import play_buffer
+    try:
+        written = play_buffer.drain()
+    except Exception as exc:
+        logger.warning(f"Could not drain the listen buffer at shutdown: {exc}")
+        return
+    logger.info(f"Drained {written} buffered plays at shutdown.")
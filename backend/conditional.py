@@ -0,0 +1,99 @@
+# backend/conditional.py
+
+import hashlib
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+def validator_headers(etag, last_modified=None):
+    headers = {'ETag': etag}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return headers
+
+
+def conditional_response(request, headers):
+    """
+    The 304 (or 412) answer to ``request``'s If-None-Match/If-Modified-Since
+    conditions given the validators in ``headers``, or None to respond in full.
+    """
+    last_modified = parse_http_date_safe(headers['Last-Modified']) if 'Last-Modified' in headers else None
+    response = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+    if response is not None and response.status_code == 304:
+        for name, value in headers.items():
+            response[name] = value
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified on ``list`` and ``retrieve``, derived from version
+    data the view reads without serializing anything, so an unchanged
+    resource costs one query and a 304.
+
+    By default versions come from ``version_field``, a modification time
+    set on every change: the row count and latest value for lists, the
+    row's value for details. Views whose responses depend on more override
+    ``list_version`` and ``object_version``. Object permissions aren't
+    checked before a 304; don't use this on views that have them for safe
+    methods.
+
+    Lists only get an ETag: deleting any row but the newest leaves the
+    latest modification time as it was, so it can't be a Last-Modified.
+    """
+    version_field = None
+
+    def list_version(self, queryset):
+        """
+        The ETag parts of the filtered list ``queryset``; they must change
+        whenever any page of the list does.
+        """
+        summary = queryset.order_by().aggregate(count=Count('pk'), last_modified=Max(self.version_field))
+        return summary['count'], summary['last_modified']
+
+    def object_version(self, queryset):
+        """
+        ``(parts, last_modified)`` for the object in ``queryset``, or None
+        if there is none. ``last_modified`` may be None for objects whose
+        content can change without any stored time moving forward.
+        """
+        last_modified = queryset.values_list(self.version_field, flat=True).first()
+        return None if last_modified is None else ((last_modified,), last_modified)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional((self.list_version(queryset), None), super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+            version = self.object_version(queryset)
+        except (TypeError, ValueError, DjangoValidationError):
+            # A malformed id; retrieve answers 404
+            version = None
+        return self._conditional(version, super().retrieve, request, *args, **kwargs)
+
+    def get_etag(self, request, parts):
+        user = request.user.pk if request.user.is_authenticated else None
+        query = sorted(request.query_params.lists())
+        source = repr((type(self).__name__, self.action, user, request.accepted_renderer.format, query, parts))
+        return f'"{hashlib.md5(source.encode()).hexdigest()}"'
+
+    def _conditional(self, version, build, request, *args, **kwargs):
+        if version is None:
+            return build(request, *args, **kwargs)
+        parts, last_modified = version
+        headers = validator_headers(self.get_etag(request, parts), last_modified)
+        response = conditional_response(request, headers)
+        if response is None:
+            response = build(request, *args, **kwargs)
+            if response.status_code == 200:
+                for name, value in headers.items():
+                    response[name] = value
+        return response
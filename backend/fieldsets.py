@@ -0,0 +1,74 @@
+# backend/fieldsets.py
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=a,b`` keeps only those fields of the view's serializer and
+    ``?omit=c,d`` drops some, on reads. Whatever the selection, the queryset
+    is narrowed with ``.only()`` to the columns the kept fields read, as
+    long as each of them maps onto a column of the model; otherwise it is
+    left alone.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def _requested(self, param, available):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = names - set(available)
+        if unknown:
+            raise ValidationError({
+                param: f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(available)}."
+            })
+        return names
+
+    def get_sparse_fields(self, fields):
+        """
+        Names of the serializer ``fields`` this request keeps, in order.
+        """
+        available = list(fields)
+        if self.request.method not in ('GET', 'HEAD'):
+            return available
+        keep = self._requested(self.fields_query_param, available)
+        omit = self._requested(self.omit_query_param, available) or set()
+        return [name for name in available if (keep is None or name in keep) and name not in omit]
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        target = getattr(serializer, 'child', serializer)
+        kept = set(self.get_sparse_fields(target.fields))
+        for name in list(target.fields):
+            if name not in kept:
+                target.fields.pop(name)
+        return serializer
+
+    def _only_columns(self, model):
+        fields = self.get_serializer_class()(context=self.get_serializer_context()).fields
+        columns = {model._meta.pk.name}
+        for name in self.get_sparse_fields(fields):
+            source = fields[name].source
+            try:
+                field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                # Properties, method fields, dotted sources: can't tell what they read
+                return None
+            if not field.concrete or field.many_to_many:
+                return None
+            columns.add(field.name)
+        return columns
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in ('GET', 'HEAD'):
+            return queryset
+        related = queryset.query.select_related
+        columns = None if related is True else self._only_columns(queryset.model)
+        if columns is None:
+            return queryset
+        # A relation followed with select_related can't be deferred
+        return queryset.only(*columns, *(related or ()))
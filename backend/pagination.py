@@ -0,0 +1,174 @@
+# backend/pagination.py
+
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination on a composite key such as ``('-created_at', '-id')``.
+
+    DRF's CursorPagination seeks on the first ordering field only and steps
+    over rows sharing its value with an OFFSET. Here the cursor holds every
+    ordering field and a page starts with a keyset comparison, so any page
+    costs one index range scan and no COUNT(*). The last field must be
+    unique; views set ``cursor_ordering`` to override ``ordering``.
+    """
+    ordering = ('-pk',)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = self.cursor.position if self.cursor is not None else None
+
+        if reverse:
+            queryset = queryset.order_by(*(
+                name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._after(queryset.model, current_position, reverse))
+
+        # One extra row tells whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def encode_cursor(self, cursor):
+        # Positions are unique, so links never need an offset
+        return super().encode_cursor(cursor._replace(offset=0))
+
+    def _fields(self, model):
+        for name in self.ordering:
+            attname = name.lstrip('-')
+            field = model._meta.pk if attname == 'pk' else model._meta.get_field(attname)
+            yield attname, field, name.startswith('-')
+
+    def _after(self, model, position, reverse):
+        """
+        Rows that come after ``position`` in the page order:
+        ``a < x OR (a = x AND b < y) ...`` for descending fields.
+        """
+        try:
+            values = json.loads(position)
+            fields = list(self._fields(model))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError(position)
+            values = [field.to_python(value) for (_, field, _), value in zip(fields, values)]
+        except (ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = {}
+        for (attname, _, descending), value in zip(fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{attname}__{lookup}': value})
+            equal[attname] = value
+        # Redundant, but lets any planner bound the scan on the leading index
+        attname, _, descending = fields[0]
+        return condition & Q(**{f"{attname}__{'lte' if descending != reverse else 'gte'}": values[0]})
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for name in ordering:
+            attname = name.lstrip('-')
+            value = instance[attname] if isinstance(instance, dict) else getattr(instance, attname)
+            values.append(str(value))
+        return json.dumps(values)
+
+
+class SelectablePagination(BasePagination):
+    """
+    Page-number pagination (the REST_FRAMEWORK default) or keyset cursor
+    pagination, chosen per request with ``?pagination=page|cursor``. A
+    request carrying a ``cursor`` is in cursor mode; otherwise the view's
+    ``pagination_mode`` applies, 'page' unless the view says otherwise, so
+    existing clients keep their ``count`` and ``?page=N`` links.
+    """
+    mode_query_param = 'pagination'
+    modes = {
+        'page':   PageNumberPagination,
+        'cursor': KeysetCursorPagination,
+    }
+
+    def __init__(self):
+        self.paginator = PageNumberPagination()
+
+    def get_mode(self, request, view):
+        mode = request.query_params.get(self.mode_query_param)
+        if mode is not None:
+            if mode not in self.modes:
+                raise ValidationError({self.mode_query_param: f"Must be one of: {', '.join(self.modes)}."})
+            return mode
+        if KeysetCursorPagination.cursor_query_param in request.query_params:
+            return 'cursor'
+        return getattr(view, 'pagination_mode', 'page')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.modes[self.get_mode(request, view)]()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        # Page mode's shape; cursor mode leaves out ``count``
+        response_schema = PageNumberPagination().get_paginated_response_schema(schema)
+        response_schema['required'] = ['results']
+        return response_schema
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_fields(self, view):
+        return [
+            field
+            for paginator in (PageNumberPagination(), KeysetCursorPagination())
+            for field in paginator.get_schema_fields(view)
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            parameter
+            for paginator in (PageNumberPagination(), KeysetCursorPagination())
+            for parameter in paginator.get_schema_operation_parameters(view)
+        ]
@@ -0,0 +1,164 @@
+# backend/response_cache.py
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from backend.conditional import conditional_response
+
+# Shared cache for the list/retrieve responses of public read endpoints.
+#
+# An entry's key holds the endpoint, the caller's role class, the host,
+# query string (page included) and format, and the current version of every
+# namespace the endpoint reads. Model signals bump a namespace's version when
+# one of its rows changes, once the change has committed; entries built under
+# the old version are never read again and expire after RESPONSE_CACHE_SECONDS.
+PREFIX = 'response_cache'
+
+VALIDATORS = ('ETag', 'Last-Modified')
+
+# Endpoint -> namespaces its responses are built from
+ENDPOINTS = {
+    'tracks':          ('tracks',),
+    'playlists':       ('playlists',),
+    'recommendations': ('recommendations',),
+}
+
+
+def _version_key(namespace):
+    return f'{PREFIX}:version:{namespace}'
+
+
+def _counter_key(endpoint, outcome):
+    return f'{PREFIX}:{endpoint}:{outcome}'
+
+
+def _fresh_version():
+    # A version key that was evicted restarts from a value no earlier entry
+    # can have been built under
+    return time.time_ns()
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def enabled(endpoint):
+    # A per-process cache would keep serving responses other processes retired
+    return (
+        settings.RESPONSE_CACHE_ENABLED
+        and settings.CACHE_SHARED
+        and endpoint not in settings.RESPONSE_CACHE_DISABLED
+    )
+
+
+def versions(namespaces):
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    missing = {key: _fresh_version() for key in keys if key not in found}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, timeout=None)
+        found.update(cache.get_many(list(missing)))
+    return [found.get(key, 0) for key in keys]
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        if cache.add(key, _fresh_version(), timeout=None):
+            continue
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), timeout=None)
+
+
+def invalidate(*namespaces):
+    """
+    Retire every cached response built from ``namespaces``. Runs after the
+    current transaction commits, so a concurrent request can't cache the
+    old rows under the new version.
+    """
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def cache_key(endpoint, role, request):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    source = f'{request.get_host()}{request.path}?{query}:{request.accepted_renderer.format}'
+    digest = hashlib.md5(source.encode()).hexdigest()
+    version = '.'.join(str(value) for value in versions(ENDPOINTS[endpoint]))
+    return f'{PREFIX}:{endpoint}:{role}:{version}:{digest}'
+
+
+def stats():
+    """
+    Hit/miss counters of each endpoint, and whether it is cached.
+    """
+    counters = cache.get_many([
+        _counter_key(endpoint, outcome) for endpoint in ENDPOINTS for outcome in ('hits', 'misses')
+    ])
+    results = {}
+    for endpoint in ENDPOINTS:
+        hits = counters.get(_counter_key(endpoint, 'hits'), 0)
+        misses = counters.get(_counter_key(endpoint, 'misses'), 0)
+        lookups = hits + misses
+        results[endpoint] = {
+            'enabled': enabled(endpoint),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+        }
+    return results
+
+
+class CachedResponseMixin:
+    """
+    Serve ``list`` and ``retrieve`` from the response cache. Views name
+    their ``cache_endpoint`` (a key of ENDPOINTS) and say which role class
+    a request falls in. List it before ConditionalGetMixin in the bases.
+    """
+    cache_endpoint = None
+
+    def cache_role(self, request):
+        """
+        Name shared by every caller who gets the same response, or None to
+        bypass the cache (e.g. responses that depend on the user).
+        """
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+    def _cached(self, build, request, *args, **kwargs):
+        role = self.cache_role(request)
+        if role is None or not enabled(self.cache_endpoint):
+            return build(request, *args, **kwargs)
+
+        key = cache_key(self.cache_endpoint, role, request)
+        entry = cache.get(key)
+        if entry is not None:
+            _count(_counter_key(self.cache_endpoint, 'hits'))
+            data, headers = entry
+            return conditional_response(request, headers) or Response(data, headers=headers)
+        _count(_counter_key(self.cache_endpoint, 'misses'))
+        response = build(request, *args, **kwargs)
+        if response.status_code == 200:
+            # Validators set by ConditionalGetMixin are kept, so hits answer
+            # conditional requests too
+            headers = {name: response[name] for name in VALIDATORS if name in response}
+            cache.set(key, (response.data, headers), timeout=settings.RESPONSE_CACHE_SECONDS)
+        return response
@@ -108,7 +108,8 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
 
-    # 4. Pagination defaults
+    # 4. Pagination defaults (high-volume lists use backend.pagination.SelectablePagination,
+    #    which adds keyset cursor pages on ?pagination=cursor)
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 
@@ -196,6 +197,156 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Cache
+# Web processes and Celery workers pass values to each other through the
+# cache: the write-behind statistics counters, response cache invalidation
+# and the feature cache counters. It defaults to the Redis server Celery uses.
+# CACHE_SHARED tells whether every process sees the same cache; it is false
+# for the per-process backends, which make those features fall back to their
+# direct forms (counters updated in the database on every event, responses
+# not cached).
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.redis.RedisCache')
+CACHES = {
+    'default': {
+        'BACKEND':  CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default=CELERY_BROKER_URL),
+    }
+}
+CACHE_SHARED = config('CACHE_SHARED', cast=bool, default=CACHE_BACKEND not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+))
+
+# Audio feature extraction
+# Tracks at least this long (seconds) are analysed in streaming mode, which
+# keeps worker memory constant instead of decoding the whole file at once.
+FEATURE_EXTRACTION_STREAM_MIN_SECONDS = config('FEATURE_EXTRACTION_STREAM_MIN_SECONDS', default=600, cast=int)
+# Default analysis mode: 'full' (whole track, native sample rate) or 'fast'
+# (a bounded excerpt resampled to FEATURE_FAST_SAMPLE_RATE). Tasks can
+# override it per call.
+FEATURE_EXTRACTION_MODE = config('FEATURE_EXTRACTION_MODE', default='full')
+FEATURE_FAST_SAMPLE_RATE = config('FEATURE_FAST_SAMPLE_RATE', default=22050, cast=int)
+FEATURE_FAST_EXCERPT_SECONDS = config('FEATURE_FAST_EXCERPT_SECONDS', default=30.0, cast=float)
+# 1 = one excerpt from Track.demo_start_time; >1 = evenly spaced windows
+FEATURE_FAST_WINDOWS = config('FEATURE_FAST_WINDOWS', default=1, cast=int)
+# NUMBA_CACHE_DIR (persistent JIT cache) and CELERY_WORKER_WARMUP (compile the
+# extraction path at worker boot) are read in backend/celery.py, because they
+# must be applied before numba is imported.
+# Batch extraction: tracks per task and background decode threads per task
+FEATURE_BATCH_SIZE = config('FEATURE_BATCH_SIZE', default=16, cast=int)
+FEATURE_BATCH_DECODE_THREADS = config('FEATURE_BATCH_DECODE_THREADS', default=2, cast=int)
+# Upper bound on content-hash cached feature sets (least recently used are evicted)
+FEATURE_CACHE_MAX_ENTRIES = config('FEATURE_CACHE_MAX_ENTRIES', default=50000, cast=int)
+
+# Similar tracks
+# Each web process keeps the feature vectors of approved tracks in memory and
+# applies logged changes at most every SIMILARITY_REFRESH_SECONDS. When more
+# than SIMILARITY_REBUILD_FRACTION of the index has changed it is rebuilt, so
+# the standardisation statistics follow the catalogue.
+SIMILARITY_REFRESH_SECONDS = config('SIMILARITY_REFRESH_SECONDS', default=30, cast=int)
+SIMILARITY_REBUILD_FRACTION = config('SIMILARITY_REBUILD_FRACTION', default=0.1, cast=float)
+SIMILARITY_MAX_RESULTS = config('SIMILARITY_MAX_RESULTS', default=100, cast=int)
+# Approximate index published by `manage.py build_similarity_index`. When a
+# build exists it is memory-mapped and shared by every process; tracks changed
+# since the build are searched exactly from an in-memory delta. Each probe
+# visits one more bucket per hash table: higher recall, slower queries.
+SIMILARITY_INDEX_DIR = config('SIMILARITY_INDEX_DIR', default=os.path.join(BASE_DIR, 'similarity_index'))
+SIMILARITY_PROBES = config('SIMILARITY_PROBES', default=4, cast=int)
+SIMILARITY_MAX_PROBES = config('SIMILARITY_MAX_PROBES', default=16, cast=int)
+# Summed user x track event weights kept by `manage.py build_track_neighbours`
+# between runs, so --incremental reads only the events after the last run.
+TRACK_NEIGHBOURS_COUNTS = config(
+    'TRACK_NEIGHBOURS_COUNTS', default=os.path.join(BASE_DIR, 'track_neighbours', 'counts.npz'),
+)
+
+# Track statistics
+# Play/like/comment counters are buffered in the cache in slots of
+# TRACK_STATS_SLOT_SECONDS and flushed by the beat schedule below (or, unless
+# CACHE_SHARED, updated in the database as each event is saved). Unflushed
+# deltas live for TRACK_STATS_KEY_TIMEOUT seconds, which bounds how long the
+# flusher may be down before counts drift (`manage.py reconcile_track_statistics`
+# repairs them).
+TRACK_STATS_SLOT_SECONDS = config('TRACK_STATS_SLOT_SECONDS', default=60, cast=int)
+TRACK_STATS_KEY_TIMEOUT = config('TRACK_STATS_KEY_TIMEOUT', default=86400, cast=int)
+
+# Response cache
+# list/retrieve responses of the public catalogue endpoints ('tracks',
+# 'playlists', 'recommendations') are cached per role class and query string
+# for RESPONSE_CACHE_SECONDS, and retired by model signals as soon as the rows
+# behind them change. Invalidation goes through the cache, so nothing is
+# cached unless CACHE_SHARED. RESPONSE_CACHE_DISABLED lists endpoints to
+# serve uncached.
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_SECONDS = config('RESPONSE_CACHE_SECONDS', default=300, cast=int)
+RESPONSE_CACHE_DISABLED = config('RESPONSE_CACHE_DISABLED', default='', cast=Csv())
+
+# Largest batch accepted by POST /api/v1/events/batch/
+EVENT_BATCH_MAX_SIZE = config('EVENT_BATCH_MAX_SIZE', default=500, cast=int)
+
+# Listening history writes
+# 'sync' inserts each play in the request. 'buffered' appends it to a Redis
+# list (LISTEN_BUFFER_URL) and a Celery task writes the buffer in batches of
+# LISTEN_BUFFER_BATCH_SIZE every LISTEN_BUFFER_FLUSH_SECONDS, or as soon as a
+# full batch is waiting. Past LISTEN_BUFFER_MAX_LENGTH buffered plays, or if
+# Redis is unreachable within LISTEN_BUFFER_TIMEOUT seconds, plays are
+# written synchronously again.
+# Buffered plays keep their play time as listened_at and get their ids when
+# written. The rollup and trending high-water marks follow recorded_at, the
+# write time, so a play drained late is still read by their next run.
+LISTENING_HISTORY_MODE = config('LISTENING_HISTORY_MODE', default='sync')
+LISTEN_BUFFER_URL = config('LISTEN_BUFFER_URL', default=CELERY_BROKER_URL)
+LISTEN_BUFFER_MAX_LENGTH = config('LISTEN_BUFFER_MAX_LENGTH', default=1_000_000, cast=int)
+# Kept under Redis' Lua argument limit (~8000)
+LISTEN_BUFFER_BATCH_SIZE = config('LISTEN_BUFFER_BATCH_SIZE', default=2000, cast=int)
+LISTEN_BUFFER_FLUSH_SECONDS = config('LISTEN_BUFFER_FLUSH_SECONDS', default=2, cast=int)
+LISTEN_BUFFER_TIMEOUT = config('LISTEN_BUFFER_TIMEOUT', default=0.5, cast=float)
+LISTEN_BUFFER_LOCK_SECONDS = config('LISTEN_BUFFER_LOCK_SECONDS', default=60, cast=int)
+
+# Play rollups
+# Hourly and daily play counts per track and per artist, folded in from
+# ListeningHistory every ROLLUP_INTERVAL_SECONDS. Rows younger than
+# ROLLUP_LAG_SECONDS are left for the next run, so transactions still in
+# flight aren't skipped. ROLLUP_MAX_POINTS caps one time-series response.
+ROLLUP_INTERVAL_SECONDS = config('ROLLUP_INTERVAL_SECONDS', default=300, cast=int)
+ROLLUP_LAG_SECONDS = config('ROLLUP_LAG_SECONDS', default=120, cast=int)
+ROLLUP_MAX_POINTS = config('ROLLUP_MAX_POINTS', default=1000, cast=int)
+
+# Trending tracks
+# Each listen, like and comment adds to its track's trending score, halving
+# every TRENDING_HALF_LIFE_HOURS. Scores are updated every
+# TRENDING_INTERVAL_SECONDS from events older than TRENDING_LAG_SECONDS;
+# tracks whose score decays below TRENDING_MIN_SCORE are dropped. The first
+# run reads TRENDING_WINDOW_HALF_LIVES half-lives of history.
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24.0, cast=float)
+TRENDING_INTERVAL_SECONDS = config('TRENDING_INTERVAL_SECONDS', default=300, cast=int)
+TRENDING_LAG_SECONDS = config('TRENDING_LAG_SECONDS', default=60, cast=int)
+TRENDING_MIN_SCORE = config('TRENDING_MIN_SCORE', default=0.05, cast=float)
+TRENDING_WINDOW_HALF_LIVES = config('TRENDING_WINDOW_HALF_LIVES', default=8, cast=int)
+TRENDING_MAX_RESULTS = config('TRENDING_MAX_RESULTS', default=100, cast=int)
+# Responses are cached (and marked cacheable by clients) for this long
+TRENDING_CACHE_SECONDS = config('TRENDING_CACHE_SECONDS', default=60, cast=int)
+
+# Periodic tasks (run a `celery -A backend beat` process alongside the workers)
+CELERY_BEAT_SCHEDULE = {
+    'flush-track-statistics': {
+        'task': 'music.tasks.flush_track_statistics',
+        'schedule': TRACK_STATS_SLOT_SECONDS,
+    },
+    'rollup-plays': {
+        'task': 'music.tasks.rollup_plays',
+        'schedule': ROLLUP_INTERVAL_SECONDS,
+    },
+    'update-trending': {
+        'task': 'music.tasks.update_trending',
+        'schedule': TRENDING_INTERVAL_SECONDS,
+    },
+}
+if LISTENING_HISTORY_MODE == 'buffered':
+    CELERY_BEAT_SCHEDULE['drain-listen-buffer'] = {
+        'task': 'music.tasks.drain_listen_buffer',
+        'schedule': LISTEN_BUFFER_FLUSH_SECONDS,
+    }
+
 # Swagger / drf-yasg settings
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,    # don’t show the “Login” button in UI
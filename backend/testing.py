@@ -0,0 +1,46 @@
+# backend/testing.py
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.settings import api_settings
+from rest_framework.test import APITestCase
+
+
+# Cached responses would be served without touching the database at all
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class QueryBudgetTestCase(APITestCase):
+    """
+    Checks that a read endpoint costs a fixed number of queries, whatever
+    the number of rows it returns: each row read from a relation must come
+    from a join, a prefetch or an annotation rather than a query of its own.
+    """
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response, len(queries)
+
+    def rows(self, response):
+        data = response.data
+        return len(data['results'] if isinstance(data, dict) else data)
+
+    def assertQueryBudget(self, url, budget, add_rows):
+        """
+        GET ``url`` with one row to return and again with a full page, after
+        ``add_rows(n)`` has added ``n`` more; both cost the same number of
+        queries, at most ``budget``.
+        """
+        add_rows(1)
+        small, small_count = self.count_queries(url)
+        add_rows(api_settings.PAGE_SIZE - 1)
+        large, large_count = self.count_queries(url)
+
+        self.assertEqual(self.rows(small), 1)
+        self.assertEqual(self.rows(large), api_settings.PAGE_SIZE)
+        self.assertEqual(
+            small_count, large_count,
+            f"{url}: {small_count} queries for 1 row, {large_count} for {api_settings.PAGE_SIZE}",
+        )
+        self.assertLessEqual(large_count, budget, f"{url}: {large_count} queries, budget {budget}")
@@ -18,6 +18,7 @@ from music.views import (
     TrackStatisticsViewSet,
     MyTracksView,
     TracksByArtistView,
+    EventBatchView,
 )
 
 # Playlist Views
@@ -89,6 +90,7 @@ urlpatterns = [
     path('api/v1/moderate/artist/<int:artist_id>/tracks/',
          TracksByArtistView.as_view(),
          name='artist-tracks-moderator'),
+    path('api/v1/events/batch/', EventBatchView.as_view(), name='event-batch'),
 
     # Swagger UI & Redoc
     re_path(r'^swagger/$',  schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Track, TrackFeature, Interaction, ListeningHistory, TrackStatistics
+from .models import Track, TrackFeature, Interaction, ListeningHistory, TrackStatistics, JobCheckpoint, FeatureCacheEntry
+from .models import TrackPlayRollup, ArtistPlayRollup
 
 @admin.register(Track)
 class TrackAdmin(admin.ModelAdmin):
@@ -34,4 +35,31 @@ class TrackStatisticsAdmin(admin.ModelAdmin):
     list_display  = ['track', 'plays_count', 'likes_count', 'comments_count', 'updated_at']
     list_filter   = ['updated_at']
     search_fields = ['track__title']
-    ordering      = ['-updated_at']
\ No newline at end of file
+    ordering      = ['-updated_at']
+
+@admin.register(JobCheckpoint)
+class JobCheckpointAdmin(admin.ModelAdmin):
+    list_display  = ['name', 'updated_at']
+    search_fields = ['name']
+    ordering      = ['name']
+
+@admin.register(FeatureCacheEntry)
+class FeatureCacheEntryAdmin(admin.ModelAdmin):
+    list_display  = ['content_hash', 'extractor_version', 'hits', 'last_used_at']
+    list_filter   = ['extractor_version']
+    search_fields = ['content_hash']
+    ordering      = ['-last_used_at']
+
+@admin.register(TrackPlayRollup)
+class TrackPlayRollupAdmin(admin.ModelAdmin):
+    list_display  = ['track', 'period', 'bucket', 'plays']
+    list_filter   = ['period']
+    search_fields = ['track__title']
+    ordering      = ['-bucket']
+
+@admin.register(ArtistPlayRollup)
+class ArtistPlayRollupAdmin(admin.ModelAdmin):
+    list_display  = ['artist', 'period', 'bucket', 'plays']
+    list_filter   = ['period']
+    search_fields = ['artist__display_name']
+    ordering      = ['-bucket']
@@ -0,0 +1,231 @@
+import os
+from array import array
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from scipy import sparse
+
+from music.models import Interaction, ListeningHistory, Track, TrackNeighbour
+
+# Weight of one event in the user x track matrix. Repeats are summed and then
+# damped with log1p, so a track on loop doesn't dominate a listener's row.
+EVENT_WEIGHTS = {
+    'like':   3.0,
+    'stream': 1.0,
+}
+LISTEN_WEIGHT = 1.0
+
+ITERATOR_CHUNK = 20000
+
+
+def watermarks():
+    """
+    Highest Interaction and ListeningHistory ids, i.e. how far a build has
+    read. Take them before reading events, and read up to them only.
+    """
+    return {
+        'interaction_id': Interaction.objects.aggregate(last=Max('id'))['last'] or 0,
+        'listen_id': ListeningHistory.objects.aggregate(last=Max('id'))['last'] or 0,
+    }
+
+
+def event_counts(upto, after=None):
+    """
+    Summed event weights per (user, track) of the Interaction and
+    ListeningHistory rows after the ``after`` watermarks (default: from the
+    first row) up to the ``upto`` ones, streamed in chunks.
+
+    Returns ``(user_ids, track_ids, matrix)``: the sorted ids of its rows and
+    columns and a CSR matrix of undamped weights. Columns cover every track
+    with events; approval is applied by ``interaction_matrix``.
+    """
+    after = after or {}
+    # Typed arrays rather than lists of tuples: 8 bytes per value
+    users, tracks, weights = array('q'), array('q'), array('d')
+    interactions = Interaction.objects.filter(
+        interaction_type__in=EVENT_WEIGHTS,
+        id__gt=after.get('interaction_id', 0),
+        id__lte=upto['interaction_id'],
+    ).values_list('user_id', 'track_id', 'interaction_type')
+    for user_id, track_id, kind in interactions.iterator(chunk_size=ITERATOR_CHUNK):
+        users.append(user_id)
+        tracks.append(track_id)
+        weights.append(EVENT_WEIGHTS[kind])
+    listens = ListeningHistory.objects.filter(
+        id__gt=after.get('listen_id', 0),
+        id__lte=upto['listen_id'],
+    ).values_list('user_id', 'track_id')
+    for user_id, track_id in listens.iterator(chunk_size=ITERATOR_CHUNK):
+        users.append(user_id)
+        tracks.append(track_id)
+        weights.append(LISTEN_WEIGHT)
+
+    user_ids, rows = np.unique(np.frombuffer(users, dtype=np.int64), return_inverse=True)
+    track_ids, columns = np.unique(np.frombuffer(tracks, dtype=np.int64), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.frombuffer(weights, dtype=np.float64), (rows, columns)),
+        shape=(len(user_ids), len(track_ids)),
+    )
+    matrix.sum_duplicates()
+    return user_ids, track_ids, matrix
+
+
+def merge_counts(first, second):
+    """
+    Sum of two ``event_counts`` results, over the union of their users and
+    tracks.
+    """
+    user_ids = np.union1d(first[0], second[0])
+    track_ids = np.union1d(first[1], second[1])
+
+    def widen(users, tracks, matrix):
+        coo = matrix.tocoo()
+        return sparse.csr_matrix(
+            (coo.data, (np.searchsorted(user_ids, users[coo.row]), np.searchsorted(track_ids, tracks[coo.col]))),
+            shape=(len(user_ids), len(track_ids)),
+        )
+
+    return user_ids, track_ids, widen(*first) + widen(*second)
+
+
+def save_counts(path, counts, state):
+    """
+    Write ``counts`` and the watermarks they were read up to at ``path``,
+    replacing the previous file in one rename.
+    """
+    user_ids, track_ids, matrix = counts
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # savez appends .npz to names without it
+    temporary = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(
+        temporary,
+        user_ids=user_ids, track_ids=track_ids,
+        data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, shape=np.array(matrix.shape),
+        interaction_id=state['interaction_id'], listen_id=state['listen_id'],
+    )
+    os.replace(temporary, path)
+
+
+def load_counts(path):
+    """
+    ``(counts, state)`` as saved by ``save_counts``, or None without a file.
+    """
+    try:
+        stored = np.load(path)
+    except FileNotFoundError:
+        return None
+    with stored:
+        matrix = sparse.csr_matrix(
+            (stored['data'], stored['indices'], stored['indptr']), shape=tuple(stored['shape']),
+        )
+        state = {'interaction_id': int(stored['interaction_id']), 'listen_id': int(stored['listen_id'])}
+        return (stored['user_ids'], stored['track_ids'], matrix), state
+
+
+def interaction_matrix(counts):
+    """
+    The user x track matrix of ``counts`` over approved tracks.
+
+    Returns ``(track_ids, matrix)``: the sorted approved track ids (one per
+    column) and a CSR matrix of damped event weights.
+    """
+    _, tracks, counted = counts
+    track_ids = np.array(
+        sorted(Track.objects.filter(approval_status='approved').values_list('id', flat=True)),
+        dtype=np.int64,
+    )
+
+    # Events on tracks that aren't approved are dropped
+    coo = counted.tocoo()
+    tracks = tracks[coo.col]
+    columns = np.minimum(np.searchsorted(track_ids, tracks), max(len(track_ids) - 1, 0))
+    known = track_ids[columns] == tracks if len(track_ids) else np.zeros(len(tracks), dtype=bool)
+
+    matrix = sparse.csr_matrix(
+        (np.log1p(coo.data[known]), (coo.row[known], columns[known])),
+        shape=(counted.shape[0], len(track_ids)),
+    )
+    return track_ids, matrix
+
+
+def neighbours(matrix, columns, k=20, block_size=500):
+    """
+    Top-``k`` cosine neighbours of each of ``columns`` (track columns of
+    ``matrix``). Yields ``(column, neighbour_columns, scores)``, best first.
+
+    Columns are scaled to unit length once; each block of source tracks is
+    then one sparse product against the whole matrix, so memory is bounded
+    by the block rather than the catalogue.
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalised = (matrix @ sparse.diags(1.0 / norms)).tocsr()
+    by_track = normalised.T.tocsr()
+
+    for start in range(0, len(columns), block_size):
+        block = columns[start:start + block_size]
+        product = (by_track[block] @ normalised).tocsr()
+        for row, column in enumerate(block):
+            span = slice(product.indptr[row], product.indptr[row + 1])
+            found = product.indices[span]
+            scores = product.data[span]
+            others = found != column
+            found, scores = found[others], scores[others]
+            if len(found) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                found, scores = found[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            yield column, found[order], scores[order]
+
+
+def store_neighbours(rows):
+    """
+    Replace the neighbour lists of the tracks in ``rows``, a list of
+    ``(track_id, neighbour_ids, scores)``.
+    """
+    with transaction.atomic():
+        TrackNeighbour.objects.filter(track_id__in=[track_id for track_id, _, _ in rows]).delete()
+        TrackNeighbour.objects.bulk_create(
+            [
+                TrackNeighbour(track_id=track_id, neighbour_id=neighbour_id, rank=rank, score=score)
+                for track_id, neighbour_ids, scores in rows
+                for rank, (neighbour_id, score) in enumerate(zip(neighbour_ids, scores))
+            ],
+            batch_size=5000,
+        )
+
+
+def build_neighbours(counts, track_ids=None, k=20, block_size=500):
+    """
+    Recompute the neighbour lists of ``track_ids`` (default: every approved
+    track) from ``counts``, the ``event_counts`` of every event. Returns
+    ``(tracks, rows)`` written.
+
+    An incremental refresh passes the tracks with new events; the lists of
+    other tracks are left alone until the next full build.
+    """
+    catalogue, matrix = interaction_matrix(counts)
+    if track_ids is None:
+        columns = np.arange(len(catalogue))
+    else:
+        wanted = np.array(sorted(track_ids), dtype=np.int64)
+        columns = np.flatnonzero(np.isin(catalogue, wanted))
+
+    tracks = written = 0
+    pending = []
+    for column, found, scores in neighbours(matrix, columns, k=k, block_size=block_size):
+        pending.append((int(catalogue[column]), catalogue[found].tolist(), scores.tolist()))
+        if len(pending) == block_size:
+            store_neighbours(pending)
+            tracks += len(pending)
+            written += sum(len(ids) for _, ids, _ in pending)
+            pending = []
+    if pending:
+        store_neighbours(pending)
+        tracks += len(pending)
+        written += sum(len(ids) for _, ids, _ in pending)
+
+    # Lists of tracks that left the catalogue
+    TrackNeighbour.objects.exclude(track__approval_status='approved').delete()
+    return tracks, written
@@ -0,0 +1,251 @@
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from music.models import Interaction, JobCheckpoint, ListeningHistory, Track, TrackStatistics
+
+# TrackStatistics counters are write-behind: each event adds to a delta in the
+# shared cache and a periodic flush applies the deltas in one transaction.
+#
+# Deltas are grouped in time slots of TRACK_STATS_SLOT_SECONDS, by the time
+# the event row was written: ListeningHistory.recorded_at (buffered plays are
+# written after their listened_at) and Interaction.created_at. A slot is flushed once it has been closed for a full
+# slot, and the flush advances the checkpoint's ``last_slot`` in the same
+# transaction as the counter updates: a crash before commit replays the
+# slots, one after commit skips them, so no delta is applied twice.
+#
+# Deltas only reach the flusher through a cache every process shares. With a
+# per-process cache (not CACHE_SHARED) events update the rows directly.
+FIELDS = ('plays_count', 'likes_count', 'comments_count')
+# Interaction types counted; plays come from ListeningHistory
+INTERACTION_FIELDS = {
+    'like':    'likes_count',
+    'comment': 'comments_count',
+}
+CHECKPOINT = 'track_statistics'
+PREFIX = 'track_stats'
+
+
+def slot_of(moment):
+    return int(moment.timestamp()) // settings.TRACK_STATS_SLOT_SECONDS
+
+
+def slot_start(slot):
+    return datetime.fromtimestamp(slot * settings.TRACK_STATS_SLOT_SECONDS, tz=dt_timezone.utc)
+
+
+def _size_key(slot):
+    return f'{PREFIX}:{slot}:n'
+
+
+def _entry_key(slot, index):
+    return f'{PREFIX}:{slot}:track:{index}'
+
+
+def _seen_key(slot, track_id):
+    return f'{PREFIX}:{slot}:seen:{track_id}'
+
+
+def _delta_key(slot, track_id, field):
+    return f'{PREFIX}:{slot}:{track_id}:{field}'
+
+
+def _incr(key, amount, timeout):
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, amount, timeout=timeout)
+        return amount
+
+
+def bump(track_id, field, amount=1, moment=None):
+    """
+    Add ``amount`` to ``field`` of the track's statistics, in the slot of
+    ``moment`` (default: now).
+
+    The first event of a track in a slot also appends the track to the
+    slot's index, so a flush finds every delta without scanning keys.
+    """
+    if not settings.CACHE_SHARED:
+        apply_deltas({track_id: [amount if name == field else 0 for name in FIELDS]}, timezone.now())
+        return
+    slot = slot_of(moment or timezone.now())
+    timeout = settings.TRACK_STATS_KEY_TIMEOUT
+    if cache.add(_seen_key(slot, track_id), 1, timeout=timeout):
+        index = _incr(_size_key(slot), 1, timeout)
+        cache.set(_entry_key(slot, index), track_id, timeout=timeout)
+    _incr(_delta_key(slot, track_id, field), amount, timeout)
+
+
+def unbump(track_id, field, moment):
+    """
+    Take back an event recorded at ``moment`` whose row was deleted.
+
+    If its slot is still pending the delta is cancelled in that slot;
+    otherwise the counter row is decremented directly. Deletes are rare
+    next to plays, and either way ``recount`` agrees with the result.
+    """
+    state = JobCheckpoint.objects.filter(name=CHECKPOINT).values_list('state', flat=True).first() or {}
+    if 'last_slot' not in state or slot_of(moment) > state['last_slot']:
+        bump(track_id, field, -1, moment=moment)
+    else:
+        TrackStatistics.objects.filter(track_id=track_id).update(
+            updated_at=timezone.now(),
+            **{field: F(field) - 1},
+        )
+
+
+def locked_checkpoint():
+    """
+    The counters' checkpoint row, locked until the end of the transaction,
+    so flushes and reconciliation never interleave. Call inside
+    ``transaction.atomic()``.
+    """
+    JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    return JobCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+
+
+def _read_slots(slots):
+    """
+    ``(deltas, keys)``: the summed deltas per track id of ``slots`` and
+    every cache key they were read from.
+    """
+    sizes = cache.get_many([_size_key(slot) for slot in slots])
+    entry_keys = {
+        _entry_key(slot, index): slot
+        for slot in slots
+        for index in range(1, sizes.get(_size_key(slot), 0) + 1)
+    }
+    entries = cache.get_many(list(entry_keys))
+    touched = [(entry_keys[key], track_id) for key, track_id in entries.items()]
+    delta_keys = {
+        _delta_key(slot, track_id, field): (track_id, position)
+        for slot, track_id in touched
+        for position, field in enumerate(FIELDS)
+    }
+    values = cache.get_many(list(delta_keys))
+
+    deltas = defaultdict(lambda: [0] * len(FIELDS))
+    for key, value in values.items():
+        track_id, position = delta_keys[key]
+        deltas[track_id][position] += value
+    seen_keys = [_seen_key(slot, track_id) for slot, track_id in touched]
+    keys = [*sizes, *entry_keys, *delta_keys, *seen_keys]
+    return deltas, keys
+
+
+def apply_deltas(deltas, now):
+    """
+    Add ``deltas`` (track id -> one delta per FIELDS) to TrackStatistics,
+    creating missing rows. Tracks sharing the same deltas are updated by a
+    single UPDATE; most flushes are a handful of distinct ones.
+    """
+    # Deleted tracks took their events with them
+    track_ids = set(Track.objects.filter(id__in=list(deltas)).values_list('id', flat=True))
+    TrackStatistics.objects.bulk_create(
+        [TrackStatistics(track_id=track_id) for track_id in track_ids],
+        ignore_conflicts=True,
+    )
+    groups = defaultdict(list)
+    for track_id in track_ids:
+        if any(deltas[track_id]):
+            groups[tuple(deltas[track_id])].append(track_id)
+    for values, ids in groups.items():
+        # QuerySet.update() skips auto_now, so updated_at is set here
+        TrackStatistics.objects.filter(track_id__in=ids).update(
+            updated_at=now,
+            **{field: F(field) + value for field, value in zip(FIELDS, values) if value},
+        )
+    return len(track_ids)
+
+
+def flush():
+    """
+    Apply the deltas of every closed, unflushed slot. Returns ``(slots,
+    tracks)`` flushed. Safe to run from several workers at once: the
+    checkpoint row lock serialises them.
+    """
+    now = timezone.now()
+    closed = slot_of(now) - 2
+    with transaction.atomic():
+        checkpoint = locked_checkpoint()
+        # First run: pick up whatever the cache still holds
+        backlog = settings.TRACK_STATS_KEY_TIMEOUT // settings.TRACK_STATS_SLOT_SECONDS
+        last = checkpoint.state.get('last_slot', closed - backlog)
+        slots = range(max(last, closed - backlog) + 1, closed + 1)
+        if not slots:
+            return 0, 0
+        deltas, keys = _read_slots(slots)
+        tracks = apply_deltas(deltas, now)
+        checkpoint.state = {**checkpoint.state, 'last_slot': closed}
+        checkpoint.save(update_fields=['state', 'updated_at'])
+        # Once committed the keys are dead weight; a crash here leaves them
+        # to expire, the watermark already covers them.
+        transaction.on_commit(lambda: cache.delete_many(keys))
+    return len(slots), tracks
+
+
+def recount(track_ids):
+    """
+    Recompute the counters of ``track_ids`` from ListeningHistory and
+    Interaction rows and correct the TrackStatistics rows that drifted
+    (lost deltas, expired keys, events written around the cache). Returns
+    the number of rows corrected.
+
+    Only rows written before the flushed watermark are counted: later
+    events are still pending as deltas and will be added by the flush. The checkpoint
+    stays locked meanwhile, so the watermark can't move under the count.
+    Without a shared cache nothing is pending and every row is counted.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        checkpoint = locked_checkpoint()
+        plays = ListeningHistory.objects.filter(track_id__in=track_ids)
+        interactions = Interaction.objects.filter(track_id__in=track_ids, interaction_type__in=INTERACTION_FIELDS)
+        if settings.CACHE_SHARED:
+            if 'last_slot' not in checkpoint.state:
+                # Never flushed: count every closed slot from the rows instead
+                checkpoint.state = {**checkpoint.state, 'last_slot': slot_of(now) - 1}
+                checkpoint.save(update_fields=['state', 'updated_at'])
+            boundary = slot_start(checkpoint.state['last_slot'] + 1)
+            plays = plays.filter(recorded_at__lt=boundary)
+            interactions = interactions.filter(created_at__lt=boundary)
+
+        counts = {track_id: [0] * len(FIELDS) for track_id in track_ids}
+        plays = plays.order_by().values('track_id').annotate(total=Count('id'))
+        for row in plays:
+            counts[row['track_id']][FIELDS.index('plays_count')] = row['total']
+        interactions = (
+            interactions
+            .order_by().values('track_id')
+            .annotate(**{
+                field: Count('id', filter=Q(interaction_type=kind))
+                for kind, field in INTERACTION_FIELDS.items()
+            })
+        )
+        for row in interactions:
+            for field in INTERACTION_FIELDS.values():
+                counts[row['track_id']][FIELDS.index(field)] = row[field]
+
+        existing = {stats.track_id: stats for stats in TrackStatistics.objects.filter(track_id__in=track_ids)}
+        changed, missing = [], []
+        for track_id, values in counts.items():
+            stats = existing.get(track_id)
+            if stats is None:
+                if any(values):
+                    missing.append(TrackStatistics(track_id=track_id, **dict(zip(FIELDS, values))))
+            elif [getattr(stats, field) for field in FIELDS] != values:
+                for field, value in zip(FIELDS, values):
+                    setattr(stats, field, value)
+                stats.updated_at = now
+                changed.append(stats)
+        TrackStatistics.objects.bulk_update(changed, [*FIELDS, 'updated_at'])
+        TrackStatistics.objects.bulk_create(missing, ignore_conflicts=True)
+    return len(changed) + len(missing)
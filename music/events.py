@@ -0,0 +1,67 @@
+from collections import Counter
+
+from django.db import transaction
+
+from music import play_buffer
+from music.counters import INTERACTION_FIELDS, bump
+from music.models import Interaction, ListeningHistory
+
+# Event types accepted in batches: 'play' is a ListeningHistory row, the
+# others are Interaction types
+EVENT_TYPES = ['play', *(kind for kind, _ in Interaction.INTERACTION_TYPES)]
+
+
+def _row(user, event):
+    if event['type'] == 'play':
+        return ListeningHistory(user=user, track_id=event['track'])
+    comment_text = event.get('comment_text') if event['type'] == 'comment' else None
+    return Interaction(user=user, track_id=event['track'], interaction_type=event['type'], comment_text=comment_text)
+
+
+def count_events(rows):
+    """
+    Bump the statistics counters for saved ``rows``, one increment per
+    track and counter, in the slot the row was written in.
+    """
+    totals = Counter()
+    moments = {}
+    for row in rows:
+        if isinstance(row, ListeningHistory):
+            key, at = (row.track_id, 'plays_count'), row.recorded_at
+        elif row.interaction_type in INTERACTION_FIELDS:
+            key, at = (row.track_id, INTERACTION_FIELDS[row.interaction_type]), row.created_at
+        else:
+            continue
+        totals[key] += 1
+        moments.setdefault(key, at)
+    for (track_id, field), amount in totals.items():
+        bump(track_id, field, amount, moment=moments[track_id, field])
+
+
+def save_events(user, events):
+    """
+    Save validated ``events`` for ``user``: one bulk_create per table, in
+    one transaction. Returns ``(rows, queued)``: the rows in input order
+    (their ids are only set on databases that return bulk-inserted keys)
+    and whether the plays among them were buffered rather than written.
+
+    bulk_create sends no post_save signals, so the statistics counters are
+    bumped here once the transaction commits.
+    """
+    rows = [_row(user, event) for event in events]
+    plays = [row for row in rows if isinstance(row, ListeningHistory)]
+    queued = False
+    if plays and play_buffer.enabled():
+        buffered = [play_buffer.play_event(user.id, row.track_id) for row in plays]
+        queued = play_buffer.enqueue(buffered)
+        if queued:
+            for row, event in zip(plays, buffered):
+                row.event_id = event['event_id']
+            plays = []
+
+    with transaction.atomic():
+        ListeningHistory.objects.bulk_create(plays)
+        Interaction.objects.bulk_create([row for row in rows if isinstance(row, Interaction)])
+        saved = [row for row in rows if not (queued and isinstance(row, ListeningHistory))]
+        transaction.on_commit(lambda: count_events(saved))
+    return rows, queued
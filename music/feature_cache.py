@@ -0,0 +1,110 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from music.models import FeatureCacheEntry
+
+HITS_KEY = 'feature_cache:hits'
+MISSES_KEY = 'feature_cache:misses'
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of the file's bytes, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as audio:
+        for chunk in iter(lambda: audio.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def _encode(features):
+    # The entry is JSON; the packed feature vector is stored as hex
+    if features.get('vector') is None:
+        return features
+    return {**features, 'vector': bytes(features['vector']).hex()}
+
+
+def _decode(features):
+    if features.get('vector') is None:
+        return features
+    return {**features, 'vector': bytes.fromhex(features['vector'])}
+
+
+def get_cached_features(content_hash, extractor_version):
+    """
+    Return the stored features for this audio content, or None.
+
+    A hit refreshes the entry's position in the LRU order.
+    """
+    entry = FeatureCacheEntry.objects.filter(
+        content_hash=content_hash,
+        extractor_version=extractor_version,
+    ).only('id', 'features').first()
+
+    if entry is None:
+        _count(MISSES_KEY)
+        return None
+
+    FeatureCacheEntry.objects.filter(pk=entry.pk).update(
+        hits=F('hits') + 1,
+        last_used_at=timezone.now(),
+    )
+    _count(HITS_KEY)
+    return _decode(entry.features)
+
+
+def store_features(content_hash, extractor_version, features):
+    """
+    Cache features for this audio content, evicting the least recently used
+    entries once FEATURE_CACHE_MAX_ENTRIES is exceeded.
+    """
+    FeatureCacheEntry.objects.bulk_create(
+        [FeatureCacheEntry(
+            content_hash=content_hash,
+            extractor_version=extractor_version,
+            features=_encode(features),
+            last_used_at=timezone.now(),
+        )],
+        ignore_conflicts=True,
+    )
+
+    excess = FeatureCacheEntry.objects.count() - settings.FEATURE_CACHE_MAX_ENTRIES
+    if excess > 0:
+        stale = FeatureCacheEntry.objects.order_by('last_used_at').values_list('id', flat=True)[:excess]
+        FeatureCacheEntry.objects.filter(id__in=list(stale)).delete()
+
+
+def cache_stats():
+    """
+    Hit/miss counters and current size of the feature cache. Lookups are
+    counted by the Celery workers, so without a shared cache the counters
+    are unknown (None) here.
+    """
+    if not settings.CACHE_SHARED:
+        hits = misses = ratio = None
+    else:
+        hits = cache.get(HITS_KEY, 0)
+        misses = cache.get(MISSES_KEY, 0)
+        lookups = hits + misses
+        ratio = hits / lookups if lookups else 0.0
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': ratio,
+        'entries': FeatureCacheEntry.objects.count(),
+        'max_entries': settings.FEATURE_CACHE_MAX_ENTRIES,
+    }
@@ -0,0 +1,55 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from music.similarity import approved_vectors, last_change_id, prune_feature_changes
+from music.utils import ann
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the approximate nearest-neighbour index of approved tracks' "
+        "feature vectors and publish it for the similar-tracks endpoint. "
+        "Changes logged after the build are served from each process's delta; "
+        "when the build is the served one, the change log up to it is deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', type=int, default=8,
+                            help="Number of hash tables (more: higher recall, bigger index)")
+        parser.add_argument('--bits', type=int, default=None,
+                            help="Hyperplanes per table (default: ~32 tracks per bucket)")
+        parser.add_argument('--output', default=None,
+                            help="Index directory (default: SIMILARITY_INDEX_DIR)")
+        parser.add_argument('--keep', type=int, default=2,
+                            help="Number of builds to keep on disk")
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.SIMILARITY_INDEX_DIR
+        started = time.perf_counter()
+
+        # Taken before reading the vectors, so nothing logged meanwhile is lost
+        watermark = last_change_id()
+        ids, matrix = approved_vectors()
+        loaded = time.perf_counter()
+
+        build_dir = ann.build(
+            path, ids, matrix,
+            tables=options['tables'],
+            bits=options['bits'],
+            meta={'watermark': watermark},
+        )
+        ann.prune(path, keep=options['keep'])
+        # Only the served index absorbs the logged changes: a build elsewhere
+        # (a trial, a scratch directory) leaves the log to the processes
+        served = os.path.realpath(path) == os.path.realpath(settings.SIMILARITY_INDEX_DIR)
+        pruned = prune_feature_changes(watermark) if served else 0
+        finished = time.perf_counter()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Published {build_dir} with {len(ids)} tracks "
+            f"(load {loaded - started:.1f}s, build {finished - loaded:.1f}s, watermark {watermark}, "
+            f"{pruned} logged changes pruned)."
+        ))
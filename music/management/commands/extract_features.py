@@ -0,0 +1,246 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+
+from music.models import JobCheckpoint, Track, TrackFeature
+from music.signals import enqueue_feature_batches
+from music.similarity import record_feature_changes
+from music.tasks import fast_mode_options
+from music.utils.audio_files import local_audio_path
+from music.utils.feature_vectors import VECTOR_BYTES
+
+# music.utils.feature_extraction (librosa) is imported by the pool processes
+# that analyse tracks, so `manage.py help` and other commands don't load it.
+
+
+def analyse_track(job):
+    """
+    Worker entry point: extract features for one ``(track_id, path,
+    stream_min_seconds, fast_options)`` job.
+
+    Runs in a pool process without touching the database and returns
+    ``(track_id, features, error, decode_seconds, analyse_seconds)``.
+    Streaming decodes as it goes, so its time is reported as analysis.
+    """
+    from music.utils.feature_extraction import analyse, audio_duration, decode
+
+    track_id, file_path, stream_min_seconds, fast = job
+    decode_seconds = analyse_seconds = 0.0
+    try:
+        start = time.perf_counter()
+        stream = fast is None and audio_duration(file_path) >= stream_min_seconds
+        decoded = decode(file_path, stream=stream, fast=fast)
+        decode_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        features = analyse(file_path, decoded, stream=stream, fast=fast)
+        analyse_seconds = time.perf_counter() - start
+        return track_id, features, None, decode_seconds, analyse_seconds
+    except Exception as exc:
+        return track_id, None, str(exc), decode_seconds, analyse_seconds
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract TrackFeature rows for approved tracks that don't have one yet, "
+        "fanning the analysis out over a process pool. Progress is checkpointed, "
+        "so an interrupted run resumes where it stopped; tracks that failed are "
+        "kept in the checkpoint for --retry-failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Number of analysis processes (default: CPU count)")
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help="Tracks analysed and written per batch")
+        parser.add_argument('--mode', choices=['full', 'fast'], default=None,
+                            help="Analysis mode (default: FEATURE_EXTRACTION_MODE)")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Stop after this many tracks")
+        parser.add_argument('--checkpoint', default=None,
+                            help="Name of the checkpoint to resume from "
+                                 "(default: extract_features, or extract_feature_vectors with --backfill-vectors)")
+        parser.add_argument('--celery', action='store_true',
+                            help="Enqueue batch extraction tasks instead of analysing locally")
+        parser.add_argument('--reset', action='store_true',
+                            help="Ignore the stored checkpoint and start from the first track")
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Only reprocess the tracks the checkpoint lists as failed; "
+                                 "its position is left as it is")
+        parser.add_argument('--backfill-vectors', action='store_true',
+                            help="Re-extract tracks whose TrackFeature has no feature vector, "
+                                 "or one of an earlier layout")
+
+    def handle(self, *args, **options):
+        mode = options['mode'] or settings.FEATURE_EXTRACTION_MODE
+        backfill = options['backfill_vectors']
+        checkpoint_name = options['checkpoint'] or ('extract_feature_vectors' if backfill else 'extract_features')
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(name=checkpoint_name)
+        if options['reset']:
+            checkpoint.state = {}
+        last_track_id = checkpoint.state.get('last_track_id', 0)
+        failed = checkpoint.state.get('failed', [])
+        # Failed tracks being retried; those not reached yet stay listed
+        retrying = []
+        if options['retry_failed']:
+            if options['celery']:
+                raise CommandError("--retry-failed runs locally; drop --celery.")
+            retrying, failed = sorted(failed), []
+            self.stdout.write(f"Retrying {len(retrying)} failed tracks.")
+        elif last_track_id:
+            self.stdout.write(f"Resuming after track {last_track_id} ({len(failed)} failed so far).")
+
+        if backfill:
+            # Rows written before feature vectors were stored, or with an
+            # earlier vector layout
+            pending = Track.objects.filter(trackfeature__isnull=False).alias(
+                vector_bytes=Length('trackfeature__vector'),
+            ).filter(
+                Q(trackfeature__vector__isnull=True) | ~Q(vector_bytes=VECTOR_BYTES),
+            ).order_by('id')
+        else:
+            pending = Track.objects.filter(
+                approval_status='approved',
+                trackfeature__isnull=True,
+            ).order_by('id')
+        if options['retry_failed']:
+            pending = pending.filter(id__in=retrying)
+
+        if options['celery']:
+            if backfill:
+                raise CommandError("--backfill-vectors runs locally; drop --celery.")
+            return self.enqueue(pending, checkpoint, last_track_id, options)
+
+        timings = dict.fromkeys(['query', 'decode', 'analyse', 'write'], 0.0)
+        processed = written = missing = 0
+        started = time.perf_counter()
+
+        # Pool processes are forked from this one; don't let them inherit
+        # open database connections.
+        connections.close_all()
+        cursor = 0 if options['retry_failed'] else last_track_id
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while options['limit'] is None or processed < options['limit']:
+                batch_size = options['batch_size']
+                if options['limit'] is not None:
+                    batch_size = min(batch_size, options['limit'] - processed)
+
+                stage = time.perf_counter()
+                tracks = list(pending.filter(id__gt=cursor)[:batch_size])
+                timings['query'] += time.perf_counter() - stage
+                if not tracks:
+                    if retrying:
+                        # The others have been extracted since, or lost their file
+                        checkpoint.state = {'last_track_id': last_track_id, 'failed': failed}
+                        checkpoint.save(update_fields=['state', 'updated_at'])
+                    break
+
+                jobs = []
+                for track in tracks:
+                    file_path = local_audio_path(track)
+                    if file_path is None:
+                        missing += 1
+                    else:
+                        jobs.append((
+                            track.id,
+                            file_path,
+                            settings.FEATURE_EXTRACTION_STREAM_MIN_SECONDS,
+                            fast_mode_options(track, mode),
+                        ))
+
+                features = []
+                for track_id, values, error, decode_seconds, analyse_seconds in pool.map(analyse_track, jobs):
+                    timings['decode'] += decode_seconds
+                    timings['analyse'] += analyse_seconds
+                    if error is not None:
+                        failed.append(track_id)
+                        self.stderr.write(f"Track {track_id}: {error}")
+                    else:
+                        features.append(TrackFeature(track_id=track_id, **values))
+
+                stage = time.perf_counter()
+                with transaction.atomic():
+                    if backfill:
+                        self.update_features(features)
+                    else:
+                        TrackFeature.objects.bulk_create(features, ignore_conflicts=True)
+                    # Bulk writes send no signals; log them for the similarity index
+                    record_feature_changes([feature.track_id for feature in features])
+                cursor = tracks[-1].id
+                if not options['retry_failed']:
+                    last_track_id = cursor
+                checkpoint.state = {
+                    'last_track_id': last_track_id,
+                    'failed': failed + [track_id for track_id in retrying if track_id > cursor],
+                }
+                checkpoint.save(update_fields=['state', 'updated_at'])
+                timings['write'] += time.perf_counter() - stage
+
+                processed += len(tracks)
+                written += len(features)
+                self.stdout.write(f"Processed {processed} tracks (last id {cursor}).")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {written} features written, {len(failed)} failed in total, "
+            f"{missing} without a local audio file."
+        ))
+        self.stdout.write(
+            f"Throughput: {processed / elapsed if elapsed else 0.0:.2f} tracks/sec "
+            f"({processed} tracks in {elapsed:.1f}s, {options['workers']} workers, {mode} mode)"
+        )
+        # Decode and analysis time is summed over all worker processes
+        for stage, seconds in timings.items():
+            self.stdout.write(f"  {stage:<8} {seconds:8.2f}s")
+
+    def update_features(self, features):
+        """
+        Overwrite existing TrackFeature rows with freshly extracted values.
+        """
+        ids = dict(
+            TrackFeature.objects.filter(track_id__in=[feature.track_id for feature in features])
+            .values_list('track_id', 'id')
+        )
+        for feature in features:
+            feature.id = ids[feature.track_id]
+        fields = [field.name for field in TrackFeature._meta.concrete_fields if field.name not in ('id', 'track')]
+        TrackFeature.objects.bulk_update(features, fields)
+
+    def enqueue(self, pending, checkpoint, last_track_id, options):
+        """
+        Hand the pending tracks to Celery workers as batch extraction tasks,
+        in ``--mode`` if given.
+        """
+        started = time.perf_counter()
+        ids = pending.filter(id__gt=last_track_id).values_list('id', flat=True)
+        if options['limit'] is not None:
+            ids = ids[:options['limit']]
+
+        enqueued = 0
+        batch = []
+        for track_id in ids.iterator(chunk_size=options['batch_size']):
+            batch.append(track_id)
+            if len(batch) == options['batch_size']:
+                enqueued += self.enqueue_batch(batch, checkpoint, options['mode'])
+                batch = []
+        if batch:
+            enqueued += self.enqueue_batch(batch, checkpoint, options['mode'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Enqueued {enqueued} tracks in {elapsed:.1f}s "
+            f"(tasks of up to {settings.FEATURE_BATCH_SIZE} tracks)."
+        ))
+
+    def enqueue_batch(self, track_ids, checkpoint, mode):
+        # Without --mode the workers apply their own FEATURE_EXTRACTION_MODE
+        enqueue_feature_batches(track_ids, mode=mode)
+        checkpoint.state = {**checkpoint.state, 'last_track_id': track_ids[-1]}
+        checkpoint.save(update_fields=['state', 'updated_at'])
+        return len(track_ids)
@@ -0,0 +1,73 @@
+import collections
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from music.models import TrackFeature
+from music.utils.moods import classify_moods
+
+VALUE_FIELDS = ['valence', 'tempo', 'energy', 'acousticness', 'speechiness']
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute TrackFeature.mood from the stored feature values with the "
+        "current mood rules, without touching any audio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help="Rows read and relabelled per chunk")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report the changes without writing them")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        started = time.perf_counter()
+        scanned = 0
+        changes = collections.Counter()
+        last_id = 0
+
+        while True:
+            # Keyset pagination on the primary key: each chunk is one
+            # indexed range scan, however deep into the table we are.
+            rows = list(
+                TrackFeature.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'mood', *VALUE_FIELDS)[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            scanned += len(rows)
+
+            ids, old_moods, *columns = zip(*rows)
+            new_moods = classify_moods(*(np.array(column, dtype=np.float64) for column in columns))
+            old_moods = np.array(old_moods)
+            changed = np.flatnonzero(new_moods != old_moods)
+            if not changed.size:
+                continue
+
+            # One UPDATE per target mood rather than one per row
+            ids = np.array(ids)
+            by_mood = collections.defaultdict(list)
+            for index in changed:
+                by_mood[new_moods[index]].append(int(ids[index]))
+                changes[(old_moods[index], new_moods[index])] += 1
+
+            if not options['dry_run']:
+                with transaction.atomic():
+                    for mood, mood_ids in by_mood.items():
+                        TrackFeature.objects.filter(id__in=mood_ids).update(mood=mood)
+
+        elapsed = time.perf_counter() - started
+        total_changed = sum(changes.values())
+        verb = "Would relabel" if options['dry_run'] else "Relabelled"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {total_changed} of {scanned} tracks in {elapsed:.2f}s "
+            f"({scanned / elapsed if elapsed else 0.0:.0f} rows/sec)."
+        ))
+        for (old, new), count in changes.most_common():
+            self.stdout.write(f"  {old} -> {new}: {count}")
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from music.counters import recount
+from music.models import Track
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute TrackStatistics play/like/comment counts from ListeningHistory "
+        "and Interaction rows, chunk by chunk, and correct the rows that drifted "
+        "from the write-behind counters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Tracks recounted per transaction")
+        parser.add_argument('--start-id', type=int, default=0, help="Only tracks with a higher id")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        last_id = options['start_id']
+        tracks = corrected = 0
+        while True:
+            track_ids = list(
+                Track.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['chunk_size']]
+            )
+            if not track_ids:
+                break
+            corrected += recount(track_ids)
+            tracks += len(track_ids)
+            last_id = track_ids[-1]
+            self.stdout.write(f"Recounted {tracks} tracks (last id {last_id}), {corrected} corrected.")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {corrected} of {tracks} tracks corrected in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from music.rollups import rollup_plays
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold ListeningHistory rows newer than the stored high-water mark into the "
+        "hourly and daily play rollups per track and per artist. The same job runs "
+        "periodically from Celery beat; use this for the initial backfill."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000,
+                            help="ListeningHistory ids folded per transaction")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        batches, listen_id = rollup_plays(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {batches} batches through listen {listen_id} in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0006_jobcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('extractor_version', models.CharField(max_length=20)),
+                ('features', models.JSONField()),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-last_used_at'],
+                'unique_together': {('content_hash', 'extractor_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0007_featurecacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackfeature',
+            name='vector',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0009_featurechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='music.track')),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='music.track')),
+            ],
+            options={
+                'ordering': ['track', 'rank'],
+                'unique_together': {('track', 'rank')},
+            },
+        ),
+    ]
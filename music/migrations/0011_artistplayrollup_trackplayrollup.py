@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0010_trackneighbour'),
+        ('users', '0004_alter_user_options_alter_follow_unique_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistPlayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('artist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='play_rollups', to='users.artist')),
+            ],
+            options={
+                'ordering': ['artist', 'period', 'bucket'],
+                'unique_together': {('artist', 'period', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TrackPlayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('plays', models.PositiveIntegerField(default=0)),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='play_rollups', to='music.track')),
+            ],
+            options={
+                'ordering': ['track', 'period', 'bucket'],
+                'unique_together': {('track', 'period', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_artistplayrollup_trackplayrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackTrending',
+            fields=[
+                ('track', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='music.track')),
+                ('score', models.FloatField()),
+                ('genre', models.CharField(blank=True, max_length=50, null=True)),
+                ('mood', models.CharField(blank=True, max_length=20, null=True)),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['-score'], name='music_trending_score_idx'), models.Index(fields=['genre', '-score'], name='music_trending_genre_idx'), models.Index(fields=['mood', '-score'], name='music_trending_mood_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0012_tracktrending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listeninghistory',
+            name='event_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='listeninghistory',
+            name='listened_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    # The best known value for existing tracks
+    Track = apps.get_model('music', 'Track')
+    Track.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0013_listeninghistory_event_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='track',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['approval_status', 'updated_at'], name='music_track_status_upd_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_listened_at(apps, schema_editor):
+    # Rows so far were written as they were played
+    ListeningHistory = apps.get_model('music', 'ListeningHistory')
+    ListeningHistory.objects.update(recorded_at=models.F('listened_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0014_track_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listeninghistory',
+            name='recorded_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_listened_at, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from users.models import Artist
 from django.conf import settings
 
@@ -26,9 +27,15 @@ class Track(models.Model):
     )
     rejection_reason = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # ETag / Last-Modified of the track's resources
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # COUNT and MAX(updated_at) of the visible tracks from the index alone
+            models.Index(fields=['approval_status', 'updated_at'], name='music_track_status_upd_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -56,6 +63,8 @@ class TrackFeature(models.Model):
     acousticness     = models.FloatField()
     liveness         = models.FloatField()
     mood             = models.CharField(max_length=20, choices=MOOD_CHOICES, db_index=True)
+    # Packed float32 feature vector (layout in music.utils.feature_vectors)
+    vector           = models.BinaryField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['track']
@@ -98,7 +107,12 @@ class Interaction(models.Model):
 class ListeningHistory(models.Model):
     user        = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     track       = models.ForeignKey(Track, on_delete=models.CASCADE)
-    listened_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # A default rather than auto_now_add: buffered plays keep their play time
+    listened_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # When the row was written; later than listened_at for buffered plays
+    recorded_at = models.DateTimeField(auto_now_add=True)
+    # Set on buffered plays, so a batch delivered twice is written once
+    event_id    = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         ordering = ['-listened_at']
@@ -113,4 +127,116 @@ class TrackStatistics(models.Model):
     updated_at     = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
-        ordering = ['-updated_at']
\ No newline at end of file
+        ordering = ['-updated_at']
+
+# Job Checkpoint Model (progress of resumable batch jobs)
+class JobCheckpoint(models.Model):
+    name       = models.CharField(max_length=100, unique=True)
+    state      = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+# Feature Cache Model (features keyed by audio content hash)
+class FeatureCacheEntry(models.Model):
+    content_hash      = models.CharField(max_length=64)
+    extractor_version = models.CharField(max_length=20)
+    features          = models.JSONField()
+    hits              = models.PositiveIntegerField(default=0)
+    last_used_at      = models.DateTimeField(db_index=True)
+    created_at        = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'extractor_version')
+        ordering = ['-last_used_at']
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.extractor_version})"
+
+
+# Feature Change Model (log of tracks whose similarity vector may have changed)
+class FeatureChange(models.Model):
+    # Plain id rather than a foreign key: deletions are logged too
+    track_id   = models.PositiveIntegerField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Track {self.track_id} @ {self.created_at}"
+
+
+# Track Neighbour Model (precomputed "listeners also played" lists)
+class TrackNeighbour(models.Model):
+    track     = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='+')
+    rank      = models.PositiveSmallIntegerField()
+    score     = models.FloatField()
+
+    class Meta:
+        # Also the index serving a track's list in rank order
+        unique_together = ('track', 'rank')
+        ordering = ['track', 'rank']
+
+    def __str__(self):
+        return f"{self.track_id} -> {self.neighbour_id} (#{self.rank})"
+
+
+# Play Rollup Models (plays per track / per artist in hourly and daily buckets)
+ROLLUP_PERIODS = [
+    ('hour', 'Hour'),
+    ('day',  'Day'),
+]
+
+
+class TrackPlayRollup(models.Model):
+    track  = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='play_rollups')
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    bucket = models.DateTimeField()
+    plays  = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # The conflict target of the rollup upsert and the time-series index
+        unique_together = ('track', 'period', 'bucket')
+        ordering = ['track', 'period', 'bucket']
+
+    def __str__(self):
+        return f"{self.track_id} {self.period} {self.bucket:%Y-%m-%d %H:00}: {self.plays}"
+
+
+class ArtistPlayRollup(models.Model):
+    artist = models.ForeignKey(Artist, on_delete=models.CASCADE, related_name='play_rollups')
+    period = models.CharField(max_length=4, choices=ROLLUP_PERIODS)
+    bucket = models.DateTimeField()
+    plays  = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('artist', 'period', 'bucket')
+        ordering = ['artist', 'period', 'bucket']
+
+    def __str__(self):
+        return f"{self.artist_id} {self.period} {self.bucket:%Y-%m-%d %H:00}: {self.plays}"
+
+
+# Track Trending Model (forward-decayed popularity score per track)
+class TrackTrending(models.Model):
+    track = models.OneToOneField(Track, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    # Relative to the trending job's landmark; see music/trending.py
+    score = models.FloatField()
+    # Copied from Track/TrackFeature so a filtered top-N is one index range
+    genre = models.CharField(max_length=50, blank=True, null=True)
+    mood  = models.CharField(max_length=20, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='music_trending_score_idx'),
+            models.Index(fields=['genre', '-score'], name='music_trending_genre_idx'),
+            models.Index(fields=['mood', '-score'], name='music_trending_mood_idx'),
+        ]
+        ordering = ['-score']
+
+    def __str__(self):
+        return f"{self.track_id}: {self.score:.3f}"
@@ -0,0 +1,199 @@
+import json
+import logging
+import uuid
+
+import redis
+from celery import current_app
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from music.models import ListeningHistory, Track
+
+# Buffered listening history (LISTENING_HISTORY_MODE = 'buffered').
+#
+# A play is appended to a Redis list and the request returns; a consumer
+# task later writes the buffered plays with bulk_create. Delivery is
+# at-least-once: the consumer moves a batch to a processing list in one
+# atomic step and only deletes it after the rows have committed. A consumer
+# that dies mid-batch leaves the list behind, and the next run writes it
+# first. Each play carries an event_id, unique in ListeningHistory, so a
+# batch written twice is stored once.
+#
+# Back-pressure: once the buffer holds LISTEN_BUFFER_MAX_LENGTH plays, or
+# Redis can't be reached, enqueue() refuses and callers write synchronously.
+BUFFER_KEY = 'listen_buffer'
+PROCESSING_KEY = 'listen_buffer:processing'
+LOCK_KEY = 'listen_buffer:lock'
+
+DRAIN_TASK = 'music.tasks.drain_listen_buffer'
+
+# Append unless the buffer is full; returns the new length, or -1
+_PUSH = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+    return -1
+end
+return redis.call('RPUSH', KEYS[1], unpack(ARGV, 2))
+"""
+# Move up to ARGV[1] plays from the buffer to the processing list
+_TAKE = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+# Release the consumer lock only if this run still holds it
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+logger = logging.getLogger('music')
+
+_state = {'client': None, 'scripts': None}
+
+
+def enabled():
+    return settings.LISTENING_HISTORY_MODE == 'buffered'
+
+
+def _redis():
+    if _state['client'] is None:
+        client = redis.Redis.from_url(
+            settings.LISTEN_BUFFER_URL,
+            socket_timeout=settings.LISTEN_BUFFER_TIMEOUT,
+            socket_connect_timeout=settings.LISTEN_BUFFER_TIMEOUT,
+        )
+        _state['scripts'] = {
+            name: client.register_script(source)
+            for name, source in [('push', _PUSH), ('take', _TAKE), ('release', _RELEASE)]
+        }
+        _state['client'] = client
+    return _state['client'], _state['scripts']
+
+
+def play_event(user_id, track_id):
+    return {
+        'event_id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'track_id': track_id,
+        'listened_at': timezone.now().isoformat(),
+    }
+
+
+def enqueue(events):
+    """
+    Append play events (see ``play_event``) to the buffer. Returns False,
+    having buffered none of them, when the buffer is full or Redis is
+    unavailable; the caller should then write them itself.
+    """
+    try:
+        client, scripts = _redis()
+        length = scripts['push'](
+            keys=[BUFFER_KEY],
+            args=[settings.LISTEN_BUFFER_MAX_LENGTH, *(json.dumps(event) for event in events)],
+        )
+    except redis.RedisError as exc:
+        logger.warning(f"Listen buffer unavailable, writing plays synchronously: {exc}")
+        return False
+    if length < 0:
+        logger.warning("Listen buffer full, writing plays synchronously.")
+        return False
+
+    # Don't wait for the next scheduled drain once a full batch is waiting
+    batch = settings.LISTEN_BUFFER_BATCH_SIZE
+    if length // batch > (length - len(events)) // batch:
+        current_app.send_task(DRAIN_TASK)
+    return True
+
+
+def write_plays(events):
+    """
+    Write buffered play events with bulk_create in one transaction,
+    skipping events already written and plays of tracks or users deleted
+    since. Returns the rows written.
+    """
+    from music.events import count_events
+
+    by_id = {}
+    for event in events:
+        by_id[uuid.UUID(event['event_id'])] = event
+    written = set(ListeningHistory.objects.filter(event_id__in=list(by_id)).values_list('event_id', flat=True))
+    pending = [(event_id, event) for event_id, event in by_id.items() if event_id not in written]
+    tracks = set(Track.objects.filter(id__in={event['track_id'] for _, event in pending}).values_list('id', flat=True))
+    users = set(
+        get_user_model().objects.filter(id__in={event['user_id'] for _, event in pending})
+        .values_list('id', flat=True)
+    )
+    rows = [
+        ListeningHistory(
+            event_id=event_id,
+            user_id=event['user_id'],
+            track_id=event['track_id'],
+            listened_at=parse_datetime(event['listened_at']),
+        )
+        for event_id, event in pending
+        if event['track_id'] in tracks and event['user_id'] in users
+    ]
+    with transaction.atomic():
+        ListeningHistory.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        # Counted in the slot of recorded_at, set as they land: the slot of
+        # a late play's listened_at may be flushed already
+        transaction.on_commit(lambda: count_events(rows))
+    return rows
+
+
+def _decode(items):
+    events = []
+    for item in items:
+        try:
+            events.append(json.loads(item))
+        except ValueError:
+            logger.error(f"Dropping malformed buffered play: {item!r}")
+    return events
+
+
+def drain(max_batches=None):
+    """
+    Write buffered plays, LISTEN_BUFFER_BATCH_SIZE at a time, until the
+    buffer is empty (or after ``max_batches``). One consumer runs at a
+    time; a run that finds the lock taken returns at once. Returns the
+    number of plays written.
+    """
+    client, scripts = _redis()
+    token = uuid.uuid4().hex
+    if not client.set(LOCK_KEY, token, nx=True, ex=settings.LISTEN_BUFFER_LOCK_SECONDS):
+        return 0
+    written = batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            # A batch left behind by a consumer that died goes first
+            items = client.lrange(PROCESSING_KEY, 0, -1)
+            if not items:
+                items = scripts['take'](
+                    keys=[BUFFER_KEY, PROCESSING_KEY],
+                    args=[settings.LISTEN_BUFFER_BATCH_SIZE],
+                )
+            if not items:
+                break
+            written += len(write_plays(_decode(items)))
+            client.delete(PROCESSING_KEY)
+            client.expire(LOCK_KEY, settings.LISTEN_BUFFER_LOCK_SECONDS)
+            batches += 1
+    finally:
+        scripts['release'](keys=[LOCK_KEY], args=[token])
+    return written
+
+
+def backlog():
+    """
+    Plays waiting in the buffer, including a batch being written.
+    """
+    client, _ = _redis()
+    return client.llen(BUFFER_KEY) + client.llen(PROCESSING_KEY)
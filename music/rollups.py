@@ -0,0 +1,115 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from music.models import ArtistPlayRollup, JobCheckpoint, ListeningHistory, TrackPlayRollup
+
+CHECKPOINT = 'play_rollups'
+
+# Buckets are UTC, whatever the reader's timezone
+PERIODS = {
+    'hour': (TruncHour, timedelta(hours=1)),
+    'day':  (TruncDay, timedelta(days=1)),
+}
+# Rollup table, its key column, and the ListeningHistory path to the key
+ROLLUPS = [
+    (TrackPlayRollup, 'track_id', 'track_id'),
+    (ArtistPlayRollup, 'artist_id', 'track__artist_id'),
+]
+
+
+def _upsert(model, column, path, period, rows):
+    """
+    Add the plays of ``rows`` to ``model``'s ``period`` buckets: one grouped
+    INSERT ... SELECT that increments the buckets already present.
+    """
+    truncate, _ = PERIODS[period]
+    grouped = (
+        rows.annotate(rollup_key=F(path), bucket=truncate('listened_at', tzinfo=dt_timezone.utc))
+        .order_by().values('rollup_key', 'bucket')
+        .annotate(total=Count('id'))
+    )
+    select_sql, params = grouped.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key = qn(column)
+    sql = (
+        f"INSERT INTO {table} ({key}, period, bucket, plays) "
+        f"SELECT grouped.rollup_key, %s, grouped.bucket, grouped.total FROM ({select_sql}) grouped"
+    )
+    if connection.vendor == 'mysql':
+        sql += " ON DUPLICATE KEY UPDATE plays = plays + grouped.total"
+    else:
+        # PostgreSQL and SQLite; SQLite needs the WHERE to parse the upsert
+        sql += f" WHERE true ON CONFLICT ({key}, period, bucket) DO UPDATE SET plays = {table}.plays + excluded.plays"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [period, *params])
+
+
+def settled_id(model, field, lag_seconds):
+    """
+    Highest id of ``model`` among rows written more than ``lag_seconds``
+    ago, by ``field``, the row's write time (not an event time: buffered
+    plays are written long after their listened_at, with new ids). Ids are
+    allocated before their transaction commits, so the newest rows can
+    still have gaps below them; incremental jobs never read past this id.
+    """
+    cutoff = timezone.now() - timedelta(seconds=lag_seconds)
+    # Walks the primary key down from the newest row: the scan stops at
+    # the first row older than the lag
+    return (
+        model.objects.filter(**{f'{field}__lt': cutoff})
+        .order_by('-id').values_list('id', flat=True).first()
+    ) or 0
+
+
+def rollup_plays(batch_size=50000):
+    """
+    Fold the ListeningHistory rows past the stored high-water mark into the
+    hourly and daily rollups, ``batch_size`` ids at a time. Each batch's
+    upserts and the new mark commit together, so a crash never counts a
+    row twice. Returns ``(batches, listen_id)``.
+    """
+    settled = settled_id(ListeningHistory, 'recorded_at', settings.ROLLUP_LAG_SECONDS)
+    batches = 0
+    while True:
+        with transaction.atomic():
+            JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+            checkpoint = JobCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+            start = checkpoint.state.get('listen_id', 0)
+            if start >= settled:
+                return batches, start
+            end = min(start + batch_size, settled)
+            rows = ListeningHistory.objects.filter(id__gt=start, id__lte=end)
+            for model, column, path in ROLLUPS:
+                for period in PERIODS:
+                    _upsert(model, column, path, period, rows)
+            checkpoint.state = {**checkpoint.state, 'listen_id': end}
+            checkpoint.save(update_fields=['state', 'updated_at'])
+        batches += 1
+
+
+def play_series(rollups, period, start, end):
+    """
+    ``[(bucket, plays)]`` for every ``period`` bucket from the one holding
+    ``start`` up to ``end``, with zeros where ``rollups`` (a rollup queryset
+    for one track or artist) has no row.
+    """
+    _, step = PERIODS[period]
+    start = start.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        start = start.replace(hour=0)
+    plays = dict(
+        rollups.filter(period=period, bucket__gte=start, bucket__lt=end).values_list('bucket', 'plays')
+    )
+    series = []
+    bucket = start
+    while bucket < end:
+        series.append((bucket, plays.get(bucket, 0)))
+        bucket += step
+    return series
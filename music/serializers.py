@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from music.models import Artist, Track, TrackFeature, Interaction, ListeningHistory, TrackStatistics
+from music.events import EVENT_TYPES
 from users.serializers import ArtistSerializer as BaseArtistSerializer
 
 # now in this file you can refer to UserArtistSerializer
@@ -23,13 +24,34 @@ class TrackSerializer(serializers.ModelSerializer):
         read_only_fields = ['approval_status', 'rejection_reason']
 
 
+class TrackCompactSerializer(serializers.ModelSerializer):
+    """
+    Tracks in lists and nested in other resources: no lyrics or moderation
+    notes (see /tracks/{id}/lyrics/ and the track detail).
+    """
+    class Meta:
+        model = Track
+        fields = [
+            'id', 'artist', 'title', 'genre', 'duration', 'demo_start_time',
+            'audio_url', 'artwork_url', 'approval_status', 'created_at',
+        ]
+        read_only_fields = fields
+
+
+class TrackLyricsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Track
+        fields = ['id', 'lyrics']
+        read_only_fields = fields
+
+
 # ----------------------------
 # Track Features
 # ----------------------------
 class TrackFeatureSerializer(serializers.ModelSerializer):
     class Meta:
         model = TrackFeature
-        fields = '__all__'
+        exclude = ['vector']
 
 
 # ----------------------------
@@ -50,11 +72,35 @@ class InteractionSerializer(serializers.ModelSerializer):
 # Listening History
 # ----------------------------
 class ListeningHistorySerializer(serializers.ModelSerializer):
-    track = TrackSerializer(read_only=True)
+    track = TrackCompactSerializer(read_only=True)
 
     class Meta:
         model = ListeningHistory
         fields = ['track', 'listened_at']
+        read_only_fields = ['listened_at']
+
+
+# ----------------------------
+# Event Batch (plain serializers: items are validated one by one and saved
+# with bulk_create, bypassing ModelSerializer)
+# ----------------------------
+class EventSerializer(serializers.Serializer):
+    type         = serializers.ChoiceField(choices=EVENT_TYPES)
+    track        = serializers.IntegerField(min_value=1)
+    comment_text = serializers.CharField(required=False)
+
+    def validate(self, data):
+        if data['type'] == 'comment' and not data.get('comment_text'):
+            raise serializers.ValidationError("Comment text is required for comment events.")
+        return data
+
+
+class EventBatchSerializer(serializers.Serializer):
+    events = EventSerializer(many=True)
+
+
+class PlaySerializer(serializers.Serializer):
+    track_id = serializers.IntegerField(min_value=1)
 
 
 # ----------------------------
@@ -1,22 +1,130 @@
-from django.db.models.signals import post_save
+import threading
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
-from music.models import Track
-from music.tasks import extract_features_task
+from backend.response_cache import invalidate
+from music.counters import INTERACTION_FIELDS, bump, unbump
+from music.models import Interaction, ListeningHistory, Track, TrackFeature
+from music.similarity import record_feature_changes
+from music.utils.audio_files import local_audio_path
+
+# Enqueued by name so web processes never import music.tasks and, through
+# it, librosa/numba; the audio stack is only loaded by Celery workers.
+EXTRACT_FEATURES_BATCH_TASK = 'music.tasks.extract_features_batch_task'
+
+# Tracks approved in the current transaction, per thread
+_pending = threading.local()
+
+
+def enqueue_feature_batches(track_ids, mode=None):
+    """
+    Enqueue batch extraction tasks of at most FEATURE_BATCH_SIZE tracks,
+    analysed in ``mode`` (default: the workers' FEATURE_EXTRACTION_MODE).
+    """
+    size = settings.FEATURE_BATCH_SIZE
+    for start in range(0, len(track_ids), size):
+        current_app.send_task(
+            EXTRACT_FEATURES_BATCH_TASK,
+            args=[track_ids[start:start + size]],
+            kwargs={'mode': mode},
+        )
+
+
+def _flush_pending():
+    track_ids, _pending.track_ids = _pending.track_ids, []
+    enqueue_feature_batches(track_ids)
+
+
+def _flush_registered():
+    # A rolled-back transaction discards its callbacks, so look for ours
+    # rather than trusting a leftover pending list.
+    return any(func is _flush_pending for _, func, _ in transaction.get_connection().run_on_commit)
+
 
 @receiver(post_save, sender=Track)
 def enqueue_feature_extraction(sender, instance, created, **kwargs):
     """
     When a Track is approved and has no features yet, enqueue a Celery task
     to extract features asynchronously.
+
+    Tracks approved within one transaction (e.g. a bulk moderation action)
+    are grouped into batch tasks that are sent once it commits.
     """
     if instance.approval_status == 'approved':
         # Only enqueue if no TrackFeature exists
         if not hasattr(instance, 'trackfeature'):
             # Ensure there's a local file to process
-            try:
-                file_path = instance.audio_file.path
-            except Exception:
+            if local_audio_path(instance) is None:
                 return
 
-            # Enqueue the background task
-            extract_features_task.delay(instance.id)
\ No newline at end of file
+            # Enqueue the background task after commit, batched with any
+            # other tracks approved in the same transaction
+            if not _flush_registered():
+                _pending.track_ids = [instance.id]
+                transaction.on_commit(_flush_pending)
+            elif instance.id not in _pending.track_ids:
+                _pending.track_ids.append(instance.id)
+
+
+@receiver(post_init, sender=Track)
+def remember_approval_status(sender, instance, **kwargs):
+    # Read from __dict__: touching a deferred field here would cost a query
+    instance._loaded_approval_status = instance.__dict__.get('approval_status')
+
+
+@receiver(post_save, sender=Track)
+def log_approval_change(sender, instance, created, **kwargs):
+    """
+    Log approval status changes for the similarity index. New tracks have
+    no feature vector yet; theirs is logged when it is written.
+    """
+    loaded = getattr(instance, '_loaded_approval_status', None)
+    instance._loaded_approval_status = instance.approval_status
+    if not created and loaded != instance.approval_status:
+        record_feature_changes([instance.id])
+
+
+@receiver(post_save, sender=Track)
+@receiver(post_delete, sender=Track)
+def invalidate_track_responses(sender, instance, **kwargs):
+    invalidate('tracks')
+
+
+@receiver(post_save, sender=TrackFeature)
+@receiver(post_delete, sender=TrackFeature)
+def log_feature_change(sender, instance, **kwargs):
+    record_feature_changes([instance.track_id])
+
+
+@receiver(post_save, sender=ListeningHistory)
+def count_play(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.track_id, 'plays_count', moment=instance.recorded_at)
+
+
+@receiver(post_save, sender=Interaction)
+def count_interaction(sender, instance, created, **kwargs):
+    field = INTERACTION_FIELDS.get(instance.interaction_type)
+    if created and field:
+        bump(instance.track_id, field, moment=instance.created_at)
+
+
+def _track_deleted(origin):
+    # Events removed along with their track: its statistics row goes too
+    return isinstance(origin, Track) or getattr(origin, 'model', None) is Track
+
+
+@receiver(post_delete, sender=ListeningHistory)
+def uncount_play(sender, instance, origin=None, **kwargs):
+    if not _track_deleted(origin):
+        unbump(instance.track_id, 'plays_count', instance.recorded_at)
+
+
+@receiver(post_delete, sender=Interaction)
+def uncount_interaction(sender, instance, origin=None, **kwargs):
+    field = INTERACTION_FIELDS.get(instance.interaction_type)
+    if field and not _track_deleted(origin):
+        unbump(instance.track_id, field, instance.created_at)
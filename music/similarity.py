@@ -0,0 +1,205 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+
+from music.models import FeatureChange, TrackFeature
+from music.utils import ann
+from music.utils.feature_vectors import load_matrix
+from music.utils.similarity import VectorIndex, merge
+
+# One searcher per process, shared by its threads
+_lock = threading.Lock()
+_state = {'searcher': None, 'checked_at': 0.0}
+
+
+def record_feature_changes(track_ids):
+    """
+    Log tracks whose vector or approval status changed, so every process
+    holding an index picks them up on its next refresh. Bulk writes call
+    this directly; single saves are logged by signals.
+    """
+    FeatureChange.objects.bulk_create([FeatureChange(track_id=track_id) for track_id in track_ids])
+
+
+def last_change_id():
+    return FeatureChange.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def prune_feature_changes(watermark):
+    """
+    Delete the logged changes a published build covers (up to its
+    ``watermark``). Call once the build is current: every process switches
+    to it on its next refresh, before reading changes again. Returns the
+    number of rows deleted.
+    """
+    # The row at the watermark stays, so later ids keep counting up from it
+    # (MySQL before 8.0 restarts an emptied table's ids at 1 after a reboot)
+    deleted, _ = FeatureChange.objects.filter(id__lt=watermark).delete()
+    return deleted
+
+
+def approved_vectors(track_ids=None):
+    """
+    ``(ids, matrix)`` of the approved tracks with a feature vector,
+    optionally restricted to ``track_ids``.
+    """
+    rows = TrackFeature.objects.filter(track__approval_status='approved', vector__isnull=False)
+    if track_ids is not None:
+        rows = rows.filter(track_id__in=track_ids)
+    return load_matrix(rows.values_list('track_id', 'vector').iterator(chunk_size=10000))
+
+
+def _changes_since(watermark):
+    """
+    Track ids logged after ``watermark`` and the new watermark.
+    """
+    changes = list(
+        FeatureChange.objects.filter(id__gt=watermark)
+        .order_by('id')
+        .values_list('id', 'track_id')
+    )
+    if not changes:
+        return set(), watermark
+    return {track_id for _, track_id in changes}, changes[-1][0]
+
+
+class _BruteForceSearcher:
+    """
+    Exact search over an in-memory matrix of every approved track.
+    """
+
+    def __init__(self):
+        # Read the watermark first: a change logged while the vectors load
+        # is applied again on the next refresh rather than missed.
+        self.watermark = last_change_id()
+        self.index = VectorIndex(*approved_vectors())
+
+    def refresh(self):
+        if ann.current_build(settings.SIMILARITY_INDEX_DIR) is not None:
+            return _open_searcher()
+        changed, watermark = _changes_since(self.watermark)
+        if not changed:
+            return self
+        if len(changed) > settings.SIMILARITY_REBUILD_FRACTION * max(len(self.index), 1):
+            return _BruteForceSearcher()
+        ids, matrix = approved_vectors(changed)
+        self.index.upsert(ids, matrix)
+        # Unapproved, deleted or without a vector now
+        self.index.remove(sorted(changed - set(ids.tolist())))
+        self.watermark = watermark
+        return self
+
+    def standardise(self, vector):
+        return self.index.standardise(vector)
+
+    def vector(self, track_id):
+        return self.index.vector(track_id)
+
+    def search(self, query, k, metric, probes, exclude):
+        return self.index.search(query, k=k, metric=metric, exclude=exclude)
+
+
+class _ANNSearcher:
+    """
+    The published LSH build (memory-mapped, shared by every process) plus
+    an in-memory delta of the tracks changed since it was built. Changed
+    tracks are answered from the delta and masked out of the build.
+    """
+
+    def __init__(self, build_dir):
+        self.build = ann.LSHIndex(build_dir)
+        self.watermark = self.build.meta.get('watermark', 0)
+        self.changed = set()
+        self.excluded = np.zeros(0, dtype=np.int64)
+        self.delta = VectorIndex(
+            np.zeros(0, dtype=np.int64),
+            np.zeros((0, len(self.build.mean)), dtype=np.float32),
+            mean=self.build.mean,
+            std=self.build.std,
+        )
+        self.refresh()
+
+    def refresh(self):
+        build_dir = ann.current_build(settings.SIMILARITY_INDEX_DIR)
+        if build_dir != self.build.build_dir:
+            return _open_searcher()
+        changed, watermark = _changes_since(self.watermark)
+        if changed:
+            ids, matrix = approved_vectors(changed)
+            self.delta.upsert(ids, matrix)
+            self.delta.remove(sorted(changed - set(ids.tolist())))
+            self.changed |= changed
+            self.excluded = np.array(sorted(self.changed), dtype=np.int64)
+            self.watermark = watermark
+        return self
+
+    def standardise(self, vector):
+        return self.build.standardise(vector)
+
+    def vector(self, track_id):
+        if track_id in self.changed:
+            return self.delta.vector(track_id)
+        return self.build.vector(track_id)
+
+    def search(self, query, k, metric, probes, exclude):
+        excluded = np.union1d(self.excluded, np.asarray(exclude, dtype=np.int64))
+        return merge([
+            self.build.search(query, k=k, metric=metric, probes=probes, exclude=excluded),
+            self.delta.search(query, k=k, metric=metric, exclude=exclude),
+        ], k)
+
+
+def _open_searcher():
+    build_dir = ann.current_build(settings.SIMILARITY_INDEX_DIR)
+    if build_dir is None:
+        return _BruteForceSearcher()
+    return _ANNSearcher(build_dir)
+
+
+def get_searcher():
+    """
+    This process's searcher, opened on first use and brought up to date
+    with the change log (and any newly published build) at most every
+    SIMILARITY_REFRESH_SECONDS. Call with ``_lock`` held.
+    """
+    now = time.monotonic()
+    if _state['searcher'] is None:
+        _state['searcher'] = _open_searcher()
+        _state['checked_at'] = now
+    elif now - _state['checked_at'] >= settings.SIMILARITY_REFRESH_SECONDS:
+        _state['searcher'] = _state['searcher'].refresh()
+        _state['checked_at'] = now
+    return _state['searcher']
+
+
+def similar_tracks(track_id, k=10, metric='cosine', probes=None):
+    """
+    Ids of the ``k`` approved tracks closest to ``track_id`` and their
+    distances, closest first; None when the track is not indexed (not
+    approved or no feature vector yet).
+
+    With a published ANN index, ``probes`` (default SIMILARITY_PROBES)
+    trades latency for recall; it is ignored by exact search.
+    """
+    probes = settings.SIMILARITY_PROBES if probes is None else probes
+    with _lock:
+        searcher = get_searcher()
+        query = searcher.vector(track_id)
+        if query is None:
+            return None
+        return searcher.search(query, k, metric, probes, exclude=[track_id])
+
+
+def similar_to_vector(vector, k=10, metric='cosine', probes=None, exclude=()):
+    """
+    Approved tracks closest to a raw (unstandardised) feature vector, e.g.
+    a listener's taste profile, leaving out the ids in ``exclude``.
+    """
+    probes = settings.SIMILARITY_PROBES if probes is None else probes
+    with _lock:
+        searcher = get_searcher()
+        query = searcher.standardise(np.asarray(vector, dtype=np.float32))
+        return searcher.search(query, k, metric, probes, exclude=exclude)
@@ -1,24 +1,218 @@
-import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from music.feature_cache import file_digest, get_cached_features, store_features
 from music.models import Track, TrackFeature
-from music.utils.feature_extraction import extract_features
+from music.similarity import record_feature_changes
+from music.utils.audio_files import local_audio_path
+from music.utils.moods import with_current_mood
+
+# music.utils.feature_extraction pulls in librosa (and numba, scipy, sklearn),
+# so it is imported inside the task bodies. Importing this module stays cheap;
+# only a worker that actually runs an extraction pays for the audio stack.
+
+logger = logging.getLogger('music')
+
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def extract_features_task(self, track_id):
+def fast_mode_options(track, mode):
+    """
+    Keyword arguments for ``extract_features_fast`` when ``mode`` is 'fast',
+    or None for a full analysis.
+    """
+    if mode == 'full':
+        return None
+    if mode != 'fast':
+        raise ValueError(f"Unknown feature extraction mode '{mode}'.")
+    return {
+        'start': float(track.demo_start_time),
+        'sr': settings.FEATURE_FAST_SAMPLE_RATE,
+        'excerpt_seconds': settings.FEATURE_FAST_EXCERPT_SECONDS,
+        'windows': settings.FEATURE_FAST_WINDOWS,
+    }
+
+
+def analysis_plan(track, file_path, mode):
+    """
+    How to analyse one track: the ``decode``/``analyse`` options and the
+    extractor version used as its feature cache key.
+    """
+    from music.utils.feature_extraction import EXTRACTOR_VERSION, audio_duration
+
+    fast = fast_mode_options(track, mode)
+    if fast is not None:
+        version = '-'.join([EXTRACTOR_VERSION, 'fast', *(str(value) for value in fast.values())])
+        return {'stream': False, 'fast': fast}, version
+
+    # Long uploads (DJ mixes, live sets) are analysed block by block so the
+    # worker's memory doesn't grow with the track length.
+    stream = audio_duration(file_path) >= settings.FEATURE_EXTRACTION_STREAM_MIN_SECONDS
+    return {'stream': stream, 'fast': None}, f"{EXTRACTOR_VERSION}-{'stream' if stream else 'full'}"
+
+
+@shared_task(bind=True, name='music.tasks.extract_features_task', max_retries=3, default_retry_delay=60)
+def extract_features_task(self, track_id, mode=None):
     """
     Celery task to extract and save TrackFeature for the given track.
+    ``mode`` is 'full' or 'fast' and defaults to FEATURE_EXTRACTION_MODE.
     Retries on failure up to 3 times.
     """
+    from music.utils.feature_extraction import analyse, decode
+
+    mode = mode or settings.FEATURE_EXTRACTION_MODE
     try:
         track = Track.objects.get(id=track_id)
-        file_path = track.audio_file.path
+        file_path = local_audio_path(track)
 
-        if not os.path.exists(file_path):
+        if file_path is None:
             # Nothing to do if file missing
             return
 
-        features = extract_features(file_path)
+        options, version = analysis_plan(track, file_path, mode)
+
+        # Re-uploads of the same master and retries reuse earlier results
+        content_hash = file_digest(file_path)
+        features = get_cached_features(content_hash, version)
+        if features is None:
+            features = analyse(file_path, decode(file_path, **options), **options)
+            store_features(content_hash, version, features)
+        else:
+            # Cached values may predate the current mood thresholds
+            features = with_current_mood(features)
+
         TrackFeature.objects.create(track=track, **features)
     except Exception as exc:
         # Retry on unexpected errors
-        raise self.retry(exc=exc)
\ No newline at end of file
+        raise self.retry(exc=exc)
+
+
+@shared_task(bind=True, name='music.tasks.extract_features_batch_task', max_retries=3, default_retry_delay=60)
+def extract_features_batch_task(self, track_ids, mode=None):
+    """
+    Extract and save TrackFeature rows for a batch of tracks.
+
+    Tracks are fetched in one query and the rows are written with one
+    bulk_create. While one track is analysed, a small thread pool hashes
+    and decodes the following files, so the worker's core isn't idle on
+    I/O. Tracks that fail are logged and skipped; the batch is only retried
+    when the query or the final write fails.
+    """
+    from music.utils.feature_extraction import analyse, decode
+
+    mode = mode or settings.FEATURE_EXTRACTION_MODE
+    try:
+        tracks = list(Track.objects.filter(id__in=track_ids, trackfeature__isnull=True))
+        jobs = []
+        for track in tracks:
+            file_path = local_audio_path(track)
+            if file_path is None:
+                continue
+            try:
+                # Reads the file's header: an unreadable upload fails here
+                options, version = analysis_plan(track, file_path, mode)
+            except Exception as exc:
+                logger.warning(f"Feature extraction failed for track {track.id}: {exc!r}")
+                continue
+            jobs.append((track, file_path, options, version))
+
+        features = []
+        prefetch = settings.FEATURE_BATCH_DECODE_THREADS
+        with ThreadPoolExecutor(max_workers=prefetch) as pool:
+            hashes = list(pool.map(file_digest, [file_path for _, file_path, _, _ in jobs]))
+
+            # Only cache misses need decoding
+            misses = []
+            for (track, file_path, options, version), content_hash in zip(jobs, hashes):
+                cached = get_cached_features(content_hash, version)
+                if cached is None:
+                    misses.append((track, file_path, options, version, content_hash))
+                else:
+                    features.append(TrackFeature(track=track, **with_current_mood(cached)))
+
+            # Keep at most `prefetch` decoded files in flight to bound memory
+            decoding = [
+                pool.submit(decode, file_path, **options)
+                for _, file_path, options, _, _ in misses[:prefetch]
+            ]
+            for index, (track, file_path, options, version, content_hash) in enumerate(misses):
+                upcoming = index + prefetch
+                if upcoming < len(misses):
+                    _, next_path, next_options, _, _ = misses[upcoming]
+                    decoding.append(pool.submit(decode, next_path, **next_options))
+                try:
+                    values = analyse(file_path, decoding[index].result(), **options)
+                except Exception as exc:
+                    logger.warning(f"Feature extraction failed for track {track.id}: {exc}")
+                    continue
+                finally:
+                    decoding[index] = None
+                store_features(content_hash, version, values)
+                features.append(TrackFeature(track=track, **values))
+
+        with transaction.atomic():
+            TrackFeature.objects.bulk_create(features, ignore_conflicts=True)
+            # bulk_create sends no post_save signals
+            record_feature_changes([feature.track_id for feature in features])
+    except Exception as exc:
+        raise self.retry(exc=exc)
+
+
+@shared_task(name='music.tasks.flush_track_statistics')
+def flush_track_statistics():
+    """
+    Apply the buffered play/like/comment counter deltas to TrackStatistics.
+    Scheduled by CELERY_BEAT_SCHEDULE.
+    """
+    from music.counters import flush
+
+    slots, tracks = flush()
+    if slots:
+        logger.info(f"Flushed track statistics: {slots} slots, {tracks} tracks.")
+    return {'slots': slots, 'tracks': tracks}
+
+
+@shared_task(name='music.tasks.rollup_plays')
+def rollup_plays():
+    """
+    Fold new ListeningHistory rows into the hourly and daily play rollups.
+    Scheduled by CELERY_BEAT_SCHEDULE.
+    """
+    from music.rollups import rollup_plays as fold
+
+    batches, listen_id = fold()
+    if batches:
+        logger.info(f"Rolled up plays through listen {listen_id} in {batches} batches.")
+    return {'batches': batches, 'listen_id': listen_id}
+
+
+@shared_task(name='music.tasks.update_trending')
+def update_trending():
+    """
+    Fold new listens and interactions into the trending scores.
+    Scheduled by CELERY_BEAT_SCHEDULE.
+    """
+    from music.trending import update_trending as fold
+
+    events = fold()
+    if events:
+        logger.info(f"Updated trending scores with {events} events.")
+    return {'events': events}
+
+
+@shared_task(name='music.tasks.drain_listen_buffer', ignore_result=True)
+def drain_listen_buffer():
+    """
+    Write buffered plays to ListeningHistory. Scheduled by
+    CELERY_BEAT_SCHEDULE in buffered mode, and sent early when a full batch
+    is waiting.
+    """
+    from music import play_buffer
+
+    if not play_buffer.enabled():
+        return 0
+    written = play_buffer.drain()
+    if written:
+        logger.info(f"Wrote {written} buffered plays.")
+    return written
@@ -1,3 +1,1351 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from io import StringIO
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+import librosa
+import numpy as np
+import soundfile
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from backend import celery as backend_celery
+from backend.testing import QueryBudgetTestCase
+from music import counters, feature_cache, play_buffer, similarity, trending
+from music.models import (
+    ArtistPlayRollup, FeatureCacheEntry, FeatureChange, Interaction, JobCheckpoint, ListeningHistory, Track,
+    TrackFeature, TrackNeighbour, TrackPlayRollup, TrackStatistics, TrackTrending,
+)
+from music.rollups import rollup_plays, settled_id
+from music.serializers import TrackCompactSerializer
+from music.tasks import extract_features_batch_task
+from music.similarity import last_change_id, record_feature_changes, similar_tracks
+from music.utils import ann, feature_extraction, feature_vectors, moods
+from music.utils.feature_vectors import VECTOR_BYTES, VECTOR_DTYPE, VECTOR_SIZE
+from music.utils.similarity import VectorIndex
+from users.models import Artist, User
+
+_serial = count()
+
+
+def make_user(role='listener'):
+    n = next(_serial)
+    return User.objects.create(username=f'user{n}', email=f'user{n}@example.com', role=role)
+
+
+def make_artist():
+    user = make_user(role='artist')
+    return Artist.objects.create(user=user, display_name=user.username, status='approved')
+
+
+def make_tracks(n, artist=None, approval_status='approved'):
+    artist = artist or make_artist()
+    return Track.objects.bulk_create([
+        Track(artist=artist, title=f'Track {next(_serial)}', audio_url='http://example.com/a.mp3',
+              lyrics='la la la', approval_status=approval_status)
+        for _ in range(n)
+    ])
+
+
+def flush_later(slots):
+    # Flush the counters as if ``slots`` slots had passed, closing the current one
+    later = timezone.now() + timedelta(seconds=slots * settings.TRACK_STATS_SLOT_SECONDS)
+    with mock.patch('music.counters.timezone.now', return_value=later):
+        return counters.flush()
+
+
+# ----------------------------
+# Query budgets: one query per page, not per row
+# ----------------------------
+class MusicQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.listener = make_user()
+        self.admin = make_user(role='admin')
+
+    def test_artists(self):
+        self.assertQueryBudget('/api/v1/artists/', 2, lambda n: [make_artist() for _ in range(n)])
+
+    def test_tracks(self):
+        self.assertQueryBudget('/api/v1/tracks/', 3, make_tracks)
+
+    def test_tracks_sparse(self):
+        self.assertQueryBudget('/api/v1/tracks/?fields=id,title,lyrics', 3, make_tracks)
+
+    def test_tracks_cursor(self):
+        self.assertQueryBudget('/api/v1/tracks/?pagination=cursor', 2, make_tracks)
+
+    def test_tracks_staff(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget('/api/v1/tracks/', 3, lambda n: make_tracks(n, approval_status='pending'))
+
+    def test_track_features(self):
+        def add(n):
+            TrackFeature.objects.bulk_create([
+                TrackFeature(track=track, danceability=0.5, energy=0.5, valence=0.5, tempo=120,
+                             speechiness=0.1, instrumentalness=0.1, acousticness=0.1, liveness=0.1,
+                             mood='happy')
+                for track in make_tracks(n)
+            ])
+        self.assertQueryBudget('/api/v1/track-features/', 2, add)
+
+    def test_interactions(self):
+        self.client.force_authenticate(self.listener)
+        def add(n):
+            Interaction.objects.bulk_create([
+                Interaction(user=self.listener, track=track, interaction_type='like')
+                for track in make_tracks(n)
+            ])
+        self.assertQueryBudget('/api/v1/interactions/', 2, add)
+
+    def test_listening_history(self):
+        self.client.force_authenticate(self.listener)
+        def add(n):
+            ListeningHistory.objects.bulk_create([
+                ListeningHistory(user=self.listener, track=track) for track in make_tracks(n)
+            ])
+        self.assertQueryBudget('/api/v1/listening-history/', 2, add)
+
+    def test_listening_history_cursor_sparse(self):
+        self.client.force_authenticate(self.listener)
+        def add(n):
+            ListeningHistory.objects.bulk_create([
+                ListeningHistory(user=self.listener, track=track) for track in make_tracks(n)
+            ])
+        self.assertQueryBudget('/api/v1/listening-history/?pagination=cursor&fields=track', 1, add)
+
+    def test_track_statistics(self):
+        def add(n):
+            TrackStatistics.objects.bulk_create([TrackStatistics(track=track) for track in make_tracks(n)])
+        self.assertQueryBudget('/api/v1/track-statistics/', 3, add)
+
+    def test_my_tracks(self):
+        artist = make_artist()
+        self.client.force_authenticate(artist.user)
+        self.assertQueryBudget('/api/v1/my-tracks/', 1, lambda n: make_tracks(n, artist=artist))
+
+    def test_tracks_by_artist(self):
+        artist = make_artist()
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(
+            f'/api/v1/moderate/artist/{artist.id}/tracks/', 1, lambda n: make_tracks(n, artist=artist),
+        )
+
+
+# ----------------------------
+# Keyset cursor pagination
+# ----------------------------
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.client.force_authenticate(make_user())
+        # Three listened_at values shared by 15 plays each: pages split ties
+        now = timezone.now()
+        user = make_user()
+        ListeningHistory.objects.bulk_create([
+            ListeningHistory(user=user, track=track, listened_at=now - timedelta(minutes=i % 3))
+            for i, track in enumerate(make_tracks(45))
+        ])
+        # One track per play, so the track identifies the row
+        self.expected = list(
+            ListeningHistory.objects.order_by('-listened_at', '-id').values_list('track_id', flat=True)
+        )
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.append([row['track']['id'] for row in response.data['results']])
+            url = response.data[link]
+        return ids
+
+    def test_pages_split_tied_sort_keys(self):
+        pages = self.walk('/api/v1/listening-history/?pagination=cursor', 'next')
+        self.assertEqual([len(page) for page in pages], [20, 20, 5])
+        self.assertEqual(sum(pages, []), self.expected)
+
+    def test_previous_links_walk_back_over_the_same_pages(self):
+        forward = self.walk('/api/v1/listening-history/?pagination=cursor', 'next')
+        last = self.client.get('/api/v1/listening-history/?pagination=cursor')
+        while last.data['next']:
+            last = self.client.get(last.data['next'])
+        backward = self.walk(last.data['previous'], 'previous')
+        self.assertEqual(backward[::-1], forward[:-1])
+
+    def test_malformed_cursor_not_found(self):
+        response = self.client.get('/api/v1/listening-history/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+# ----------------------------
+# Conditional GETs
+# ----------------------------
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.tracks = make_tracks(3)
+
+    def test_list_revalidated_by_etag(self):
+        response = self.client.get('/api/v1/tracks/')
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/v1/tracks/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Not the newest row: the latest modification time stays as it was
+        self.tracks[0].delete()
+        self.assertEqual(self.client.get('/api/v1/tracks/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_revalidated_by_etag_and_date(self):
+        url = f'/api/v1/tracks/{self.tracks[0].id}/'
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304,
+        )
+        Track.objects.filter(id=self.tracks[0].id).update(updated_at=timezone.now() + timedelta(seconds=5))
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200,
+        )
+
+
+# ----------------------------
+# Sparse fieldsets
+# ----------------------------
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        self.track = make_tracks(1)[0]
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        track_queries = [query['sql'] for query in queries if 'FROM "music_track"' in query['sql']]
+        return response.data, track_queries[-1]
+
+    def test_lists_are_compact(self):
+        data, sql = self.get('/api/v1/tracks/')
+        self.assertEqual(list(data['results'][0]), TrackCompactSerializer.Meta.fields)
+        self.assertNotIn('"lyrics"', sql)
+
+    def test_fields_select_only_their_columns(self):
+        data, sql = self.get('/api/v1/tracks/?fields=id,title')
+        self.assertEqual(list(data['results'][0]), ['id', 'title'])
+        self.assertNotIn('"audio_url"', sql)
+        # Fields outside the compact set come from the full serializer
+        data, _ = self.get('/api/v1/tracks/?fields=id,lyrics')
+        self.assertEqual(data['results'][0], {'id': self.track.id, 'lyrics': 'la la la'})
+
+    def test_omit_on_detail(self):
+        data, _ = self.get(f'/api/v1/tracks/{self.track.id}/?omit=lyrics,rejection_reason')
+        self.assertNotIn('lyrics', data)
+        self.assertIn('title', data)
+
+    def test_unknown_fields_rejected(self):
+        response = self.client.get('/api/v1/tracks/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.data['fields'])
+
+    def test_lyrics_endpoint(self):
+        data, sql = self.get(f'/api/v1/tracks/{self.track.id}/lyrics/')
+        self.assertEqual(data, {'id': self.track.id, 'lyrics': 'la la la'})
+        self.assertNotIn('"audio_url"', sql)
+
+
+# ----------------------------
+# Response cache
+# ----------------------------
+@override_settings(RESPONSE_CACHE_ENABLED=True, CACHE_SHARED=True)
+class ResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        make_tracks(2)
+
+    def get_tracks(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/tracks/')
+        return response.data['count'], len(queries)
+
+    def test_hits_until_invalidated(self):
+        self.assertEqual(self.get_tracks()[0], 2)
+        self.assertEqual(self.get_tracks(), (2, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            # Saved one by one: bulk_create sends no signal to invalidate on
+            Track.objects.create(artist=make_artist(), title='New', audio_url='http://example.com/a.mp3',
+                                 approval_status='approved')
+        count, queries = self.get_tracks()
+        self.assertEqual(count, 3)
+        self.assertGreater(queries, 0)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_bypassed_without_shared_cache(self):
+        self.get_tracks()
+        self.assertGreater(self.get_tracks()[1], 0)
+
+
+# ----------------------------
+# Track statistics counters
+# ----------------------------
+@override_settings(CACHE_SHARED=True)
+class TrackStatisticsCounterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.track = make_tracks(1)[0]
+
+    def counts(self):
+        stats = TrackStatistics.objects.filter(track=self.track).first()
+        return stats and (stats.plays_count, stats.likes_count, stats.comments_count)
+
+    def test_bump_then_flush(self):
+        counters.bump(self.track.id, 'plays_count')
+        counters.bump(self.track.id, 'plays_count')
+        counters.bump(self.track.id, 'likes_count')
+        counters.flush()
+        # The slot is still open
+        self.assertIsNone(self.counts())
+
+        flush_later(3)
+        self.assertEqual(self.counts(), (2, 1, 0))
+        # Applied once
+        flush_later(4)
+        self.assertEqual(self.counts(), (2, 1, 0))
+
+    def test_events_counted_through_signals(self):
+        listener = make_user()
+        ListeningHistory.objects.create(user=listener, track=self.track)
+        Interaction.objects.create(user=listener, track=self.track, interaction_type='comment', comment_text='!')
+        flush_later(3)
+        self.assertEqual(self.counts(), (1, 0, 1))
+
+    def test_recount_repairs_drift(self):
+        listener = make_user()
+        ListeningHistory.objects.bulk_create([ListeningHistory(user=listener, track=self.track)] * 3)
+        Interaction.objects.bulk_create([Interaction(user=listener, track=self.track, interaction_type='like')])
+        # bulk_create skips the signals: nothing was bumped
+        flush_later(3)
+        self.assertIsNone(self.counts())
+
+        self.assertEqual(counters.recount([self.track.id]), 1)
+        self.assertEqual(self.counts(), (3, 1, 0))
+        self.assertEqual(counters.recount([self.track.id]), 0)
+
+    def test_recount_leaves_pending_deltas_to_the_flush(self):
+        counters.flush()
+        ListeningHistory.objects.create(user=make_user(), track=self.track)
+        # Newer than the watermark: pending in the cache, not counted
+        self.assertEqual(counters.recount([self.track.id]), 0)
+        flush_later(3)
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    @override_settings(CACHE_SHARED=False)
+    def test_unshared_cache_updates_rows_directly(self):
+        counters.bump(self.track.id, 'plays_count')
+        self.assertEqual(self.counts(), (1, 0, 0))
+        ListeningHistory.objects.create(user=make_user(), track=self.track)
+        self.assertEqual(self.counts(), (2, 0, 0))
+        # One of the two plays has a row
+        self.assertEqual(counters.recount([self.track.id]), 1)
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+
+# ----------------------------
+# Event batches
+# ----------------------------
+@override_settings(LISTENING_HISTORY_MODE='sync', CACHE_SHARED=True)
+class EventBatchTests(APITestCase):
+    url = '/api/v1/events/batch/'
+
+    def setUp(self):
+        cache.clear()
+        self.listener = make_user()
+        self.client.force_authenticate(self.listener)
+        self.track = make_tracks(1)[0]
+        self.pending = make_tracks(1, approval_status='pending')[0]
+
+    def post(self, events):
+        return self.client.post(self.url, {'events': events}, format='json')
+
+    def test_results_follow_the_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([
+                {'type': 'play', 'track': self.track.id},
+                {'type': 'like', 'track': self.pending.id},
+                {'type': 'comment', 'track': self.track.id},
+                {'type': 'comment', 'track': self.track.id, 'comment_text': 'Nice'},
+                {'type': 'dance', 'track': self.track.id},
+            ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['queued'], response.data['failed']), (2, 0, 3))
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3, 4])
+        self.assertEqual(
+            [result['status'] for result in results], ['created', 'invalid', 'invalid', 'created', 'invalid'],
+        )
+        self.assertEqual(results[1]['errors'], {'track': ["Unknown track."]})
+        self.assertIn('type', results[4]['errors'])
+        self.assertEqual(ListeningHistory.objects.filter(user=self.listener).count(), 1)
+        self.assertEqual(
+            list(Interaction.objects.filter(user=self.listener).values_list('interaction_type', 'comment_text')),
+            [('comment', 'Nice')],
+        )
+        flush_later(3)
+        statistics = TrackStatistics.objects.get(track=self.track)
+        self.assertEqual((statistics.plays_count, statistics.comments_count), (1, 1))
+
+    def test_nothing_valid_is_rejected(self):
+        response = self.post([{'type': 'like', 'track': self.pending.id}, {'type': 'play'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertFalse(Interaction.objects.exists())
+
+    def test_malformed_batches_rejected(self):
+        self.assertEqual(self.client.post(self.url, {'events': []}, format='json').status_code, 400)
+        with self.settings(EVENT_BATCH_MAX_SIZE=2):
+            response = self.post([{'type': 'play', 'track': self.track.id}] * 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ListeningHistory.objects.exists())
+
+    @override_settings(LISTENING_HISTORY_MODE='buffered')
+    def test_buffered_plays_queued(self):
+        with mock.patch('music.play_buffer.enqueue', return_value=True) as enqueue:
+            response = self.post([
+                {'type': 'play', 'track': self.track.id},
+                {'type': 'like', 'track': self.track.id},
+            ])
+        self.assertEqual(response.status_code, 201)
+        play, like = response.data['results']
+        self.assertEqual(play['status'], 'queued')
+        self.assertEqual(play['event_id'], enqueue.call_args.args[0][0]['event_id'])
+        self.assertEqual(like['status'], 'created')
+        self.assertFalse(ListeningHistory.objects.exists())
+
+
+# ----------------------------
+# Buffered plays
+# ----------------------------
+@override_settings(CACHE_SHARED=True)
+class BufferedPlayTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(LISTENING_HISTORY_MODE='buffered')
+    def test_buffered_play_of_unapproved_track_rejected(self):
+        listener = make_user()
+        pending = make_tracks(1, approval_status='pending')[0]
+        approved = make_tracks(1)[0]
+        self.client.force_authenticate(listener)
+        with mock.patch('music.play_buffer.enqueue', return_value=True) as enqueue:
+            response = self.client.post('/api/v1/listening-history/', {'track_id': pending.id})
+            self.assertEqual(response.status_code, 400)
+            enqueue.assert_not_called()
+            response = self.client.post('/api/v1/listening-history/', {'track_id': approved.id})
+        self.assertEqual(response.status_code, 202)
+
+    def late_play(self, track):
+        return {
+            'event_id': str(uuid.uuid4()),
+            'user_id': make_user().id,
+            'track_id': track.id,
+            'listened_at': (timezone.now() - timedelta(hours=1)).isoformat(),
+        }
+
+    def test_late_play_counted_in_open_slot(self):
+        track = make_tracks(1)[0]
+        # The flush watermark is already past the play's own slot
+        counters.flush()
+        with self.captureOnCommitCallbacks(execute=True):
+            rows = play_buffer.write_plays([self.late_play(track)])
+        self.assertEqual(len(rows), 1)
+
+        flush_later(3)
+        self.assertEqual(TrackStatistics.objects.get(track=track).plays_count, 1)
+
+    def test_late_play_not_recounted_while_pending(self):
+        track = make_tracks(1)[0]
+        counters.flush()
+        with self.captureOnCommitCallbacks(execute=True):
+            play_buffer.write_plays([self.late_play(track)])
+        # Played before the watermark, but its delta is still pending
+        counters.recount([track.id])
+        flush_later(3)
+        self.assertEqual(TrackStatistics.objects.get(track=track).plays_count, 1)
+        self.assertEqual(counters.recount([track.id]), 0)
+
+    def test_redrained_batch_written_once(self):
+        track = make_tracks(1)[0]
+        event = self.late_play(track)
+        with self.captureOnCommitCallbacks(execute=True):
+            # A retried enqueue left two copies of the event in one batch
+            self.assertEqual(len(play_buffer.write_plays([event, dict(event)])), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            # The consumer died before dropping the batch; the next one rewrites it
+            self.assertEqual(play_buffer.write_plays([event]), [])
+        self.assertEqual(ListeningHistory.objects.filter(event_id=event['event_id']).count(), 1)
+        flush_later(3)
+        self.assertEqual(TrackStatistics.objects.get(track=track).plays_count, 1)
+
+    def test_plays_of_deleted_tracks_dropped(self):
+        track = make_tracks(1)[0]
+        event = self.late_play(track)
+        track.delete()
+        self.assertEqual(play_buffer.write_plays([event]), [])
+
+
+# ----------------------------
+# Feature cache
+# ----------------------------
+class FeatureCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(CACHE_SHARED=True)
+    def test_stats_count_lookups(self):
+        feature_cache.store_features('a' * 64, 'v1', {'tempo': 120.0})
+        feature_cache.get_cached_features('a' * 64, 'v1')
+        feature_cache.get_cached_features('b' * 64, 'v1')
+        stats = feature_cache.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+
+    def test_hit_returns_the_stored_features(self):
+        features = {'tempo': 120.0, 'vector': b'\x00\x01'}
+        feature_cache.store_features('a' * 64, 'v1', features)
+        self.assertEqual(feature_cache.get_cached_features('a' * 64, 'v1'), features)
+        # Keyed by extractor version too
+        self.assertIsNone(feature_cache.get_cached_features('a' * 64, 'v2'))
+        self.assertEqual(FeatureCacheEntry.objects.get().hits, 1)
+
+    @override_settings(FEATURE_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entry_evicted(self):
+        for age, content_hash in [(2, 'a'), (1, 'b')]:
+            feature_cache.store_features(content_hash * 64, 'v1', {'tempo': 120.0})
+            FeatureCacheEntry.objects.filter(content_hash=content_hash * 64).update(
+                last_used_at=timezone.now() - timedelta(hours=age),
+            )
+        # Used again, 'a' outlives 'b'
+        feature_cache.get_cached_features('a' * 64, 'v1')
+        feature_cache.store_features('c' * 64, 'v1', {'tempo': 120.0})
+        self.assertEqual(
+            sorted(FeatureCacheEntry.objects.values_list('content_hash', flat=True)), ['a' * 64, 'c' * 64],
+        )
+
+    @override_settings(CACHE_SHARED=False)
+    def test_stats_unknown_without_shared_cache(self):
+        feature_cache.get_cached_features('a' * 64, 'v1')
+        stats = feature_cache.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (None, None, None))
+        self.assertEqual(stats['entries'], 0)
+
+
+# ----------------------------
+# Audio analysis
+# ----------------------------
+def write_tone(path, seconds=20.0, sr=22050):
+    # A chord with a noise burst on every beat (120 BPM)
+    t = np.arange(int(seconds * sr)) / sr
+    y = sum(amplitude * np.sin(2 * np.pi * pitch * t) for pitch, amplitude in [(220, .3), (330, .2), (440, .1)])
+    y = y + ((t % 0.5) < 0.03) * np.random.default_rng(0).normal(scale=0.5, size=len(t))
+    soundfile.write(path, y.astype(np.float32), sr)
+    return y.astype(np.float32), sr
+
+
+class FeatureExtractionTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.path = f'{directory.name}/tone.wav'
+        cls.y, cls.sr = write_tone(cls.path)
+
+    def test_single_stft_matches_separate_feature_calls(self):
+        summary = feature_extraction.compute_summary(self.y, self.sr)
+        y, sr = self.y, self.sr
+        expected = {
+            'spectral_centroid': librosa.feature.spectral_centroid(y=y, sr=sr).mean(),
+            'spectral_rolloff': librosa.feature.spectral_rolloff(y=y, sr=sr).mean(),
+            'spectral_bandwidth': librosa.feature.spectral_bandwidth(y=y, sr=sr).mean(),
+            'chroma': librosa.feature.chroma_stft(y=y, sr=sr).mean(axis=1),
+            'mfcc': librosa.feature.mfcc(y=y, sr=sr, n_mfcc=feature_extraction.N_MFCC).mean(axis=1),
+            'tempo': librosa.beat.beat_track(y=y, sr=sr)[0],
+        }
+        for name, value in expected.items():
+            np.testing.assert_allclose(summary[name], value, rtol=1e-5, err_msg=name)
+
+    def assertFeaturesClose(self, first, second, rtol):
+        self.assertEqual(first['mood'], second['mood'])
+        for name in first.keys() - {'mood', 'vector'}:
+            self.assertAlmostEqual(first[name], second[name], delta=rtol * abs(first[name]), msg=name)
+
+    def test_streaming_matches_full_analysis(self):
+        full = feature_extraction.extract_features(self.path)
+        streamed = feature_extraction.extract_features(self.path, stream=True)
+        # Un-centred frames: only the edges of the signal differ
+        self.assertFeaturesClose(full, streamed, rtol=0.02)
+        self.assertEqual(full['tempo'], streamed['tempo'])
+
+    def test_streaming_does_not_depend_on_the_block_size(self):
+        small, _ = feature_extraction.compute_summary_streaming(self.path, block_length=64)
+        large, _ = feature_extraction.compute_summary_streaming(self.path, block_length=512)
+        # Not MFCCs: their dB scale is clipped 80 dB below each block's peak
+        for name in feature_extraction.TRACK_FEATURE_INPUTS:
+            if name != 'mfcc':
+                np.testing.assert_allclose(small[name], large[name], rtol=1e-5, err_msg=name)
+
+    def test_fast_mode_over_the_whole_track_matches_full_analysis(self):
+        full = feature_extraction.extract_features(self.path)
+        # Same rate, one excerpt covering the track: nothing is left out
+        fast = feature_extraction.extract_features_fast(self.path, sr=self.sr, excerpt_seconds=30.0)
+        self.assertFeaturesClose(full, fast, rtol=1e-6)
+
+    def test_fast_mode_excerpts_close_to_full_analysis(self):
+        full = feature_extraction.extract_features(self.path)
+        fast = feature_extraction.extract_features_fast(self.path, sr=self.sr, excerpt_seconds=10.0, windows=2)
+        self.assertFeaturesClose(full, fast, rtol=0.05)
+
+    def test_feature_subset_computes_only_what_it_needs(self):
+        calls = []
+
+        def counted(name, fn):
+            def compute(chunk):
+                calls.append(name)
+                return fn(chunk)
+            return compute
+
+        representations = {
+            name: (requires, counted(name, fn))
+            for name, (requires, fn) in feature_extraction.REPRESENTATIONS.items()
+        }
+        with mock.patch.dict(feature_extraction.REPRESENTATIONS, representations):
+            summary = feature_extraction.compute_summary(self.y, self.sr, ['spectral_centroid', 'rms'])
+        self.assertEqual(sorted(calls), sorted(feature_extraction.requirements(['spectral_centroid', 'rms'])))
+        self.assertNotIn('mel', calls)
+        full = feature_extraction.compute_summary(self.y, self.sr)
+        for name in ('spectral_centroid', 'rms'):
+            self.assertEqual(summary[name], full[name])
+
+    def test_registered_feature_joins_every_analysis(self):
+        with mock.patch.dict(feature_extraction.FEATURES):
+            @feature_extraction.feature('peak', requires=['waveform'])
+            def peak(chunk):
+                return np.abs(chunk.get('waveform'))[np.newaxis]
+
+            whole = feature_extraction.compute_summary(self.y, self.sr, ['peak'])
+            streamed, _ = feature_extraction.compute_summary_streaming(self.path, ['peak'])
+        self.assertAlmostEqual(whole['peak'], np.abs(self.y).mean(), places=5)
+        self.assertAlmostEqual(streamed['peak'], whole['peak'], delta=0.01)
+        self.assertNotIn('peak', feature_extraction.FEATURES)
+
+    def test_unknown_feature_rejected(self):
+        with self.assertRaisesMessage(ValueError, 'Unknown features: nope'):
+            feature_extraction.compute_summary(self.y, self.sr, ['rms', 'nope'])
+
+    def test_script_prints_what_the_task_stores(self):
+        output = subprocess.run(
+            [sys.executable, 'scripts/extract_features.py', self.path],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout
+        self.assertFeaturesClose(json.loads(output), feature_extraction.extract_features(self.path), rtol=1e-6)
+
+    def test_excerpt_offsets(self):
+        offsets = feature_extraction.excerpt_offsets
+        self.assertEqual(offsets(100.0, 30.0, start=20.0), ([20.0], 30.0))
+        # A demo start too close to the end slides back
+        self.assertEqual(offsets(100.0, 30.0, start=90.0), ([70.0], 30.0))
+        self.assertEqual(offsets(100.0, 30.0, windows=3), ([0.0, 45.0, 90.0], 10.0))
+
+
+# ----------------------------
+# Web process imports
+# ----------------------------
+class WebImportTests(SimpleTestCase):
+
+    def imported(self, *modules):
+        # A fresh interpreter: this one has loaded librosa for other tests
+        code = (
+            "import sys, django; django.setup(); "
+            + "".join(f"import {module}; " for module in modules)
+            + "print(' '.join(m for m in ['librosa', 'numba', 'llvmlite', 'soundfile'] if m in sys.modules))"
+        )
+        return subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.split()
+
+    def test_urlconf_and_tasks_leave_out_the_audio_stack(self):
+        self.assertEqual(self.imported('backend.urls', 'music.tasks', 'music.signals'), [])
+
+    def test_feature_extraction_brings_it_in(self):
+        self.assertIn('librosa', self.imported('music.utils.feature_extraction'))
+
+
+# ----------------------------
+# Mood classification
+# ----------------------------
+def chain_mood(valence, tempo, energy, acousticness, speechiness):
+    # The if/elif chain the rule table replaced
+    if valence > 0.6 and tempo > 110:
+        return 'happy'
+    elif valence < 0.4 and tempo < 90 and energy < 0.2:
+        return 'sad'
+    elif energy > 0.25 and tempo > 120:
+        return 'energetic'
+    elif acousticness > 0.5 and tempo < 100:
+        return 'calm'
+    elif 0.4 < valence < 0.65 and acousticness > 0.3 and tempo < 100:
+        return 'romantic'
+    elif energy > 0.4 and speechiness > 0.15:
+        return 'angry'
+    return 'chill'
+
+
+class MoodClassificationTests(TestCase):
+
+    def test_rule_table_matches_the_chain(self):
+        rng = np.random.default_rng(0)
+        columns = [
+            rng.choice([0.3, 0.4, 0.5, 0.6, 0.65, 0.7], 5000),
+            rng.choice([80.0, 90.0, 100.0, 110.0, 120.0, 130.0], 5000),
+            rng.choice([0.1, 0.2, 0.25, 0.4, 0.5], 5000),
+            rng.choice([0.2, 0.3, 0.5, 0.6], 5000),
+            rng.choice([0.1, 0.15, 0.2], 5000),
+        ]
+        expected = [chain_mood(*values) for values in zip(*columns)]
+        self.assertEqual(moods.classify_moods(*columns).tolist(), expected)
+        self.assertEqual(moods.classify_mood(0.7, 120, 0.1, 0.1, 0.1), 'happy')
+
+    def add(self, mood, **values):
+        values = dict(dict(valence=0.5, tempo=105, energy=0.1, acousticness=0.1, speechiness=0.1), **values)
+        track = make_tracks(1)[0]
+        return TrackFeature.objects.create(track=track, danceability=0.5, instrumentalness=0.1,
+                                           liveness=0.1, mood=mood, **values)
+
+    def test_reclassify_writes_only_changed_rows(self):
+        stale = [self.add('chill', valence=0.7, tempo=120) for _ in range(3)]
+        current = self.add('chill')
+        with CaptureQueriesContext(connection) as queries:
+            call_command('reclassify_moods', '--chunk-size', '2', stdout=StringIO())
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        # One UPDATE per chunk holding changes: rows 1-2, then row 3
+        self.assertEqual(len(updates), 2)
+        relabelled = TrackFeature.objects.filter(id__in=[feature.id for feature in stale])
+        self.assertEqual(set(relabelled.values_list('mood', flat=True)), {'happy'})
+        current.refresh_from_db()
+        self.assertEqual(current.mood, 'chill')
+
+    def test_dry_run_writes_nothing(self):
+        feature = self.add('sad', valence=0.7, tempo=120)
+        stdout = StringIO()
+        call_command('reclassify_moods', '--dry-run', stdout=stdout)
+        self.assertIn('sad -> happy: 1', stdout.getvalue())
+        feature.refresh_from_db()
+        self.assertEqual(feature.mood, 'sad')
+
+
+# ----------------------------
+# Worker warm-up
+# ----------------------------
+class WorkerWarmUpTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(backend_celery.extraction_timings, warmup_seconds=None, first_task_seconds=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_numba_cache_dir_set_before_numba_loads(self):
+        code = "import os, backend, numba.core.config as c; print(os.environ['NUMBA_CACHE_DIR']); print(c.CACHE_DIR)"
+        env = {key: value for key, value in os.environ.items() if key != 'NUMBA_CACHE_DIR'}
+        output = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR, env=env,
+        ).stdout.split()
+        self.assertEqual(output, [str(settings.BASE_DIR / '.numba_cache')] * 2)
+
+    def test_warm_up_runs_every_path(self):
+        with mock.patch.object(feature_extraction, 'compute_summary_excerpts',
+                               wraps=feature_extraction.compute_summary_excerpts) as excerpts:
+            seconds = feature_extraction.warm_up()
+        excerpts.assert_called_once()
+        self.assertGreater(seconds, 0)
+
+    def test_worker_init_warms_up_unless_disabled(self):
+        with mock.patch('music.utils.feature_extraction.warm_up', return_value=1.5) as warm_up, \
+                mock.patch.dict(os.environ, CELERY_WORKER_WARMUP='False'):
+            backend_celery.warm_up_feature_extraction()
+        warm_up.assert_not_called()
+        with mock.patch('music.utils.feature_extraction.warm_up', return_value=1.5):
+            backend_celery.warm_up_feature_extraction()
+        self.assertEqual(backend_celery.extraction_timings['warmup_seconds'], 1.5)
+
+    def test_only_the_first_extraction_task_is_logged(self):
+        task = mock.Mock()
+        task.name = 'music.tasks.extract_features_batch_task'
+        with self.assertLogs('music', 'INFO') as logs:
+            for task_id in ('a', 'b'):
+                backend_celery.time_extraction_start(task_id=task_id, task=task)
+                backend_celery.time_extraction_end(task_id=task_id, task=task)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('(warm-up: disabled)', logs.output[0])
+
+
+# ----------------------------
+# Feature extraction
+# ----------------------------
+@override_settings(FEATURE_EXTRACTION_MODE='full', FEATURE_BATCH_DECODE_THREADS=2)
+class BatchExtractionTaskTests(TestCase):
+
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.tone = f'{directory}/tone.wav'
+        write_tone(self.tone, seconds=4.0)
+        self.broken = f'{directory}/broken.wav'
+        with open(self.broken, 'wb') as audio:
+            audio.write(b'not audio')
+
+    def run_batch(self, paths):
+        tracks = make_tracks(len(paths))
+        files = {track.id: path for track, path in zip(tracks, paths)}
+        decode = feature_extraction.decode
+        with mock.patch('music.tasks.local_audio_path', side_effect=lambda track: files[track.id]), \
+                mock.patch('music.utils.feature_extraction.decode', wraps=decode) as decoded, \
+                warnings.catch_warnings():
+            # librosa falls back to audioread on the broken file, with a FutureWarning
+            warnings.simplefilter('ignore', FutureWarning)
+            extract_features_batch_task([track.id for track in tracks])
+        return tracks, decoded.call_count
+
+    def test_failed_tracks_logged_and_skipped(self):
+        with self.assertLogs('music', 'WARNING') as logs:
+            tracks, _ = self.run_batch([self.tone, self.broken, None])
+        self.assertEqual(list(TrackFeature.objects.values_list('track_id', flat=True)), [tracks[0].id])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(f'track {tracks[1].id}', logs.output[0])
+        # Bulk writes are logged for the similarity index by hand
+        self.assertEqual(list(FeatureChange.objects.values_list('track_id', flat=True)), [tracks[0].id])
+
+        expected = feature_extraction.extract_features(self.tone)
+        stored = TrackFeature.objects.get(track=tracks[0])
+        for name in ('tempo', 'energy', 'valence', 'mood', 'vector'):
+            self.assertEqual(getattr(stored, name), expected[name], name)
+
+    def test_cached_files_not_decoded_again(self):
+        _, decoded = self.run_batch([self.tone])
+        self.assertEqual(decoded, 1)
+        tracks, decoded = self.run_batch([self.tone, self.tone])
+        self.assertEqual(decoded, 0)
+        self.assertEqual(TrackFeature.objects.filter(track__in=tracks).count(), 2)
+
+
+class ExtractFeaturesCommandTests(TestCase):
+
+    def enqueued(self, *args):
+        with mock.patch('music.signals.current_app.send_task') as send_task:
+            call_command('extract_features', '--celery', *args, stdout=StringIO())
+        return [call.kwargs for call in send_task.call_args_list]
+
+    def test_celery_tasks_carry_the_mode(self):
+        tracks = make_tracks(3)
+        calls = self.enqueued('--mode', 'fast', '--reset')
+        self.assertEqual([call['args'] for call in calls], [[[track.id for track in tracks]]])
+        self.assertEqual({call['kwargs']['mode'] for call in calls}, {'fast'})
+
+    def test_approvals_in_one_transaction_enqueue_one_batch(self):
+        tracks = make_tracks(3, approval_status='pending')
+        with mock.patch('music.signals.local_audio_path', return_value='/audio/a.mp3'), \
+                mock.patch('music.signals.current_app.send_task') as send_task, \
+                self.captureOnCommitCallbacks(execute=True):
+            for track in tracks:
+                track.approval_status = 'approved'
+                track.save()
+        self.assertEqual([call.kwargs['args'] for call in send_task.call_args_list], [[[t.id for t in tracks]]])
+
+    def test_approval_without_local_audio_enqueues_nothing(self):
+        track = make_tracks(1, approval_status='pending')[0]
+        with mock.patch('music.signals.current_app.send_task') as send_task, \
+                self.captureOnCommitCallbacks(execute=True):
+            track.approval_status = 'approved'
+            track.save()
+        send_task.assert_not_called()
+
+    def extract(self, *args, failing=()):
+        def analyse_track(job):
+            if job[0] in failing:
+                return job[0], None, 'decode error', 0.0, 0.0
+            values = dict(danceability=0.5, energy=0.5, valence=0.5, tempo=120, speechiness=0.1,
+                          instrumentalness=0.1, acousticness=0.1, liveness=0.1, mood='happy')
+            values['vector'] = feature_vectors.pack(values, np.zeros(12), np.zeros(13))
+            return job[0], values, None, 0.0, 0.0
+
+        command = 'music.management.commands.extract_features'
+        with mock.patch(f'{command}.ProcessPoolExecutor', ThreadPoolExecutor), \
+                mock.patch(f'{command}.analyse_track', analyse_track), \
+                mock.patch(f'{command}.local_audio_path', return_value='/audio/a.mp3'):
+            call_command('extract_features', '--workers', '1', '--mode', 'full', *args,
+                         stdout=StringIO(), stderr=StringIO())
+        return JobCheckpoint.objects.get(name='extract_features').state
+
+    def test_interrupted_run_resumes_after_the_checkpoint(self):
+        tracks = make_tracks(5)
+        state = self.extract('--limit', '2', '--batch-size', '1')
+        self.assertEqual(state['last_track_id'], tracks[1].id)
+        # Extracted since by someone else: not pending any more
+        TrackFeature.objects.create(track=tracks[2], danceability=0.5, energy=0.5, valence=0.5, tempo=120,
+                                    speechiness=0.1, instrumentalness=0.1, acousticness=0.1, liveness=0.1,
+                                    mood='sad')
+        with CaptureQueriesContext(connection) as queries:
+            state = self.extract()
+        self.assertEqual(state['last_track_id'], tracks[4].id)
+        self.assertEqual(TrackFeature.objects.get(track=tracks[2]).mood, 'sad')
+        self.assertEqual(TrackFeature.objects.count(), 5)
+        # One bulk insert for the batch
+        inserts = [query for query in queries if 'INTO "music_trackfeature"' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+
+    def test_retry_failed_keeps_the_position(self):
+        tracks = make_tracks(3)
+        state = self.extract(failing={tracks[1].id})
+        self.assertEqual(state, {'last_track_id': tracks[2].id, 'failed': [tracks[1].id]})
+
+        state = self.extract('--retry-failed')
+        self.assertEqual(state, {'last_track_id': tracks[2].id, 'failed': []})
+        self.assertEqual(TrackFeature.objects.count(), 3)
+
+    def test_backfill_re_extracts_missing_and_outdated_vectors(self):
+        current, missing, outdated = make_tracks(3)
+        for track, vector in [(current, b'\x00' * VECTOR_BYTES), (missing, None), (outdated, b'\x00' * 8)]:
+            TrackFeature.objects.create(track=track, danceability=0.1, energy=0.1, valence=0.1, tempo=90,
+                                        speechiness=0.1, instrumentalness=0.1, acousticness=0.1,
+                                        liveness=0.1, mood='sad', vector=vector)
+        self.extract('--backfill-vectors', '--checkpoint', 'extract_features')
+        moods = dict(TrackFeature.objects.values_list('track_id', 'mood'))
+        self.assertEqual(moods, {current.id: 'sad', missing.id: 'happy', outdated.id: 'happy'})
+        self.assertEqual(len(TrackFeature.objects.get(track=missing).vector), VECTOR_BYTES)
+
+    def test_command_module_does_not_import_librosa(self):
+        code = (
+            "import sys, django; django.setup(); "
+            "import music.management.commands.extract_features; "
+            "print('librosa' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout
+        self.assertEqual(output.strip(), 'False')
+
+    def test_celery_tasks_default_to_the_workers_mode(self):
+        make_tracks(1)
+        calls = self.enqueued('--reset')
+        self.assertEqual([call['kwargs'] for call in calls], [{'mode': None}])
+
+
+# ----------------------------
+# Feature vectors
+# ----------------------------
+class FeatureVectorTests(APITestCase):
+
+    def test_pack_follows_the_layout(self):
+        values = {field: float(index) for index, field in enumerate(feature_vectors.SCALAR_FIELDS)}
+        vector = feature_vectors.unpack(feature_vectors.pack(values, np.arange(12) + 100, np.arange(13) + 200))
+        self.assertEqual(vector.dtype, VECTOR_DTYPE)
+        self.assertEqual(len(vector), VECTOR_SIZE)
+        for index, name in enumerate(feature_vectors.VECTOR_LAYOUT):
+            if name in values:
+                expected = values[name]
+            elif name.startswith('chroma_'):
+                expected = 100 + int(name[7:])
+            else:
+                expected = 200 + int(name[5:])
+            self.assertEqual(vector[index], expected, name)
+
+    def test_load_matrix_skips_missing_and_outdated_vectors(self):
+        first, second = np.arange(2 * VECTOR_SIZE, dtype=VECTOR_DTYPE).reshape(2, VECTOR_SIZE)
+        ids, matrix = feature_vectors.load_matrix([
+            (1, first.tobytes()), (2, None), (3, b'\x00' * 8), (4, second.tobytes()),
+        ])
+        self.assertEqual(ids.tolist(), [1, 4])
+        np.testing.assert_array_equal(matrix, [first, second])
+        # Writable, so callers can normalise it in place
+        matrix /= 2
+
+    def test_vector_left_out_of_the_api(self):
+        track = make_tracks(1)[0]
+        TrackFeature.objects.create(track=track, danceability=0.5, energy=0.5, valence=0.5, tempo=120,
+                                    speechiness=0.1, instrumentalness=0.1, acousticness=0.1, liveness=0.1,
+                                    mood='happy', vector=b'\x00' * VECTOR_BYTES)
+        row = self.client.get('/api/v1/track-features/').data['results'][0]
+        self.assertNotIn('vector', row)
+
+
+# ----------------------------
+# Similar tracks
+# ----------------------------
+class VectorIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ids = np.arange(1, 201) * 10
+        self.matrix = (rng.normal(size=(200, VECTOR_SIZE)) * np.arange(1, VECTOR_SIZE + 1)).astype(np.float32)
+        self.index = VectorIndex(self.ids, self.matrix)
+
+    def exact(self, row, k, metric):
+        vectors = (self.matrix - self.matrix.mean(axis=0)) / self.matrix.std(axis=0)
+        if metric == 'cosine':
+            units = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            result = 1 - units @ units[row]
+        else:
+            result = np.linalg.norm(vectors - vectors[row], axis=1)
+        result[row] = np.inf
+        order = np.argsort(result)[:k]
+        return self.ids[order], result[order]
+
+    def test_nearest_matches_brute_force(self):
+        for metric in ('cosine', 'euclidean'):
+            for row in (0, 57, 199):
+                ids, found = self.index.nearest(self.ids[row], k=5, metric=metric)
+                expected_ids, expected = self.exact(row, 5, metric)
+                np.testing.assert_array_equal(ids, expected_ids)
+                np.testing.assert_allclose(found, expected, rtol=1e-4, atol=1e-5)
+
+    def test_upsert_and_remove(self):
+        target = self.ids[0]
+        # A new track identical to the first; past the initial capacity
+        extra = np.arange(1, 1500) + 10000
+        self.index.upsert(extra, np.repeat(self.matrix[:1] + 1000, len(extra), axis=0))
+        self.index.upsert([99999], self.matrix[:1])
+        ids, distances = self.index.nearest(target, k=1)
+        self.assertEqual((ids.tolist(), round(float(distances[0]), 5)), ([99999], 0.0))
+        self.index.remove([99999, target])
+        self.assertIsNone(self.index.nearest(target))
+        self.assertNotIn(99999, self.index.nearest(self.ids[1], k=50)[0].tolist())
+        self.assertEqual(len(self.index), 200 + len(extra) - 1)
+
+
+@override_settings(SIMILARITY_REFRESH_SECONDS=0)
+class SimilarTracksEndpointTests(APITestCase):
+
+    def setUp(self):
+        # No published build: exact search
+        self.enterContext(self.settings(SIMILARITY_INDEX_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        similarity._state['searcher'] = None
+        self.addCleanup(similarity._state.update, searcher=None)
+
+        rng = np.random.default_rng(1)
+        self.tracks = make_tracks(6)
+        self.vectors = rng.normal(size=(6, VECTOR_SIZE)).astype(VECTOR_DTYPE)
+        # The second track is a slightly altered copy of the first
+        self.vectors[1] = self.vectors[0] + 0.01
+        for track, vector in zip(self.tracks, self.vectors):
+            TrackFeature.objects.create(track=track, danceability=0.5, energy=0.5, valence=0.5, tempo=120,
+                                        speechiness=0.1, instrumentalness=0.1, acousticness=0.1,
+                                        liveness=0.1, mood='happy', vector=vector.tobytes())
+
+    def similar(self, track, **params):
+        return self.client.get(f'/api/v1/tracks/{track.id}/similar/', params)
+
+    def test_closest_first(self):
+        response = self.similar(self.tracks[0], k=3)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['id'], self.tracks[1].id)
+        self.assertEqual([row['distance'] for row in results], sorted(row['distance'] for row in results))
+        self.assertNotIn(self.tracks[0].id, [row['id'] for row in results])
+
+    def test_changes_reach_the_running_index(self):
+        self.similar(self.tracks[0])
+        # The sixth track now sounds exactly like the first
+        TrackFeature.objects.filter(track=self.tracks[5]).update(vector=self.vectors[0].tobytes())
+        Track.objects.filter(id=self.tracks[1].id).update(approval_status='rejected')
+        record_feature_changes([self.tracks[5].id, self.tracks[1].id])
+        results = self.similar(self.tracks[0]).data['results']
+        self.assertEqual(results[0]['id'], self.tracks[5].id)
+        self.assertNotIn(self.tracks[1].id, [row['id'] for row in results])
+
+    def test_errors(self):
+        self.assertEqual(self.similar(self.tracks[0], metric='manhattan').status_code, 400)
+        self.assertEqual(self.similar(self.tracks[0], k='ten').status_code, 400)
+        TrackFeature.objects.filter(track=self.tracks[2]).update(vector=None)
+        record_feature_changes([self.tracks[2].id])
+        self.assertEqual(self.similar(self.tracks[2]).status_code, 404)
+
+
+# ----------------------------
+# Similarity index
+# ----------------------------
+class SimilarityIndexBuildTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.tracks = make_tracks(5)
+        for track in self.tracks:
+            TrackFeature.objects.create(
+                track=track, danceability=0.5, energy=0.5, valence=0.5, tempo=120, speechiness=0.1,
+                instrumentalness=0.1, acousticness=0.1, liveness=0.1, mood='happy',
+                vector=rng.normal(size=VECTOR_SIZE).astype(VECTOR_DTYPE).tobytes(),
+            )
+
+    def test_build_prunes_covered_changes(self):
+        record_feature_changes([1, 2, 3])
+        watermark = last_change_id()
+
+        with tempfile.TemporaryDirectory() as path, self.settings(SIMILARITY_INDEX_DIR=path):
+            call_command('build_similarity_index', stdout=StringIO())
+            self.assertEqual(ann.LSHIndex(ann.current_build(path)).meta['watermark'], watermark)
+        # Only the watermark row is left; later changes stay for the deltas
+        self.assertEqual(list(FeatureChange.objects.values_list('id', flat=True)), [watermark])
+        record_feature_changes([4])
+        self.assertEqual(FeatureChange.objects.count(), 2)
+
+    @override_settings(SIMILARITY_REFRESH_SECONDS=0)
+    def test_changes_after_the_build_are_searched_from_the_delta(self):
+        with tempfile.TemporaryDirectory() as path, self.settings(SIMILARITY_INDEX_DIR=path):
+            call_command('build_similarity_index', stdout=StringIO())
+            similarity._state['searcher'] = None
+            self.addCleanup(similarity._state.update, searcher=None)
+            first, second = self.tracks[:2]
+            self.assertIsNotNone(similar_tracks(first.id))
+            # The first track now sounds exactly like the second
+            TrackFeature.objects.filter(track=first).update(vector=second.trackfeature.vector)
+            record_feature_changes([first.id])
+            ids, _ = similar_tracks(first.id, k=1, probes=8)
+        self.assertEqual(ids.tolist(), [second.id])
+
+    def test_build_elsewhere_keeps_changes(self):
+        logged = FeatureChange.objects.count()
+        with tempfile.TemporaryDirectory() as served, tempfile.TemporaryDirectory() as scratch, \
+                self.settings(SIMILARITY_INDEX_DIR=served):
+            call_command('build_similarity_index', '--output', scratch, stdout=StringIO())
+        self.assertEqual(FeatureChange.objects.count(), logged)
+
+
+# ----------------------------
+# Track neighbours
+# ----------------------------
+class TrackNeighbourBuildTests(TestCase):
+
+    def setUp(self):
+        self.tracks = make_tracks(6)
+        self.listeners = [make_user() for _ in range(4)]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.counts = f'{directory.name}/counts.npz'
+
+    def listen(self, pairs):
+        ListeningHistory.objects.bulk_create([
+            ListeningHistory(user=self.listeners[user], track=self.tracks[track]) for user, track in pairs
+        ])
+
+    def build(self, *args):
+        call_command('build_track_neighbours', '--counts', self.counts, *args, stdout=StringIO())
+        return {
+            (row.track_id, row.rank): (row.neighbour_id, round(row.score, 6))
+            for row in TrackNeighbour.objects.all()
+        }
+
+    def test_incremental_matches_full_build(self):
+        self.listen([(0, 0), (0, 1), (1, 1), (1, 2), (2, 3), (2, 4), (3, 4), (3, 5)])
+        Interaction.objects.create(user=self.listeners[0], track=self.tracks[2], interaction_type='like')
+        self.build()
+
+        watermark = ListeningHistory.objects.order_by('-id').values_list('id', flat=True).first()
+        self.listen([(0, 3), (0, 3), (1, 5)])
+        with CaptureQueriesContext(connection) as queries:
+            incremental = self.build('--incremental')
+        # Rows are only read past the last run's watermark
+        reads = [
+            query['sql'] for query in queries
+            if 'FROM "music_listeninghistory"' in query['sql'] and 'MAX(' not in query['sql']
+        ]
+        self.assertEqual(len(reads), 1)
+        self.assertIn(f'"id" > {watermark}', reads[0])
+
+        full = self.build()
+        changed = {self.tracks[index].id for index in (3, 5)}
+        self.assertEqual(
+            {key: value for key, value in incremental.items() if key[0] in changed},
+            {key: value for key, value in full.items() if key[0] in changed},
+        )
+
+    def test_incremental_without_saved_counts_reads_everything(self):
+        self.listen([(0, 0), (0, 1)])
+        neighbours = self.build('--incremental')
+        self.assertEqual(neighbours[(self.tracks[0].id, 0)][0], self.tracks[1].id)
+
+
+# ----------------------------
+# Play rollups
+# ----------------------------
+class PlayRollupTests(TestCase):
+
+    def setUp(self):
+        self.track = make_tracks(1)[0]
+        self.listener = make_user()
+
+    def play(self, listened_ago, recorded_ago):
+        now = timezone.now()
+        row = ListeningHistory.objects.create(
+            user=self.listener, track=self.track, listened_at=now - timedelta(seconds=listened_ago),
+        )
+        ListeningHistory.objects.filter(id=row.id).update(recorded_at=now - timedelta(seconds=recorded_ago))
+        return row.id
+
+    def test_settled_id_follows_write_time(self):
+        settled = self.play(3600, 3600)
+        # Still within the lag, maybe not yet committed elsewhere
+        self.play(0, 0)
+        # Drained late: an old play time, but a new id written just now
+        self.play(1800, 0)
+        self.assertEqual(settled_id(ListeningHistory, 'recorded_at', 60), settled)
+
+    def totals(self, model=TrackPlayRollup):
+        return {
+            (period, bucket): plays
+            for period, bucket, plays in model.objects.values_list('period', 'bucket', 'plays')
+        }
+
+    def expected(self):
+        totals = {}
+        for at in ListeningHistory.objects.values_list('listened_at', flat=True):
+            hour = at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+            for key in (('hour', hour), ('day', hour.replace(hour=0))):
+                totals[key] = totals.get(key, 0) + 1
+        return totals
+
+    def test_batches_add_up_in_shared_buckets(self):
+        for listened_ago in (7200, 7100, 3700, 3600, 600, 500, 90000):
+            self.play(listened_ago, 3600)
+        # Batches of two: most buckets are written by more than one batch
+        self.assertEqual(rollup_plays(batch_size=2)[0], 4)
+        self.assertEqual(self.totals(), self.expected())
+        self.assertEqual(self.totals(ArtistPlayRollup), self.expected())
+
+    def test_runs_resume_from_the_high_water_mark(self):
+        self.play(600, 3600)
+        self.play(600, 3600)
+        unsettled = self.play(600, 0)
+        batches, listen_id = rollup_plays()
+        self.assertEqual((batches, listen_id), (1, unsettled - 1))
+        self.assertEqual(sum(self.totals().values()), 4)
+        self.assertEqual(rollup_plays(), (0, unsettled - 1))
+
+        # Settled since, together with a new play
+        ListeningHistory.objects.filter(id=unsettled).update(recorded_at=timezone.now() - timedelta(hours=1))
+        self.play(600, 3600)
+        self.assertEqual(rollup_plays()[0], 1)
+        self.assertEqual(self.totals(), self.expected())
+
+
+# ----------------------------
+# Trending
+# ----------------------------
+@override_settings(TRENDING_HALF_LIFE_HOURS=1.0, TRENDING_LAG_SECONDS=60)
+class TrendingTests(TestCase):
+
+    def setUp(self):
+        self.hot, self.cold = make_tracks(2)
+        self.listener = make_user()
+
+    def play(self, track, hours_ago):
+        now = timezone.now()
+        row = ListeningHistory.objects.create(
+            user=self.listener, track=track, listened_at=now - timedelta(hours=hours_ago),
+        )
+        # Written before the lag, so the run folds it in
+        ListeningHistory.objects.filter(id=row.id).update(recorded_at=now - timedelta(minutes=5))
+
+    def values(self):
+        # Scores as of now, on the usual scale
+        factor = trending.decay_factor(trending.landmark(), timezone.now())
+        return {row.track_id: row.score * factor for row in TrackTrending.objects.all()}
+
+    def test_recent_events_outrank_older_ones(self):
+        self.play(self.hot, 0)
+        # Two half-lives old: each counts a quarter
+        self.play(self.cold, 2)
+        self.play(self.cold, 2)
+        self.assertEqual(trending.update_trending(), 3)
+        self.assertEqual(list(TrackTrending.objects.values_list('track_id', flat=True)), [self.hot.id, self.cold.id])
+        values = self.values()
+        self.assertAlmostEqual(values[self.hot.id], 1.0, places=2)
+        self.assertAlmostEqual(values[self.cold.id], 0.5, places=2)
+
+    def test_later_runs_fold_in_only_new_events(self):
+        self.play(self.hot, 0)
+        trending.update_trending()
+        self.assertEqual(trending.update_trending(), 0)
+        self.play(self.hot, 0)
+        self.assertEqual(trending.update_trending(), 1)
+        self.assertAlmostEqual(self.values()[self.hot.id], 2.0, places=2)
+
+    def test_rebase_keeps_scores_and_ranking(self):
+        self.play(self.hot, 0)
+        self.play(self.cold, 1)
+        trending.update_trending()
+        before = self.values()
+        # As if the landmark had been set long ago: the same values, stored huge
+        half_lives = trending.REBASE_HALF_LIVES + 8
+        checkpoint = JobCheckpoint.objects.get(name=trending.CHECKPOINT)
+        checkpoint.state['landmark'] -= half_lives * 3600
+        checkpoint.save()
+        TrackTrending.objects.update(score=F('score') * 2.0 ** half_lives)
+
+        trending.update_trending()
+        self.assertAlmostEqual(trending.landmark(), timezone.now().timestamp(), delta=60)
+        self.assertLess(TrackTrending.objects.get(track=self.hot).score, 2.0)
+        after = self.values()
+        for track_id, value in before.items():
+            self.assertAlmostEqual(after[track_id], value, places=3)
+        self.assertEqual(list(TrackTrending.objects.values_list('track_id', flat=True)), [self.hot.id, self.cold.id])
+
+    def test_decayed_scores_pruned(self):
+        self.play(self.cold, 0)
+        trending.update_trending()
+        with self.settings(TRENDING_MIN_SCORE=2.0):
+            trending.update_trending()
+        self.assertFalse(TrackTrending.objects.exists())
+
+
+# ----------------------------
+# LSH recall
+# ----------------------------
+class LSHRecallTests(SimpleTestCase):
+
+    def test_recall_against_exact_search(self):
+        rng = np.random.default_rng(0)
+        centres = rng.normal(size=(40, VECTOR_SIZE)) * 3
+        matrix = (centres[rng.integers(0, 40, 3000)] + rng.normal(size=(3000, VECTOR_SIZE))).astype(np.float32)
+        ids = np.arange(1, 3001)
+        exact = VectorIndex(ids, matrix)
+        with tempfile.TemporaryDirectory() as path:
+            index = ann.LSHIndex(ann.build(path, ids, matrix))
+            recall = {}
+            for probes in (0, settings.SIMILARITY_PROBES):
+                found = 0
+                for track_id in ids[:100]:
+                    expected, _ = exact.nearest(track_id, k=10)
+                    approximate, _ = index.search(index.vector(track_id), k=10, probes=probes, exclude=[track_id])
+                    found += len(set(expected) & set(approximate))
+                recall[probes] = found / 1000
+        self.assertGreaterEqual(recall[settings.SIMILARITY_PROBES], 0.95)
+        # Probing neighbouring buckets only adds candidates
+        self.assertGreaterEqual(recall[settings.SIMILARITY_PROBES], recall[0])
@@ -0,0 +1,170 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from music.models import Interaction, JobCheckpoint, ListeningHistory, Track, TrackTrending
+from music.rollups import settled_id
+
+# Trending scores use forward decay: an event at time t adds
+#     weight * exp(rate * (t - landmark))
+# to its track's stored score, where ``landmark`` is a fixed time kept in the
+# job's checkpoint. The score's value now is the stored score times
+# exp(-rate * (now - landmark)); the factor is the same for every track, so
+# stored scores rank tracks correctly without ever being decayed in place.
+# When the factor grows past REBASE_HALF_LIVES the landmark moves to now and
+# every score is scaled once.
+CHECKPOINT = 'trending'
+REBASE_HALF_LIVES = 32
+
+# Weight of one event; 'listen' is a ListeningHistory row, the others are
+# Interaction types
+EVENT_WEIGHTS = {
+    'listen':  1.0,
+    'like':    3.0,
+    'comment': 2.0,
+}
+
+ITERATOR_CHUNK = 10000
+
+
+def decay_rate():
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def decay_factor(landmark, now):
+    """
+    What stored scores are multiplied by to get their value at ``now``.
+    """
+    return math.exp(-decay_rate() * (now.timestamp() - landmark))
+
+
+def landmark():
+    state = JobCheckpoint.objects.filter(name=CHECKPOINT).values_list('state', flat=True).first() or {}
+    return state.get('landmark')
+
+
+def _first_id(model, field, since):
+    # Id just below the first row written (``field``) at or after ``since``
+    first = (
+        model.objects.filter(**{f'{field}__gte': since})
+        .order_by('id').values_list('id', flat=True).first()
+    )
+    return first - 1 if first else settled_id(model, field, 0)
+
+
+def _fold(deltas, events, at_landmark, rate):
+    """
+    Add ``(track_id, at, weight)`` events to ``deltas``; returns how many.
+    """
+    count = 0
+    for track_id, at, weight in events:
+        deltas[track_id] += weight * math.exp(rate * (at.timestamp() - at_landmark))
+        count += 1
+    return count
+
+
+def store_scores(deltas):
+    """
+    Add ``deltas`` (track id -> stored-scale score) to TrackTrending, and
+    refresh the genre and mood copied onto each row. Tracks that are not
+    approved are left out.
+    """
+    tracks = {
+        track_id: (genre, mood)
+        for track_id, genre, mood in Track.objects.filter(
+            id__in=list(deltas), approval_status='approved',
+        ).values_list('id', 'genre', 'trackfeature__mood')
+    }
+    scores = dict(TrackTrending.objects.filter(track_id__in=list(tracks)).values_list('track_id', 'score'))
+    # The job holds the checkpoint lock, so the new totals can be written as
+    # one upsert instead of per-row increments
+    unique_fields = ['track'] if connection.features.supports_update_conflicts_with_target else None
+    TrackTrending.objects.bulk_create(
+        [
+            TrackTrending(track_id=track_id, score=scores.get(track_id, 0.0) + deltas[track_id],
+                          genre=genre, mood=mood)
+            for track_id, (genre, mood) in tracks.items()
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=['score', 'genre', 'mood'],
+    )
+
+
+def update_trending(batch_size=50000):
+    """
+    Fold the listens and interactions logged since the last run into the
+    trending scores, ``batch_size`` rows per table and transaction, then
+    drop tracks whose score has decayed below TRENDING_MIN_SCORE. Returns
+    the number of events folded in.
+
+    The first run starts TRENDING_WINDOW_HALF_LIVES half-lives back; older
+    events would add next to nothing.
+    """
+    now = timezone.now()
+    rate = decay_rate()
+    lag = settings.TRENDING_LAG_SECONDS
+    until = {
+        'listen_id': settled_id(ListeningHistory, 'recorded_at', lag),
+        'interaction_id': settled_id(Interaction, 'created_at', lag),
+    }
+    events = 0
+    while True:
+        with transaction.atomic():
+            JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+            checkpoint = JobCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+            state = dict(checkpoint.state)
+            if 'landmark' not in state:
+                since = now - timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS * settings.TRENDING_WINDOW_HALF_LIVES)
+                state.update(
+                    landmark=now.timestamp(),
+                    listen_id=_first_id(ListeningHistory, 'recorded_at', since),
+                    interaction_id=_first_id(Interaction, 'created_at', since),
+                )
+
+            if rate * (now.timestamp() - state['landmark']) > REBASE_HALF_LIVES * math.log(2):
+                TrackTrending.objects.update(score=F('score') * decay_factor(state['landmark'], now))
+                state['landmark'] = now.timestamp()
+
+            ranges = {
+                name: (state[name], min(state[name] + batch_size, until[name]))
+                for name in until
+            }
+            if all(start >= end for start, end in ranges.values()):
+                # Caught up: prune what has decayed away
+                floor = settings.TRENDING_MIN_SCORE / decay_factor(state['landmark'], now)
+                TrackTrending.objects.filter(score__lt=floor).delete()
+                checkpoint.state = state
+                checkpoint.save(update_fields=['state', 'updated_at'])
+                return events
+
+            deltas = defaultdict(float)
+            start, end = ranges['listen_id']
+            listens = (
+                ListeningHistory.objects.filter(id__gt=start, id__lte=end)
+                .order_by().values_list('track_id', 'listened_at')
+            )
+            events += _fold(deltas, (
+                (track_id, at, EVENT_WEIGHTS['listen'])
+                for track_id, at in listens.iterator(chunk_size=ITERATOR_CHUNK)
+            ), state['landmark'], rate)
+            start, end = ranges['interaction_id']
+            interactions = Interaction.objects.filter(
+                id__gt=start, id__lte=end, interaction_type__in=EVENT_WEIGHTS,
+            ).order_by().values_list('track_id', 'created_at', 'interaction_type')
+            events += _fold(deltas, (
+                (track_id, at, EVENT_WEIGHTS[kind])
+                for track_id, at, kind in interactions.iterator(chunk_size=ITERATOR_CHUNK)
+            ), state['landmark'], rate)
+            store_scores(deltas)
+
+            for name, (start, end) in ranges.items():
+                state[name] = max(start, end)
+            checkpoint.state = state
+            checkpoint.save(update_fields=['state', 'updated_at'])
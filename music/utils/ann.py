@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from music.utils.similarity import distances, standardisation, top_k
+
+# Rows projected at a time while hashing, to bound the build's memory
+HASH_CHUNK_ROWS = 100_000
+# Target number of tracks per bucket when the bit count is chosen automatically
+BUCKET_SIZE = 32
+
+CURRENT = 'current'
+
+
+def default_bits(n):
+    return int(np.clip(np.round(np.log2(max(n, 1) / BUCKET_SIZE)), 8, 24))
+
+
+def _codes(vectors, planes):
+    """
+    Bucket code of every row in every table: one bit per hyperplane, set
+    when the row lies on its positive side. Returns ``(tables, n)`` uint32.
+    """
+    tables, bits, dim = planes.shape
+    weights = (1 << np.arange(bits, dtype=np.uint32)).astype(np.uint32)
+    flat = planes.reshape(tables * bits, dim).T
+    codes = np.empty((tables, len(vectors)), dtype=np.uint32)
+    for start in range(0, len(vectors), HASH_CHUNK_ROWS):
+        signs = (vectors[start:start + HASH_CHUNK_ROWS] @ flat > 0).reshape(-1, tables, bits)
+        codes[:, start:start + HASH_CHUNK_ROWS] = (signs @ weights).T
+    return codes
+
+
+def build(path, ids, matrix, tables=8, bits=None, seed=0, meta=None):
+    """
+    Build a random-projection LSH index over ``matrix`` and publish it under
+    ``path``.
+
+    Vectors are standardised, then hashed by ``tables`` sets of ``bits``
+    random hyperplanes (signed projections approximate the angle between
+    vectors). Each table is stored as the bucket codes in sorted order and
+    the rows in that order, so a bucket is one binary search away.
+
+    Every array is a separate .npy file so readers can memory-map them. The
+    files are written to a fresh directory and ``path/current`` is then
+    pointed at it in one rename; readers never see a half-written index.
+    Returns the directory of the new build.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    ids, matrix = ids[order], matrix[order]
+    mean, std = standardisation(matrix)
+    vectors = ((matrix - mean) / std).astype(np.float32)
+    bits = bits or default_bits(len(ids))
+
+    planes = np.random.default_rng(seed).normal(size=(tables, bits, vectors.shape[1])).astype(np.float32)
+    codes = _codes(vectors, planes)
+    table_rows = np.argsort(codes, axis=1, kind='stable').astype(np.int32)
+    sorted_codes = np.take_along_axis(codes, table_rows, axis=1)
+
+    os.makedirs(path, exist_ok=True)
+    build_dir = os.path.join(path, f"build-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}")
+    os.makedirs(build_dir)
+    arrays = {
+        'ids': ids,
+        'vectors': vectors,
+        'norms': np.linalg.norm(vectors, axis=1).astype(np.float32),
+        'stats': np.stack([mean, std]),
+        'planes': planes,
+        'codes': sorted_codes,
+        'rows': table_rows,
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(build_dir, f'{name}.npy'), array)
+    with open(os.path.join(build_dir, 'meta.json'), 'w') as handle:
+        json.dump({**(meta or {}), 'size': len(ids), 'tables': tables, 'bits': bits}, handle)
+
+    link = os.path.join(path, f'{CURRENT}.tmp-{os.getpid()}')
+    os.symlink(os.path.basename(build_dir), link)
+    os.replace(link, os.path.join(path, CURRENT))
+    return build_dir
+
+
+def prune(path, keep=2):
+    """
+    Delete all but the ``keep`` most recent builds. Processes still mapping
+    a deleted build keep reading it until they reopen.
+    """
+    current = os.path.realpath(os.path.join(path, CURRENT))
+    builds = sorted(
+        (name for name in os.listdir(path) if name.startswith('build-')),
+        key=lambda name: os.path.getmtime(os.path.join(path, name)),
+    )
+    for name in builds[:-keep] if keep else builds:
+        build_dir = os.path.join(path, name)
+        if build_dir != current:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def current_build(path):
+    """
+    Directory of the published build under ``path``, or None.
+    """
+    link = os.path.join(path, CURRENT)
+    return os.path.realpath(link) if os.path.exists(link) else None
+
+
+class LSHIndex:
+    """
+    A published LSH build, memory-mapped read-only. Every process opening
+    the same build shares its pages through the OS page cache.
+    """
+
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+
+        def load(name):
+            return np.load(os.path.join(build_dir, f'{name}.npy'), mmap_mode='r')
+
+        self.ids = load('ids')
+        self.vectors = load('vectors')
+        self.norms = load('norms')
+        self.planes = np.asarray(load('planes'))
+        self.codes = load('codes')
+        self.rows = load('rows')
+        self.mean, self.std = np.asarray(load('stats'))
+        with open(os.path.join(build_dir, 'meta.json')) as handle:
+            self.meta = json.load(handle)
+        tables, bits, _ = self.planes.shape
+        self.weights = (1 << np.arange(bits, dtype=np.uint32)).astype(np.uint32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def standardise(self, matrix):
+        return ((matrix - self.mean) / self.std).astype(np.float32)
+
+    def vector(self, track_id):
+        at = int(np.searchsorted(self.ids, track_id))
+        if at < len(self.ids) and self.ids[at] == track_id:
+            return np.asarray(self.vectors[at])
+        return None
+
+    def candidates(self, query, probes=0):
+        """
+        Rows sharing a bucket with ``query`` in any table. With ``probes``
+        > 0 each table also visits the buckets reached by flipping the
+        ``probes`` bits whose hyperplanes pass closest to the query, trading
+        latency for recall.
+        """
+        projections = self.planes @ query
+        codes = ((projections > 0) @ self.weights).astype(np.uint32)
+        flips = np.argsort(np.abs(projections), axis=1)[:, :probes]
+
+        found = []
+        for table, code in enumerate(codes):
+            sorted_codes = self.codes[table]
+            for probe in [code, *(code ^ self.weights[bit] for bit in flips[table])]:
+                start = np.searchsorted(sorted_codes, probe, side='left')
+                end = np.searchsorted(sorted_codes, probe, side='right')
+                if end > start:
+                    found.append(self.rows[table, start:end])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def search(self, query, k=10, metric='cosine', probes=0, exclude=()):
+        """
+        Approximate ``k`` nearest ids to the standardised ``query`` vector:
+        the LSH candidates re-ranked by their exact distance.
+        """
+        rows = self.candidates(query, probes)
+        ids = self.ids[rows]
+        result = distances(self.vectors[rows], self.norms[rows], query, metric)
+        result[np.isin(ids, np.asarray(exclude, dtype=np.int64))] = np.inf
+        return top_k(ids, result, k, metric)
@@ -0,0 +1,13 @@
+import os
+
+
+def local_audio_path(track):
+    """
+    Path of the track's audio file on local disk, or None when the file
+    isn't available to this process.
+    """
+    try:
+        path = track.audio_file.path
+    except Exception:
+        return None
+    return path if os.path.exists(path) else None
@@ -1,57 +1,465 @@
+import collections
+import time
+
 import librosa
 import numpy as np
-from music.models import Track, TrackFeature
 
-def extract_features(file_path):
-    y, sr = librosa.load(file_path, sr=None)
+from music.utils.feature_vectors import pack
+from music.utils.moods import classify_mood
+
+# STFT parameters shared by every spectral feature. They match librosa's
+# defaults, so deriving the features from one spectrogram gives the same
+# values as calling each librosa feature on the raw waveform.
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 13
+
+# Bump whenever a change alters the extracted values, so cached results
+# from older extractors are not reused.
+EXTRACTOR_VERSION = '3'
+
+
+# Fast mode: fixed analysis rate and excerpt length (seconds)
+FAST_SAMPLE_RATE = 22050
+FAST_EXCERPT_SECONDS = 30.0
+
+# Frames per block in streaming mode (~2.7 s of 48 kHz audio). Only one
+# block of samples and its spectrogram are resident at a time.
+STREAM_BLOCK_FRAMES = 256
+
+
+# ----------------------------
+# Feature registry
+# ----------------------------
+# Features are computed from intermediate representations of a chunk of
+# audio (the whole signal, a streaming block or an excerpt). Each
+# representation is computed at most once per chunk, and only when a
+# requested feature needs it, so asking for a subset of the features skips
+# the work nobody reads.
+
+REPRESENTATIONS = {}
+FEATURES = {}
+
+Feature = collections.namedtuple('Feature', ['name', 'requires', 'accumulator'])
+
+
+def representation(name, requires=()):
+    """
+    Register an intermediate representation. ``fn(chunk)`` receives the
+    chunk being analysed and reads its own dependencies with
+    ``chunk.get(name)``.
+    """
+    def register(fn):
+        REPRESENTATIONS[name] = (tuple(requires), fn)
+        return fn
+    return register
+
+
+def feature(name, requires=()):
+    """
+    Register a frame-level feature. ``fn(chunk)`` returns per-frame values,
+    shaped ``(frames,)`` or ``(bins, frames)``; the track value is their
+    mean over every frame analysed.
+    """
+    def register(fn):
+        FEATURES[name] = Feature(name, tuple(requires), lambda sr: _FrameMean(fn))
+        return fn
+    return register
+
+
+def track_feature(name, requires=()):
+    """
+    Register a feature that is not a frame mean. The decorated class is
+    instantiated with the sample rate and gets ``add(chunk)`` for every
+    chunk, then ``result()`` once.
+    """
+    def register(cls):
+        FEATURES[name] = Feature(name, tuple(requires), cls)
+        return cls
+    return register
+
+
+def requirements(names, skip=()):
+    """
+    Every representation needed, directly or indirectly, by the named
+    features. Dependencies of the representations in ``skip`` are not
+    followed.
+    """
+    needed = set()
+    stack = [dep for name in names for dep in FEATURES[name].requires]
+    while stack:
+        name = stack.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        if name not in skip:
+            stack.extend(REPRESENTATIONS[name][0])
+    return needed
+
+
+class _Chunk:
+    """
+    A piece of audio being analysed, with its representations cached.
+
+    ``whole`` marks the complete signal in one piece; ``contiguous`` marks
+    a streaming block that directly follows the previous chunk.
+    """
+
+    def __init__(self, analysis, y, center=True, whole=False, contiguous=False):
+        self.analysis = analysis
+        self.y = y
+        self.sr = analysis.sr
+        self.state = analysis.state
+        self.center = center
+        self.whole = whole
+        self.contiguous = contiguous
+        self.remaining = ()
+        self._cache = {}
+
+    def get(self, name):
+        if name not in self._cache:
+            self._cache[name] = REPRESENTATIONS[name][1](self)
+        return self._cache[name]
+
+    def done_with(self, name):
+        """
+        True when none of the features still to be computed reads ``name``
+        (other than through the power spectrogram).
+        """
+        return not any(name in self.analysis.direct[feature] for feature in self.remaining)
+
+    def drop(self, name):
+        self._cache.pop(name, None)
+
+
+class _FrameMean:
+    """
+    Running mean of a frame-level feature across chunks.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.total = None
+        self.count = 0
+
+    def add(self, chunk):
+        values = self.fn(chunk)
+        total = np.sum(values, axis=-1)
+        self.total = total if self.total is None else self.total + total
+        self.count += values.shape[-1]
+
+    def result(self):
+        mean = self.total / self.count
+        return mean if np.ndim(mean) else float(mean)
+
+
+class _Analysis:
+    """
+    Accumulates the requested features over the chunks of one track.
+    """
+
+    def __init__(self, sr, features=None):
+        names = list(features) if features is not None else list(FEATURES)
+        unknown = sorted(set(names) - set(FEATURES))
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(unknown)}")
+
+        self.names = names
+        self.sr = sr
+        # Shared by the chunks of this track: estimated tuning, last mel frame
+        self.state = {}
+        self.chunks = 0
+        # Features reading the magnitude spectrogram go first, so the power
+        # spectrogram can then be squared in place.
+        self.order = sorted(names, key=lambda name: 'power' in requirements([name]))
+        self.direct = {name: requirements([name], skip={'power'}) for name in self.order}
+        self.accumulators = {name: FEATURES[name].accumulator(sr) for name in self.order}
+
+    def add(self, y, **chunk_options):
+        chunk = _Chunk(self, y, **chunk_options)
+        for index, name in enumerate(self.order):
+            chunk.remaining = self.order[index:]
+            self.accumulators[name].add(chunk)
+        self.chunks += 1
+
+    def summary(self):
+        return {name: self.accumulators[name].result() for name in self.names}
+
+
+# Representations
+
+@representation('waveform')
+def _waveform(chunk):
+    return chunk.y
+
+
+@representation('stft', requires=('waveform',))
+def _stft(chunk):
+    # The only FFT pass
+    return np.abs(librosa.stft(
+        chunk.get('waveform'), n_fft=N_FFT, hop_length=HOP_LENGTH, center=chunk.center
+    ))
+
+
+@representation('power', requires=('stft',))
+def _power(chunk):
+    S = chunk.get('stft')
+    if chunk.done_with('stft'):
+        # The magnitudes are not needed any more, square them in place
+        chunk.drop('stft')
+        return np.square(S, out=S)
+    return S ** 2
+
+
+@representation('centroid', requires=('stft',))
+def _centroid(chunk):
+    return librosa.feature.spectral_centroid(S=chunk.get('stft'), sr=chunk.sr)
+
+
+@representation('mel', requires=('power',))
+def _mel(chunk):
+    return librosa.power_to_db(librosa.feature.melspectrogram(S=chunk.get('power'), sr=chunk.sr))
+
+
+@representation('chromagram', requires=('power',))
+def _chromagram(chunk):
+    power = chunk.get('power')
+    # Estimated on the first chunk and reused, for a consistent chroma
+    if 'tuning' not in chunk.state:
+        chunk.state['tuning'] = librosa.estimate_tuning(S=power, sr=chunk.sr, bins_per_octave=12)
+    return librosa.feature.chroma_stft(S=power, sr=chunk.sr, tuning=chunk.state['tuning'])
+
+
+@representation('onset', requires=('mel',))
+def _onset(chunk):
+    mel_db = chunk.get('mel')
+    if chunk.whole:
+        return librosa.onset.onset_strength(S=mel_db, sr=chunk.sr)
+
+    # Spectral flux needs the previous frame, so carry it across blocks
+    prev_mel = chunk.state.get('prev_mel') if chunk.contiguous else None
+    chunk.state['prev_mel'] = mel_db[:, -1:]
+    if prev_mel is None:
+        onset = librosa.onset.onset_strength(S=mel_db, sr=chunk.sr, center=False)
+    else:
+        onset = librosa.onset.onset_strength(
+            S=np.hstack([prev_mel, mel_db]), sr=chunk.sr, center=False
+        )[1:]
+    return onset.astype(np.float32)
+
+
+# Features
+
+@feature('rms', requires=('waveform',))
+def _rms(chunk):
+    # Time-domain, framed exactly like the STFT
+    return librosa.feature.rms(
+        y=chunk.get('waveform'), frame_length=N_FFT, hop_length=HOP_LENGTH, center=chunk.center
+    )[0]
+
+
+@feature('zcr', requires=('waveform',))
+def _zcr(chunk):
+    return librosa.feature.zero_crossing_rate(
+        chunk.get('waveform'), frame_length=N_FFT, hop_length=HOP_LENGTH, center=chunk.center
+    )[0]
+
+
+@feature('spectral_centroid', requires=('centroid',))
+def _spectral_centroid(chunk):
+    return chunk.get('centroid')[0]
 
-    # Tempo (BPM)
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
 
-    # Energy (RMS)
-    energy = np.mean(librosa.feature.rms(y=y))
+@feature('spectral_rolloff', requires=('stft',))
+def _spectral_rolloff(chunk):
+    return librosa.feature.spectral_rolloff(S=chunk.get('stft'), sr=chunk.sr)[0]
 
-    # Zero-crossing rate
-    zcr = np.mean(librosa.feature.zero_crossing_rate(y))
 
-    # Spectral centroid (brightness)
-    spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+@feature('spectral_bandwidth', requires=('stft', 'centroid'))
+def _spectral_bandwidth(chunk):
+    return librosa.feature.spectral_bandwidth(
+        S=chunk.get('stft'), sr=chunk.sr, centroid=chunk.get('centroid')
+    )[0]
 
-    # Spectral rolloff (acousticness)
-    spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
 
-    # Chroma STFT
-    chroma_stft = np.mean(librosa.feature.chroma_stft(y=y, sr=sr))
+@feature('chroma', requires=('chromagram',))
+def _chroma(chunk):
+    return chunk.get('chromagram')
 
-    # MFCCs (summary)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    mfcc_mean = np.mean(mfcc)
+
+@feature('mfcc', requires=('mel',))
+def _mfcc(chunk):
+    return librosa.feature.mfcc(S=chunk.get('mel'), n_mfcc=N_MFCC)
+
+
+class _TempoAccumulator:
+    """
+    Running mean of the onset autocorrelation (tempogram) for an onset
+    envelope that arrives in blocks.
+
+    The last ``win_length - 1`` onset values are carried between blocks so
+    windows spanning a block boundary are still counted, and the envelope is
+    zero-padded by half a window at both ends like librosa's centred
+    tempogram. Memory use does not depend on the track length.
+    """
+
+    def __init__(self, sr):
+        self.sr = sr
+        self.win_length = librosa.time_to_frames(8.0, sr=sr, hop_length=HOP_LENGTH).item()
+        self.pending = np.zeros(self.win_length // 2, dtype=np.float32)
+        self.total = np.zeros(self.win_length)
+        self.count = 0
+
+    def add(self, onset):
+        pending = np.concatenate([self.pending, onset])
+        if pending.shape[-1] >= self.win_length:
+            tg = librosa.feature.tempogram(
+                onset_envelope=pending,
+                sr=self.sr,
+                hop_length=HOP_LENGTH,
+                win_length=self.win_length,
+                center=False,
+            )
+            self.total += tg.sum(axis=-1)
+            self.count += tg.shape[-1]
+            pending = pending[tg.shape[-1]:]
+        self.pending = pending
+
+    def end_segment(self):
+        """
+        Close the current run of onsets, e.g. before a non-contiguous
+        excerpt of the same track.
+        """
+        self.add(np.zeros(self.win_length // 2, dtype=np.float32))
+        self.pending = np.zeros(self.win_length // 2, dtype=np.float32)
+
+    def tempo(self):
+        self.end_segment()
+        tg = (self.total / self.count)[:, np.newaxis]
+        return float(librosa.feature.tempo(tg=tg, sr=self.sr, hop_length=HOP_LENGTH)[0])
+
+
+@track_feature('tempo', requires=('onset',))
+class _Tempo:
+    """
+    Tempo (BPM): the estimate beat_track would report, without tracking the
+    beats.
+    """
+
+    def __init__(self, sr):
+        self.sr = sr
+        self.envelope = None
+        self.running = _TempoAccumulator(sr)
+
+    def add(self, chunk):
+        onset = chunk.get('onset')
+        if chunk.whole:
+            self.envelope = onset
+            return
+        self.running.add(onset)
+        if not chunk.contiguous:
+            self.running.end_segment()
+
+    def result(self):
+        if self.envelope is not None:
+            tempo = librosa.feature.tempo(onset_envelope=self.envelope, sr=self.sr, hop_length=HOP_LENGTH)
+            return float(tempo[0])
+        return self.running.tempo()
+
+
+# Features read by ``features_from_summary``
+TRACK_FEATURE_INPUTS = (
+    'tempo', 'rms', 'zcr', 'spectral_centroid', 'spectral_rolloff', 'spectral_bandwidth',
+    'chroma', 'mfcc',
+)
+
+
+def compute_summary(y, sr, features=None):
+    """
+    Compute the per-track means of the requested features (default: every
+    registered feature) from the whole signal ``y``.
+    """
+    analysis = _Analysis(sr, features)
+    analysis.add(y, whole=True)
+    return analysis.summary()
+
+
+def compute_summary_streaming(file_path, features=None, block_length=STREAM_BLOCK_FRAMES):
+    """
+    Compute the same summary as ``compute_summary`` while reading the file
+    in fixed-size blocks.
+
+    Feature means and the tempogram used for tempo are accumulated as
+    running sums, so peak memory depends on ``block_length`` rather than on
+    the track length.
+
+    Only formats soundfile can read are supported; decode errors propagate.
+    """
+    sr = librosa.get_samplerate(file_path)
+    analysis = _Analysis(sr, features)
+
+    blocks = librosa.stream(
+        file_path,
+        block_length=block_length,
+        frame_length=N_FFT,
+        hop_length=HOP_LENGTH,
+        mono=True,
+    )
+    for block in blocks:
+        if block.shape[-1] < N_FFT:
+            # Trailing samples shorter than one frame
+            continue
+        # Blocks overlap by N_FFT - HOP_LENGTH samples, so un-centred frames
+        # line up with a single pass over the whole file.
+        analysis.add(block, center=False, contiguous=True)
+
+    if not analysis.chunks:
+        raise ValueError(f"'{file_path}' is shorter than one analysis frame.")
+
+    return analysis.summary(), sr
+
+
+def compute_summary_excerpts(excerpts, sr=FAST_SAMPLE_RATE, features=None):
+    """
+    Compute the summary over one or more excerpts sampled at ``sr``.
+
+    Frame statistics and the tempogram are pooled over all excerpts.
+    """
+    analysis = _Analysis(sr, features)
+    for y in excerpts:
+        if y.shape[-1] >= N_FFT:
+            analysis.add(y)
+
+    if not analysis.chunks:
+        raise ValueError("No audio in the requested excerpts.")
+
+    return analysis.summary()
+
+
+def features_from_summary(summary, sr):
+    """
+    Map the spectral summary onto the TrackFeature fields, mood and the
+    packed feature vector.
+    """
+    tempo = summary["tempo"]
+    energy = summary["rms"]
+    zcr = summary["zcr"]
+    # Every chroma bin has the same number of frames, so the mean of the
+    # per-bin means equals the mean over the whole chromagram.
+    chroma_stft = float(np.mean(summary["chroma"]))
 
     # Heuristic logic
     danceability = min(1.0, tempo / 250.0)
     speechiness = zcr
     instrumentalness = max(0.0, 1.0 - chroma_stft)
-    acousticness = max(0.0, 1.0 - spectral_rolloff / sr)
-    liveness = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr)) / sr
-    valence = spectral_centroid / sr
+    acousticness = max(0.0, 1.0 - summary["spectral_rolloff"] / sr)
+    liveness = summary["spectral_bandwidth"] / sr
+    valence = summary["spectral_centroid"] / sr
 
     # Mood classification
-    if valence > 0.6 and tempo > 110:
-        mood = "happy"
-    elif valence < 0.4 and tempo < 90 and energy < 0.2:
-        mood = "sad"
-    elif energy > 0.25 and tempo > 120:
-        mood = "energetic"
-    elif acousticness > 0.5 and tempo < 100:
-        mood = "calm"
-    elif 0.4 < valence < 0.65 and acousticness > 0.3 and tempo < 100:
-        mood = "romantic"
-    elif energy > 0.4 and speechiness > 0.15:
-        mood = "angry"
-    else:
-        mood = "chill"
+    mood = classify_mood(valence, tempo, energy, acousticness, speechiness)
 
-    return {
+    features = {
         "tempo": float(tempo),
         "energy": float(energy),
         "danceability": float(danceability),
@@ -62,7 +470,142 @@ def extract_features(file_path):
         "liveness": float(liveness),
         "mood": mood,
     }
+    features["vector"] = pack(features, summary["chroma"], summary["mfcc"])
+    return features
+
+
+def audio_duration(file_path):
+    """
+    Duration in seconds, read from the file header where possible.
+    """
+    return librosa.get_duration(path=file_path)
+
+
+def excerpt_offsets(duration, excerpt_seconds, start=0.0, windows=1):
+    """
+    Offsets of the excerpts analysed in fast mode.
+
+    A single window starts at ``start`` (the track's demo start time) and
+    falls back to the beginning when that would run past the end. Several
+    windows split ``excerpt_seconds`` evenly across the whole track.
+    Returns ``(offsets, window_seconds)``.
+    """
+    if windows <= 1:
+        if start + excerpt_seconds > duration:
+            start = max(0.0, duration - excerpt_seconds)
+        return [float(start)], excerpt_seconds
+
+    window_seconds = excerpt_seconds / windows
+    last = max(0.0, duration - window_seconds)
+    return [float(offset) for offset in np.linspace(0.0, last, windows)], window_seconds
+
+
+def load_excerpts(file_path, start=0.0, sr=FAST_SAMPLE_RATE,
+                  excerpt_seconds=FAST_EXCERPT_SECONDS, windows=1):
+    """
+    Decode only the fast-mode excerpts, resampled to ``sr``.
+
+    Returns ``(excerpts, native_sr)``.
+    """
+    duration = audio_duration(file_path)
+    offsets, window_seconds = excerpt_offsets(duration, excerpt_seconds, start, windows)
+    excerpts = [
+        librosa.load(file_path, sr=sr, offset=offset, duration=window_seconds)[0]
+        for offset in offsets
+    ]
+    return excerpts, librosa.get_samplerate(file_path)
+
+
+def decode(file_path, stream=False, fast=None):
+    """
+    Decode step of an extraction, split from ``analyse`` so callers can
+    decode the next file while another one is being analysed.
+
+    ``fast`` holds ``load_excerpts`` keyword arguments for fast mode.
+    Streaming decodes while it analyses, so there is nothing to do up front
+    and None is returned.
+    """
+    if fast is not None:
+        return load_excerpts(file_path, **fast)
+    if stream:
+        return None
+    return librosa.load(file_path, sr=None)
+
+
+def summarise(file_path, decoded, features=None, stream=False, fast=None):
+    """
+    Summary of the requested features for the output of ``decode`` with the
+    same options. Returns ``(summary, sr)``, where ``sr`` is the native
+    sample rate of the file.
+    """
+    if fast is not None:
+        excerpts, native_sr = decoded
+        return compute_summary_excerpts(excerpts, fast.get('sr', FAST_SAMPLE_RATE), features), native_sr
+    if stream:
+        return compute_summary_streaming(file_path, features)
+    y, sr = decoded
+    return compute_summary(y, sr, features), sr
+
+
+def analyse(file_path, decoded, stream=False, fast=None):
+    """
+    Analysis step for the output of ``decode`` with the same options.
+    """
+    # In fast mode the rate-relative heuristics (valence, acousticness,
+    # liveness) are still normalised by the native rate, as in full mode;
+    # dividing by the lower analysis rate would inflate them.
+    summary, sr = summarise(file_path, decoded, TRACK_FEATURE_INPUTS, stream=stream, fast=fast)
+    return features_from_summary(summary, sr)
+
+
+def extract(file_path, features=None, stream=False, fast=None):
+    """
+    Compute the named features of an audio file (default: every registered
+    feature). Vector features such as chroma are numpy arrays.
+    """
+    decoded = decode(file_path, stream=stream, fast=fast)
+    summary, _ = summarise(file_path, decoded, features, stream=stream, fast=fast)
+    return summary
+
+
+def extract_features_fast(file_path, **fast):
+    """
+    Extract TrackFeature values from a bounded excerpt resampled to a fixed
+    analysis rate. Accepts the ``load_excerpts`` keyword arguments.
+    """
+    return analyse(file_path, decode(file_path, fast=fast), fast=fast)
+
+
+def extract_features(file_path, stream=False):
+    """
+    Extract TrackFeature values from an audio file.
+
+    With ``stream=True`` the file is analysed block by block in constant
+    memory instead of being decoded into one array.
+    """
+    return analyse(file_path, decode(file_path, stream=stream), stream=stream)
+
+
+def warm_up(seconds=2.0, sr=FAST_SAMPLE_RATE):
+    """
+    Run every extraction path once on a short synthetic signal, so numba
+    compiles its kernels (or loads them from NUMBA_CACHE_DIR) before the
+    first real track. Returns the time taken in seconds.
+    """
+    start = time.perf_counter()
+    t = np.arange(int(seconds * sr)) / sr
+    y = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+    # Full analysis
+    features_from_summary(compute_summary(y, sr), sr)
+
+    # Streaming and fast mode: un-centred frames and the tempogram accumulator
+    analysis = _Analysis(sr)
+    analysis.add(y, center=False, contiguous=True)
+    analysis.summary()
+    compute_summary_excerpts([y], sr)
 
-# === MANUAL TESTING BLOCK ===
+    # Resampler used when fast mode loads at a fixed rate
+    librosa.resample(y, orig_sr=sr, target_sr=sr // 2)
 
-# Change this to your track ID
\ No newline at end of file
+    return time.perf_counter() - start
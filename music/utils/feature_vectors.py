@@ -0,0 +1,65 @@
+import numpy as np
+
+# Layout of TrackFeature.vector: the scalar TrackFeature fields followed by
+# the 12 chroma bin means and the MFCC means, packed as little-endian
+# float32. A layout is told apart by its length: append new components at
+# the end, and vectors stored with an earlier layout are skipped by
+# load_matrix until `manage.py extract_features --backfill-vectors`
+# re-extracts them.
+SCALAR_FIELDS = [
+    'danceability', 'energy', 'valence', 'tempo',
+    'speechiness', 'instrumentalness', 'acousticness', 'liveness',
+]
+CHROMA_BINS = 12
+MFCC_COEFFICIENTS = 13
+
+VECTOR_LAYOUT = (
+    SCALAR_FIELDS
+    + [f'chroma_{index}' for index in range(CHROMA_BINS)]
+    + [f'mfcc_{index}' for index in range(MFCC_COEFFICIENTS)]
+)
+VECTOR_SIZE = len(VECTOR_LAYOUT)
+VECTOR_DTYPE = np.dtype('<f4')
+VECTOR_BYTES = VECTOR_SIZE * VECTOR_DTYPE.itemsize
+
+
+def pack(features, chroma, mfcc):
+    """
+    Pack the TrackFeature values and the chroma/MFCC means into the bytes
+    stored in TrackFeature.vector.
+    """
+    vector = np.concatenate([
+        [features[field] for field in SCALAR_FIELDS],
+        np.asarray(chroma).reshape(CHROMA_BINS),
+        np.asarray(mfcc).reshape(MFCC_COEFFICIENTS),
+    ])
+    return vector.astype(VECTOR_DTYPE).tobytes()
+
+
+def unpack(blob):
+    """
+    One stored vector as a float32 array of length VECTOR_SIZE.
+    """
+    return np.frombuffer(blob, dtype=VECTOR_DTYPE)
+
+
+def load_matrix(rows):
+    """
+    Stack ``(id, vector)`` rows, e.g. from
+    ``TrackFeature.objects.values_list('track_id', 'vector')``, into an id
+    array and a contiguous ``(n, VECTOR_SIZE)`` float32 matrix.
+
+    The blobs are joined and reinterpreted in one step; no per-row arrays
+    are created. Rows with a missing or malformed vector are skipped.
+    """
+    ids = []
+    blobs = []
+    for pk, blob in rows:
+        if blob is not None and len(blob) == VECTOR_BYTES:
+            ids.append(pk)
+            blobs.append(blob)
+
+    matrix = np.frombuffer(b''.join(blobs), dtype=VECTOR_DTYPE).reshape(len(blobs), VECTOR_SIZE)
+    # frombuffer gives a read-only view of the joined bytes; return a
+    # writable, native-endian array callers can normalise in place.
+    return np.array(ids, dtype=np.int64), matrix.astype(np.float32)
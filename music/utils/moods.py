@@ -0,0 +1,49 @@
+import numpy as np
+
+# Rules are checked in order; the first match wins and anything unmatched
+# is 'chill'. Thresholds apply to the TrackFeature values.
+MOOD_RULES = [
+    ('happy',     lambda v, t, e, a, s: (v > 0.6) & (t > 110)),
+    ('sad',       lambda v, t, e, a, s: (v < 0.4) & (t < 90) & (e < 0.2)),
+    ('energetic', lambda v, t, e, a, s: (e > 0.25) & (t > 120)),
+    ('calm',      lambda v, t, e, a, s: (a > 0.5) & (t < 100)),
+    ('romantic',  lambda v, t, e, a, s: (v > 0.4) & (v < 0.65) & (a > 0.3) & (t < 100)),
+    ('angry',     lambda v, t, e, a, s: (e > 0.4) & (s > 0.15)),
+]
+DEFAULT_MOOD = 'chill'
+
+
+def classify_moods(valence, tempo, energy, acousticness, speechiness):
+    """
+    Vectorised mood classification over equally shaped arrays of feature
+    values. Returns an array of mood labels.
+    """
+    values = [
+        np.asarray(column, dtype=np.float64)
+        for column in (valence, tempo, energy, acousticness, speechiness)
+    ]
+    conditions = [rule(*values) for _, rule in MOOD_RULES]
+    return np.select(conditions, [mood for mood, _ in MOOD_RULES], default=DEFAULT_MOOD)
+
+
+def classify_mood(valence, tempo, energy, acousticness, speechiness):
+    """
+    Mood label for a single track.
+    """
+    return str(classify_moods(valence, tempo, energy, acousticness, speechiness))
+
+
+def with_current_mood(features):
+    """
+    Return a copy of a TrackFeature value dict with its mood recomputed, so
+    stored values (e.g. from the feature cache) follow the current rules.
+    """
+    features = dict(features)
+    features['mood'] = classify_mood(
+        features['valence'],
+        features['tempo'],
+        features['energy'],
+        features['acousticness'],
+        features['speechiness'],
+    )
+    return features
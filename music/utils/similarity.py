@@ -0,0 +1,187 @@
+import numpy as np
+
+METRICS = ('cosine', 'euclidean')
+
+
+def standardisation(matrix):
+    """
+    Per-component mean and standard deviation of a vector matrix, with
+    constant components left unscaled.
+    """
+    if not len(matrix):
+        dim = matrix.shape[1]
+        return np.zeros(dim, dtype=np.float32), np.ones(dim, dtype=np.float32)
+    mean = matrix.mean(axis=0)
+    std = matrix.std(axis=0)
+    std[std == 0] = 1.0
+    return mean.astype(np.float32), std.astype(np.float32)
+
+
+def distances(vectors, norms, query, metric):
+    """
+    Distances from ``query`` to every row of ``vectors`` (with precomputed
+    row ``norms``) from one matrix-vector product. Euclidean distances are
+    returned squared; ``top_k`` takes the root of the ones it keeps.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'.")
+    dots = vectors @ query
+    query_norm = float(np.linalg.norm(query))
+    if metric == 'cosine':
+        denominator = norms * query_norm
+        denominator[denominator == 0] = 1.0
+        return 1.0 - dots / denominator
+    # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+    return norms * norms + query_norm * query_norm - 2.0 * dots
+
+
+def top_k(ids, result, k, metric):
+    """
+    The ``k`` smallest entries of ``result`` (from ``distances``) as
+    ``(ids, distances)``, closest first.
+    """
+    k = min(k, int(np.count_nonzero(np.isfinite(result))))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    top = np.argpartition(result, k - 1)[:k]
+    top = top[np.argsort(result[top], kind='stable')]
+    values = result[top]
+    if metric == 'euclidean':
+        values = np.sqrt(np.maximum(values, 0.0))
+    return ids[top], values
+
+
+def merge(results, k):
+    """
+    Merge ``(ids, distances)`` results of the same query, keeping the
+    closest ``k`` and the first occurrence of each id.
+    """
+    ids = np.concatenate([result[0] for result in results])
+    values = np.concatenate([result[1] for result in results])
+    order = np.argsort(values, kind='stable')
+    ids, values = ids[order], values[order]
+    _, first = np.unique(ids, return_index=True)
+    keep = np.sort(first)[:k]
+    return ids[keep], values[keep]
+
+
+class VectorIndex:
+    """
+    In-memory nearest-neighbour index over packed feature vectors.
+
+    Vectors are standardised per component with the mean and standard
+    deviation of the catalogue they were built from (or given ones), so
+    tempo (~100s) does not drown out chroma and MFCC means. Distances are
+    cosine or Euclidean distances between standardised vectors; both come
+    out of one matrix-vector product per query.
+
+    Rows can be updated, added and removed after the build; removed rows
+    stay in place and are masked out. The standardisation statistics are
+    kept from the build, so rebuild when a large share of rows has changed.
+    """
+
+    def __init__(self, ids, matrix, mean=None, std=None):
+        n, dim = matrix.shape
+        if mean is None:
+            mean, std = standardisation(matrix)
+        self.mean = mean
+        self.std = std
+
+        capacity = max(n, 1024)
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.norms = np.zeros(capacity, dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self._sorted_ids = np.zeros(0, dtype=np.int64)
+        self._sorted_rows = np.zeros(0, dtype=np.int64)
+        self.upsert(ids, matrix)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.active[:self.size]))
+
+    def standardise(self, matrix):
+        return ((matrix - self.mean) / self.std).astype(np.float32)
+
+    def _rows(self, ids):
+        """
+        Row of each id, or -1 where the id has never been indexed.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        if len(self._sorted_ids):
+            at = np.minimum(np.searchsorted(self._sorted_ids, ids), len(self._sorted_ids) - 1)
+            found = self._sorted_ids[at] == ids
+            rows[found] = self._sorted_rows[at[found]]
+        return rows
+
+    def _grow(self, needed):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('vectors', 'norms', 'ids', 'active'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def upsert(self, ids, matrix):
+        """
+        Add or replace the vectors of ``ids`` (raw, unstandardised rows).
+        """
+        if not len(ids):
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = self._rows(ids)
+        new = rows < 0
+        added = int(np.count_nonzero(new))
+        if added:
+            self._grow(self.size + added)
+            rows[new] = np.arange(self.size, self.size + added)
+            self.ids[rows[new]] = ids[new]
+            self.size += added
+
+        vectors = self.standardise(matrix)
+        self.vectors[rows] = vectors
+        self.norms[rows] = np.linalg.norm(vectors, axis=1)
+        self.active[rows] = True
+
+        if added:
+            order = np.argsort(self.ids[:self.size], kind='stable')
+            self._sorted_ids = self.ids[order]
+            self._sorted_rows = order
+
+    def remove(self, ids):
+        rows = self._rows(ids)
+        self.active[rows[rows >= 0]] = False
+
+    def vector(self, track_id):
+        """
+        The standardised vector of ``track_id``, or None if not indexed.
+        """
+        row = int(self._rows([track_id])[0])
+        if row < 0 or not self.active[row]:
+            return None
+        return self.vectors[row]
+
+    def search(self, query, k=10, metric='cosine', exclude=()):
+        """
+        The ``k`` indexed ids closest to the standardised ``query`` vector
+        and their distances, closest first, leaving out ``exclude``.
+        """
+        result = distances(self.vectors[:self.size], self.norms[:self.size], query, metric)
+        result[~self.active[:self.size]] = np.inf
+        rows = self._rows(exclude)
+        result[rows[rows >= 0]] = np.inf
+        return top_k(self.ids[:self.size], result, k, metric)
+
+    def nearest(self, track_id, k=10, metric='cosine'):
+        """
+        The ``k`` ids closest to ``track_id``; None when it is not indexed.
+        """
+        query = self.vector(track_id)
+        if query is None:
+            return None
+        return self.search(query, k=k, metric=metric, exclude=[track_id])
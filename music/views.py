@@ -1,26 +1,61 @@
 # music/views.py
 
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 import logging
+from urllib.parse import quote
 music_logger = logging.getLogger('music')
+from backend.conditional import ConditionalGetMixin
+from backend.fieldsets import SparseFieldsetMixin
+from backend.pagination import SelectablePagination
+from backend.response_cache import CachedResponseMixin, stats as response_cache_stats
 from users.models import Artist
-from music.models import Track, TrackFeature, Interaction, ListeningHistory, TrackStatistics
+from music.models import (
+    Track, TrackFeature, TrackNeighbour, Interaction, ListeningHistory, TrackStatistics,
+    TrackPlayRollup, ArtistPlayRollup, TrackTrending,
+)
+from music import play_buffer
+from music.events import save_events
+from music.feature_cache import cache_stats
+from music.rollups import PERIODS as ROLLUP_PERIODS, play_series
+from music.similarity import similar_tracks
+from music.trending import decay_factor, landmark as trending_landmark
+from music.utils.similarity import METRICS as SIMILARITY_METRICS
 from users.serializers import ArtistSerializer as MusicArtistSerializer
 from music.serializers import (
     TrackSerializer,
+    TrackCompactSerializer,
+    TrackLyricsSerializer,
     TrackFeatureSerializer,
     InteractionSerializer,
     ListeningHistorySerializer,
     TrackStatisticsSerializer,
+    EventSerializer,
+    EventBatchSerializer,
+    PlaySerializer,
 )
 
+# ?fields= / ?omit= of SparseFieldsetMixin views
+FIELDSET_PARAMETERS = [
+    openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Comma-separated fields to return'),
+    openapi.Parameter('omit', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description='Comma-separated fields to leave out'),
+]
+
 
 # ----------------------------
 # Artist Endpoints
@@ -29,7 +64,7 @@ class ArtistViewSet(viewsets.ModelViewSet):
     """
     CRUD for Artist profiles.
     """
-    queryset = Artist.objects.all()
+    queryset = Artist.objects.select_related('user')
     serializer_class = MusicArtistSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
@@ -84,7 +119,7 @@ class ArtistViewSet(viewsets.ModelViewSet):
 # ----------------------------
 # Track Endpoints
 # ----------------------------
-class TrackViewSet(viewsets.ModelViewSet):
+class TrackViewSet(CachedResponseMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Only artists may create tracks; listeners & anonymous can only read approved tracks.
     """
@@ -92,15 +127,24 @@ class TrackViewSet(viewsets.ModelViewSet):
     serializer_class = TrackSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
+    pagination_class = SelectablePagination
+    cursor_ordering = ('-created_at', '-id')
+    cache_endpoint = 'tracks'
+    version_field = 'updated_at'
 
     @swagger_auto_schema(
         tags=['Music Tracks'],
         operation_summary="List approved tracks",
         operation_description=(
             "For anonymous or listener/artist roles, returns only approved tracks; "
-            "for moderators and admins, returns all tracks."
+            "for moderators and admins, returns all tracks. "
+            "`?pagination=cursor` (or following a `cursor` link) switches to keyset pages: "
+            "`next`/`previous` links and no `count`, at the same cost however deep the page. "
+            "Tracks are compact (no lyrics or moderation notes) unless `fields` picks other "
+            "track fields; `omit` drops some."
         ),
-        responses={200: TrackSerializer(many=True)}
+        manual_parameters=FIELDSET_PARAMETERS,
+        responses={200: TrackCompactSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -109,6 +153,7 @@ class TrackViewSet(viewsets.ModelViewSet):
         tags=['Music Tracks'],
         operation_summary="Retrieve a track",
         operation_description="Get the details of a single track by its ID.",
+        manual_parameters=FIELDSET_PARAMETERS,
         responses={200: TrackSerializer}
     )
     def retrieve(self, request, *args, **kwargs):
@@ -169,6 +214,183 @@ class TrackViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        tags=['Music Tracks'],
+        operation_summary="Similar tracks",
+        operation_description=(
+            "Approved tracks whose audio features are closest to this track, closest first. "
+            "`metric` is `cosine` (default) or `euclidean`, both over standardised feature "
+            "vectors; `k` is the number of results. When the approximate index is built, "
+            "`probes` trades latency for recall."
+        ),
+        manual_parameters=[
+            openapi.Parameter('k', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Number of results (default 10)'),
+            openapi.Parameter('metric', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[*SIMILARITY_METRICS]),
+            openapi.Parameter('probes', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Extra buckets searched per hash table'),
+        ],
+        responses={
+            200: openapi.Response(description="Similar tracks with their `distance`"),
+            404: openapi.Response(description="Track not found or not analysed yet"),
+        }
+    )
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        track = self.get_object()
+        metric = request.query_params.get('metric', 'cosine')
+        if metric not in SIMILARITY_METRICS:
+            raise ValidationError({'metric': f"Must be one of: {', '.join(SIMILARITY_METRICS)}."})
+        try:
+            k = int(request.query_params.get('k', 10))
+            probes = int(request.query_params.get('probes', settings.SIMILARITY_PROBES))
+        except ValueError:
+            raise ValidationError("`k` and `probes` must be integers.")
+        k = max(1, min(k, settings.SIMILARITY_MAX_RESULTS))
+        probes = max(0, min(probes, settings.SIMILARITY_MAX_PROBES))
+
+        result = similar_tracks(track.id, k=k, metric=metric, probes=probes)
+        if result is None:
+            raise NotFound("This track has no audio features yet.")
+        ids, distances = result
+
+        tracks = Track.objects.only(*TrackCompactSerializer.Meta.fields).in_bulk(ids.tolist())
+        results = []
+        for track_id, distance in zip(ids.tolist(), distances.tolist()):
+            if track_id in tracks:
+                results.append({**TrackCompactSerializer(tracks[track_id]).data, 'distance': distance})
+        return Response({'track': track.id, 'metric': metric, 'results': results})
+
+    @swagger_auto_schema(
+        tags=['Music Tracks'],
+        operation_summary="Listeners also played",
+        operation_description=(
+            "Approved tracks most often played or liked by the listeners of this track, "
+            "from the precomputed neighbour table (`manage.py build_track_neighbours`). "
+            "`k` is the number of results."
+        ),
+        manual_parameters=[
+            openapi.Parameter('k', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Number of results (default 10)'),
+        ],
+        responses={200: openapi.Response(description="Tracks with their co-listening `score`")}
+    )
+    @action(detail=True, methods=['get'], url_path='also-played')
+    def also_played(self, request, pk=None):
+        track = self.get_object()
+        try:
+            k = int(request.query_params.get('k', 10))
+        except ValueError:
+            raise ValidationError({'k': "Must be an integer."})
+        k = max(1, min(k, settings.SIMILARITY_MAX_RESULTS))
+
+        # One range scan of the (track, rank) index
+        neighbours = (
+            TrackNeighbour.objects.filter(track=track, neighbour__approval_status='approved')
+            .select_related('neighbour')
+            .only('neighbour', 'score', *(f'neighbour__{name}' for name in TrackCompactSerializer.Meta.fields))
+            .order_by('rank')[:k]
+        )
+        results = [
+            {**TrackCompactSerializer(row.neighbour).data, 'score': row.score}
+            for row in neighbours
+        ]
+        return Response({'track': track.id, 'results': results})
+
+    @swagger_auto_schema(
+        tags=['Music Tracks'],
+        operation_summary="Trending tracks",
+        operation_description=(
+            "Approved tracks ranked by recent listens, likes and comments, each counting "
+            "half as much every `TRENDING_HALF_LIFE_HOURS`. Optionally filtered by `genre` "
+            "or `mood`; `limit` is the number of results. Scores are updated every few "
+            "minutes and responses are cached for `TRENDING_CACHE_SECONDS`."
+        ),
+        manual_parameters=[
+            openapi.Parameter('genre', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('mood', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=[mood for mood, _ in TrackFeature.MOOD_CHOICES]),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Number of results (default 20)'),
+        ],
+        responses={200: openapi.Response(description="Tracks with their current trending `score`")}
+    )
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        genre = request.query_params.get('genre') or None
+        mood = request.query_params.get('mood') or None
+        if mood is not None and mood not in dict(TrackFeature.MOOD_CHOICES):
+            raise ValidationError({'mood': f"Must be one of: {', '.join(dict(TrackFeature.MOOD_CHOICES))}."})
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            raise ValidationError({'limit': "Must be an integer."})
+        limit = max(1, min(limit, settings.TRENDING_MAX_RESULTS))
+
+        key = f"trending:{quote(genre or '')}:{mood or ''}:{limit}"
+        payload = cache.get(key)
+        if payload is None:
+            rows = TrackTrending.objects.filter(track__approval_status='approved')
+            if genre is not None:
+                rows = rows.filter(genre=genre)
+            if mood is not None:
+                rows = rows.filter(mood=mood)
+            # The (genre|mood, -score) indexes return rows already in order
+            rows = (
+                rows.select_related('track')
+                .only('score', *(f'track__{name}' for name in TrackCompactSerializer.Meta.fields))
+                .order_by('-score')[:limit]
+            )
+            at_landmark = trending_landmark()
+            factor = decay_factor(at_landmark, timezone.now()) if at_landmark is not None else 1.0
+            payload = {
+                'genre': genre,
+                'mood': mood,
+                'results': [
+                    {**TrackCompactSerializer(row.track).data, 'score': row.score * factor}
+                    for row in rows
+                ],
+            }
+            cache.set(key, payload, timeout=settings.TRENDING_CACHE_SECONDS)
+        response = Response(payload)
+        patch_cache_control(response, public=True, max_age=settings.TRENDING_CACHE_SECONDS)
+        return response
+
+    @swagger_auto_schema(
+        tags=['Music Tracks'],
+        operation_summary="Response cache statistics",
+        operation_description=(
+            "Hit and miss counters of the response cache for each cached endpoint, and whether "
+            "it is enabled (moderators and admins only)."
+        ),
+        responses={200: openapi.Response(description="Cache counters per endpoint")}
+    )
+    @action(detail=False, methods=['get'], url_path='response-cache-stats', permission_classes=[IsAuthenticated])
+    def response_cache_stats(self, request):
+        if request.user.role not in ['moderator', 'admin']:
+            raise PermissionDenied("Only moderators or admins can view cache statistics.")
+        return Response(response_cache_stats())
+
+    @swagger_auto_schema(
+        tags=['Music Tracks'],
+        operation_summary="Track lyrics",
+        operation_description="The lyrics of a track, which lists leave out.",
+        responses={200: TrackLyricsSerializer}
+    )
+    @action(detail=True, methods=['get'])
+    def lyrics(self, request, pk=None):
+        track = get_object_or_404(self.get_queryset().only('id', 'lyrics'), pk=pk)
+        return Response(TrackLyricsSerializer(track).data)
+
+    def get_serializer_class(self):
+        # Lists are compact unless ?fields= asks for other track fields
+        if self.action == 'list' and self.fields_query_param not in self.request.query_params:
+            return TrackCompactSerializer
+        return TrackSerializer
+
+    def cache_role(self, request):
+        # Same split as get_queryset
+        user = request.user
+        if not user.is_authenticated or user.role in ['listener', 'artist']:
+            return 'public'
+        return 'staff'
+
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated or user.role in ['listener', 'artist']:
@@ -262,6 +484,21 @@ class TrackFeatureViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        tags=['Track Features'],
+        operation_summary="Feature cache statistics",
+        operation_description=(
+            "Hit/miss counters and size of the content-hash feature cache "
+            "(moderators and admins only)."
+        ),
+        responses={200: openapi.Response(description="Cache counters")}
+    )
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAuthenticated])
+    def cache_stats(self, request):
+        if request.user.role not in ['moderator', 'admin']:
+            raise PermissionDenied("Only moderators or admins can view cache statistics.")
+        return Response(cache_stats())
+
 
 # ----------------------------
 # Interaction Endpoints
@@ -274,11 +511,17 @@ class InteractionViewSet(viewsets.ModelViewSet):
     serializer_class = InteractionSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
+    pagination_class = SelectablePagination
+    cursor_ordering = ('-created_at', '-id')
 
     @swagger_auto_schema(
         tags=['Interactions'],
         operation_summary="List interactions",
-        operation_description="Returns all user interactions (likes, streams, comments).",
+        operation_description=(
+            "Returns all user interactions (likes, streams, comments). "
+            "`?pagination=cursor` (or following a `cursor` link) switches to keyset pages: "
+            "`next`/`previous` links and no `count`, at the same cost however deep the page."
+        ),
         responses={200: InteractionSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -295,22 +538,98 @@ class InteractionViewSet(viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
 
 
+class EventBatchView(APIView):
+    """
+    Record a batch of plays, likes, streams and comments in one request,
+    e.g. events a mobile client queued while offline.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        tags=['Interactions'],
+        operation_summary="Record a batch of events",
+        operation_description=(
+            "Each event is `{type, track, comment_text?}` where `type` is `play` (a listening "
+            "history entry) or an interaction type. Valid events are saved together; invalid "
+            "ones are reported per item and skipped. `results[i]` describes `events[i]`; `id` "
+            "is null on databases that don't return bulk-inserted keys. With buffered listening "
+            "history, plays are `queued` under an `event_id` and written shortly after."
+        ),
+        request_body=EventBatchSerializer,
+        responses={
+            201: openapi.Response(description="At least one event saved; per-item `results`"),
+            400: openapi.Response(description="Malformed batch, or no valid events"),
+        }
+    )
+    def post(self, request):
+        events = request.data.get('events') if isinstance(request.data, dict) else None
+        if not isinstance(events, list) or not events:
+            raise ValidationError({'events': "Must be a non-empty list."})
+        if len(events) > settings.EVENT_BATCH_MAX_SIZE:
+            raise ValidationError({'events': f"At most {settings.EVENT_BATCH_MAX_SIZE} events per batch."})
+
+        results = [None] * len(events)
+        valid = []
+        for index, item in enumerate(events):
+            serializer = EventSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': serializer.errors}
+
+        # One query for every track in the batch
+        known = set(
+            Track.objects.filter(id__in={event['track'] for _, event in valid}, approval_status='approved')
+            .values_list('id', flat=True)
+        )
+        accepted = []
+        for index, event in valid:
+            if event['track'] in known:
+                accepted.append((index, event))
+            else:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'track': ["Unknown track."]}}
+
+        rows, queued = save_events(request.user, [event for _, event in accepted]) if accepted else ([], False)
+        for (index, _), row in zip(accepted, rows):
+            if queued and isinstance(row, ListeningHistory):
+                results[index] = {'index': index, 'status': 'queued', 'event_id': row.event_id}
+            else:
+                results[index] = {'index': index, 'status': 'created', 'id': row.pk}
+        created = sum(result['status'] == 'created' for result in results)
+        return Response(
+            {
+                'created': created,
+                'queued': len(rows) - created,
+                'failed': len(events) - len(rows),
+                'results': results,
+            },
+            status=201 if rows else 400,
+        )
+
+
 # ----------------------------
 # Listening History Endpoints
 # ----------------------------
-class ListeningHistoryViewSet(viewsets.ModelViewSet):
+class ListeningHistoryViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     CRUD for ListeningHistory.
     """
-    queryset = ListeningHistory.objects.all()
+    queryset = ListeningHistory.objects.select_related('track')
     serializer_class = ListeningHistorySerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
+    pagination_class = SelectablePagination
+    cursor_ordering = ('-listened_at', '-id')
 
     @swagger_auto_schema(
         tags=['Listening History'],
         operation_summary="List listening history",
-        operation_description="Get the listening history for all users (admins) or self (user).",
+        operation_description=(
+            "Get the listening history for all users (admins) or self (user). "
+            "`?pagination=cursor` (or following a `cursor` link) switches to keyset pages: "
+            "`next`/`previous` links and no `count`, at the same cost however deep the page."
+        ),
+        manual_parameters=FIELDSET_PARAMETERS,
         responses={200: ListeningHistorySerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -319,18 +638,35 @@ class ListeningHistoryViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         tags=['Listening History'],
         operation_summary="Create listening history entry",
-        operation_description="Log a user’s listening event for a track.",
-        request_body=ListeningHistorySerializer,
-        responses={201: ListeningHistorySerializer}
+        operation_description=(
+            "Log a user’s listening event for a track. With buffered listening history "
+            "(`LISTENING_HISTORY_MODE=buffered`) the play is queued and the response is "
+            "202 with its `event_id`; it is written within a few seconds."
+        ),
+        request_body=PlaySerializer,
+        responses={201: ListeningHistorySerializer, 202: openapi.Response(description="Play queued")}
     )
     def create(self, request, *args, **kwargs):
-        return super().create(request, *args, **kwargs)
+        serializer = PlaySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        track_id = serializer.validated_data['track_id']
+        # Checked before buffering too: both modes accept the same tracks
+        if not Track.objects.filter(id=track_id, approval_status='approved').exists():
+            raise ValidationError({'track_id': "Unknown track."})
+
+        if play_buffer.enabled():
+            event = play_buffer.play_event(request.user.id, track_id)
+            if play_buffer.enqueue([event]):
+                return Response(event, status=202)
+
+        history = ListeningHistory.objects.create(user=request.user, track_id=track_id)
+        return Response(ListeningHistorySerializer(history).data, status=201)
 
 
 # ----------------------------
 # Track Statistics Endpoints
 # ----------------------------
-class TrackStatisticsViewSet(viewsets.ReadOnlyModelViewSet):
+class TrackStatisticsViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Read-only access for TrackStatistics.
     """
@@ -338,6 +674,8 @@ class TrackStatisticsViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TrackStatisticsSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
+    # Set by the counter flushes too
+    version_field = 'updated_at'
 
     @swagger_auto_schema(
         tags=['Track Statistics'],
@@ -357,6 +695,82 @@ class TrackStatisticsViewSet(viewsets.ReadOnlyModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
+    def _play_series(self, request, rollups):
+        period = request.query_params.get('period', 'day')
+        if period not in ROLLUP_PERIODS:
+            raise ValidationError({'period': f"Must be one of: {', '.join(ROLLUP_PERIODS)}."})
+        _, step = ROLLUP_PERIODS[period]
+
+        bounds = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name)
+            if value is None:
+                continue
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValidationError({name: "Must be an ISO 8601 datetime."})
+            bounds[name] = parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+        end = bounds.get('end', timezone.now())
+        # Default window: the last 48 hours or 30 days
+        start = bounds.get('start', end - step * (48 if period == 'hour' else 30))
+        if start >= end:
+            raise ValidationError({'start': "Must be before `end`."})
+        if (end - start) / step > settings.ROLLUP_MAX_POINTS:
+            raise ValidationError(f"At most {settings.ROLLUP_MAX_POINTS} {period} buckets per request.")
+
+        series = play_series(rollups, period, start, end)
+        return {
+            'period': period,
+            'results': [{'bucket': bucket, 'plays': plays} for bucket, plays in series],
+        }
+
+    @swagger_auto_schema(
+        tags=['Track Statistics'],
+        operation_summary="Track plays over time",
+        operation_description=(
+            "Plays of one track per hour or per day (UTC buckets, zero-filled), from the "
+            "play rollups. The newest few minutes are not rolled up yet."
+        ),
+        manual_parameters=[
+            openapi.Parameter('period', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[*ROLLUP_PERIODS]),
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        ],
+        responses={200: openapi.Response(description="`{bucket, plays}` points, oldest first")}
+    )
+    @action(detail=False, methods=['get'], url_path=r'tracks/(?P<track_id>\d+)/plays')
+    def track_plays(self, request, track_id=None):
+        track = Track.objects.filter(id=track_id).only('id', 'approval_status').first()
+        user = request.user
+        if track is None or (
+            track.approval_status != 'approved'
+            and not (user.is_authenticated and user.role in ['moderator', 'admin'])
+        ):
+            raise NotFound("Track not found.")
+        rollups = TrackPlayRollup.objects.filter(track_id=track.id)
+        return Response({'track': track.id, **self._play_series(request, rollups)})
+
+    @swagger_auto_schema(
+        tags=['Track Statistics'],
+        operation_summary="Artist plays over time",
+        operation_description=(
+            "Plays of all of an artist's tracks per hour or per day (UTC buckets, "
+            "zero-filled), from the play rollups."
+        ),
+        manual_parameters=[
+            openapi.Parameter('period', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[*ROLLUP_PERIODS]),
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        ],
+        responses={200: openapi.Response(description="`{bucket, plays}` points, oldest first")}
+    )
+    @action(detail=False, methods=['get'], url_path=r'artists/(?P<artist_id>\d+)/plays')
+    def artist_plays(self, request, artist_id=None):
+        if not Artist.objects.filter(id=artist_id).exists():
+            raise NotFound("Artist not found.")
+        rollups = ArtistPlayRollup.objects.filter(artist_id=artist_id)
+        return Response({'artist': int(artist_id), **self._play_series(request, rollups)})
+
 
 # ----------------------------
 # Custom APIViews
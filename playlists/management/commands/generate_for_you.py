@@ -0,0 +1,253 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from scipy import sparse
+
+from music.models import Interaction, ListeningHistory
+from music.similarity import approved_vectors, similar_to_vector
+from music.utils.similarity import standardisation
+from backend.response_cache import invalidate
+from playlists.models import Playlist, PlaylistTrack
+from playlists.signals import public_playlist_ids
+
+# Weight of one event in a listener's taste profile, before recency decay.
+# 'listen' is a ListeningHistory row; the others are Interaction types.
+EVENT_WEIGHTS = {
+    'like':    5.0,
+    'comment': 3.0,
+    'stream':  1.0,
+    'listen':  1.0,
+}
+
+
+def load_catalogue():
+    """
+    Approved tracks' feature vectors as stored, and standardised and scaled
+    to unit length, so a dot product with a unit taste vector is a cosine
+    score. Returns ``(ids, matrix, vectors)`` sorted by id.
+    """
+    ids, matrix = approved_vectors()
+    order = np.argsort(ids, kind='stable')
+    ids, matrix = ids[order], matrix[order]
+    mean, std = standardisation(matrix)
+    vectors = (matrix - mean) / std
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return ids, matrix, (vectors / norms).astype(np.float32)
+
+
+def event_weights(user_ids, since, now, half_life_days):
+    """
+    ``(user_ids, track_ids, weights)`` arrays for every listen and
+    interaction of ``user_ids`` since ``since``, each weighted by its type
+    and halved every ``half_life_days``.
+    """
+    listens = ListeningHistory.objects.filter(
+        user_id__in=user_ids, listened_at__gte=since,
+    ).values_list('user_id', 'track_id', 'listened_at')
+    interactions = Interaction.objects.filter(
+        user_id__in=user_ids, created_at__gte=since,
+    ).values_list('user_id', 'track_id', 'created_at', 'interaction_type')
+
+    events = [(user_id, track_id, at, 'listen') for user_id, track_id, at in listens]
+    events.extend(interactions)
+    if not events:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    users, tracks, times, kinds = zip(*events)
+    ages = np.array([(now - at).total_seconds() for at in times]) / 86400.0
+    weights = np.array([EVENT_WEIGHTS.get(kind, 0.0) for kind in kinds]) * 0.5 ** (ages / half_life_days)
+    return np.array(users, dtype=np.int64), np.array(tracks, dtype=np.int64), weights
+
+
+def top_tracks(taste, vectors, heard, size, max_block_bytes):
+    """
+    Row indices of the ``size`` best-scoring tracks for each taste vector,
+    best first. Scores are computed with one matrix product per block of
+    users, sized so a block's score matrix stays under ``max_block_bytes``;
+    tracks in ``heard`` (a sparse users x tracks matrix) are skipped.
+    """
+    n = len(vectors)
+    size = min(size, n)
+    block = max(1, max_block_bytes // (4 * max(n, 1)))
+    results = []
+    for start in range(0, len(taste), block):
+        scores = taste[start:start + block] @ vectors.T
+        rows, cols = heard[start:start + block].nonzero()
+        scores[rows, cols] = -np.inf
+        top = np.argpartition(-scores, size - 1, axis=1)[:, :size]
+        ranked = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-ranked, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        ranked = np.take_along_axis(ranked, order, axis=1)
+        results.extend(row[np.isfinite(score)] for row, score in zip(top, ranked))
+    return results
+
+
+def indexed_top_tracks(profiles, ids, heard, size, probes):
+    """
+    Ids of the ``size`` tracks closest to each raw feature ``profile``, best
+    first, from the similarity index: the published ANN build searched with
+    ``probes`` (more find closer tracks, slower), or exact search without
+    one. Tracks in ``heard`` (a sparse users x tracks matrix over ``ids``)
+    are skipped.
+    """
+    results = []
+    for row, profile in enumerate(profiles):
+        found, _ = similar_to_vector(profile, k=size, probes=probes, exclude=ids[heard[row].indices])
+        results.append(found)
+    return results
+
+
+def write_playlists(playlist_tracks):
+    """
+    Replace the contents of each listed user's ``for_you`` playlist.
+    ``playlist_tracks`` maps user ids to track ids, best first.
+    """
+    user_ids = list(playlist_tracks)
+    if not user_ids:
+        return
+    with transaction.atomic():
+        Playlist.objects.bulk_create(
+            [Playlist(name='for_you', user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        playlists = dict(
+            Playlist.objects.filter(name='for_you', user_id__in=user_ids).values_list('user_id', 'id')
+        )
+        # One DELETE: .delete() would fetch every row to send its post_delete
+        # signal, which only matters for public playlists, handled here.
+        # PlaylistTrack receivers don't see these rows; see playlists/signals.py
+        ids = list(playlists.values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(PlaylistTrack._meta.db_table)} "
+                f"WHERE playlist_id IN ({', '.join(['%s'] * len(ids))})",
+                ids,
+            )
+        if public_playlist_ids() & set(ids):
+            invalidate('playlists')
+        PlaylistTrack.objects.bulk_create(
+            [
+                PlaylistTrack(playlist_id=playlists[user_id], track_id=track_id, position=position)
+                for user_id, track_ids in playlist_tracks.items()
+                for position, track_id in enumerate(track_ids)
+            ],
+            batch_size=5000,
+        )
+        # auto_now_add stamps each row separately; give the whole playlist
+        # one added_at so the default ordering falls through to position.
+        PlaylistTrack.objects.filter(playlist_id__in=playlists.values()).update(added_at=timezone.now())
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill every active user's 'For You' playlist from a taste vector built "
+        "from their listening history and interactions, scored against the "
+        "feature vectors of all approved tracks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=30, help="Tracks per playlist")
+        parser.add_argument('--days', type=int, default=180, help="History window in days")
+        parser.add_argument('--half-life', type=float, default=30.0,
+                            help="Days after which an event counts half as much")
+        parser.add_argument('--user-chunk', type=int, default=1000,
+                            help="Users whose history is loaded and written per chunk")
+        parser.add_argument('--max-block-mb', type=int, default=256,
+                            help="Upper bound on one block's score matrix")
+        parser.add_argument('--probes', type=int, default=None,
+                            help="Search each listener's average track through the similarity index "
+                                 "with this many probes, instead of scoring every track exactly")
+        parser.add_argument('--include-heard', action='store_true',
+                            help="Allow tracks the user already listened to or interacted with")
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many users")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        timings = dict.fromkeys(['catalogue', 'history', 'score', 'write'], 0.0)
+
+        ids, matrix, vectors = load_catalogue()
+        timings['catalogue'] = time.perf_counter() - started
+        if not len(ids):
+            self.stdout.write(self.style.WARNING("No approved tracks with feature vectors."))
+            return
+
+        now = timezone.now()
+        since = now - timedelta(days=options['days'])
+        users = get_user_model().objects.filter(is_active=True).order_by('id')
+        max_block_bytes = options['max_block_mb'] * 1024 * 1024
+        processed = written = without_history = 0
+        last_id = 0
+
+        while options['limit'] is None or processed < options['limit']:
+            chunk_size = options['user_chunk']
+            if options['limit'] is not None:
+                chunk_size = min(chunk_size, options['limit'] - processed)
+            user_ids = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            processed += len(user_ids)
+
+            stage = time.perf_counter()
+            event_users, event_tracks, weights = event_weights(user_ids, since, now, options['half_life'])
+            # Events on tracks outside the catalogue (unapproved, no vector) are dropped
+            rows = np.minimum(np.searchsorted(ids, event_tracks), len(ids) - 1)
+            known = ids[rows] == event_tracks
+            active, user_rows = np.unique(event_users[known], return_inverse=True)
+            weights_matrix = sparse.csr_matrix(
+                (weights[known], (user_rows, rows[known])),
+                shape=(len(active), len(ids)),
+            )
+            if options['probes'] is None:
+                taste = np.asarray(weights_matrix @ vectors)
+                norms = np.linalg.norm(taste, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                taste = (taste / norms).astype(np.float32)
+            else:
+                # The index standardises queries itself: weighted mean of the stored vectors
+                totals = np.asarray(weights_matrix.sum(axis=1))
+                totals[totals == 0] = 1.0
+                taste = (np.asarray(weights_matrix @ matrix) / totals).astype(np.float32)
+            timings['history'] += time.perf_counter() - stage
+            without_history += len(user_ids) - len(active)
+            if not len(active):
+                continue
+
+            stage = time.perf_counter()
+            heard = sparse.csr_matrix(weights_matrix.shape) if options['include_heard'] else weights_matrix
+            if options['probes'] is None:
+                best = [
+                    ids[track_rows]
+                    for track_rows in top_tracks(taste, vectors, heard, options['size'], max_block_bytes)
+                ]
+            else:
+                best = indexed_top_tracks(taste, ids, heard, options['size'], options['probes'])
+            timings['score'] += time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            write_playlists({
+                int(user_id): track_ids.tolist()
+                for user_id, track_ids in zip(active, best)
+            })
+            timings['write'] += time.perf_counter() - stage
+            written += len(active)
+            self.stdout.write(f"Processed {processed} users (last id {last_id}).")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {written} playlists written, {without_history} users without history, "
+            f"{len(ids)} candidate tracks."
+        ))
+        self.stdout.write(
+            f"Throughput: {processed / elapsed if elapsed else 0.0:.1f} users/sec "
+            f"({processed} users in {elapsed:.1f}s)"
+        )
+        for stage, seconds in timings.items():
+            self.stdout.write(f"  {stage:<10} {seconds:8.2f}s")
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0004_alter_playlist_options_alter_playlisttrack_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='playlisttrack',
+            options={'ordering': ['-added_at', 'position']},
+        ),
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -10,6 +10,8 @@ class Playlist(models.Model):
         ('for_you',     'For You'),
         ('liked_songs', 'Liked Songs'),
     ]
+    # Shared playlists everyone can read
+    PUBLIC_NAMES = ['most_liked', 'admin_picks']
     
     name       = models.CharField(
         max_length=20,
@@ -54,10 +56,12 @@ class PlaylistTrack(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    # Rank within generated playlists, whose tracks share one added_at
+    position = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
         unique_together = ('playlist', 'track')
-        ordering = ['-added_at']
+        ordering = ['-added_at', 'position']
 
     def __str__(self):
         return f"{self.playlist} → {self.track}"
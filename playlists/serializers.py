@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from music.serializers import TrackSerializer
+from music.serializers import TrackCompactSerializer
 from .models import Playlist, PlaylistTrack, Recommendation
 
 
@@ -16,19 +16,21 @@ class PlaylistSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
 
     def get_track_count(self, obj):
-        return obj.playlist_tracks.count()
+        # Annotated by PlaylistViewSet; counted for playlists built elsewhere
+        count = getattr(obj, 'track_count', None)
+        return obj.playlist_tracks.count() if count is None else count
 
 
 # ----------------------------
 # PlaylistTrack Serializer
 # ----------------------------
 class PlaylistTrackSerializer(serializers.ModelSerializer):
-    track = TrackSerializer(read_only=True)
+    track = TrackCompactSerializer(read_only=True)
 
     class Meta:
         model = PlaylistTrack
-        fields = ['id', 'playlist', 'track', 'added_at']
-        read_only_fields = ['added_at']
+        fields = ['id', 'playlist', 'track', 'added_at', 'position']
+        read_only_fields = ['added_at', 'position']
 
     def validate(self, data):
         request = self.context.get('request')
@@ -50,7 +52,7 @@ class PlaylistTrackSerializer(serializers.ModelSerializer):
 # Recommendation Serializer
 # ----------------------------
 class RecommendationSerializer(serializers.ModelSerializer):
-    track = TrackSerializer(read_only=True)
+    track = TrackCompactSerializer(read_only=True)
 
     class Meta:
         model = Recommendation
@@ -0,0 +1,56 @@
+# playlists/signals.py
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend.response_cache import invalidate
+from music.models import Track
+from playlists.models import Playlist, PlaylistTrack, Recommendation
+
+PUBLIC_IDS_KEY = 'response_cache:public_playlist_ids'
+
+
+def public_playlist_ids():
+    """
+    Ids of the public playlists, cached: every PlaylistTrack change checks
+    them, including the bulk rewrites of 'for_you' playlists.
+    """
+    ids = cache.get(PUBLIC_IDS_KEY)
+    if ids is None:
+        ids = set(Playlist.objects.filter(name__in=Playlist.PUBLIC_NAMES).values_list('id', flat=True))
+        cache.set(PUBLIC_IDS_KEY, ids, timeout=settings.RESPONSE_CACHE_SECONDS)
+    return ids
+
+
+@receiver(post_save, sender=Playlist)
+@receiver(post_delete, sender=Playlist)
+def invalidate_playlist_responses(sender, instance, **kwargs):
+    if instance.name in Playlist.PUBLIC_NAMES or instance.id in public_playlist_ids():
+        transaction.on_commit(lambda: cache.delete(PUBLIC_IDS_KEY))
+        invalidate('playlists')
+
+
+@receiver(post_save, sender=PlaylistTrack)
+@receiver(post_delete, sender=PlaylistTrack)
+def invalidate_playlist_track_responses(sender, instance, **kwargs):
+    # Public playlists show their track count; others aren't cached.
+    # Being connected at all makes PlaylistTrack deletes row by row, so
+    # bulk rewrites (generate_for_you) delete raw and invalidate themselves.
+    if instance.playlist_id in public_playlist_ids():
+        invalidate('playlists')
+
+
+@receiver(post_save, sender=Recommendation)
+@receiver(post_delete, sender=Recommendation)
+def invalidate_recommendation_responses(sender, instance, **kwargs):
+    invalidate('recommendations')
+
+
+@receiver(post_save, sender=Track)
+def invalidate_recommended_track(sender, instance, created, **kwargs):
+    # Recommendations embed their track; deleting a track deletes them
+    if not created and Recommendation.objects.filter(track_id=instance.id).exists():
+        invalidate('recommendations')
@@ -1,3 +1,154 @@
-from django.test import TestCase
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from backend.testing import QueryBudgetTestCase
+from music import similarity
+from music.models import Interaction, TrackFeature
+from music.tests import make_tracks, make_user
+from music.utils.feature_vectors import VECTOR_DTYPE, VECTOR_SIZE
+from playlists.management.commands.generate_for_you import write_playlists
+from playlists.models import Playlist, PlaylistTrack, Recommendation
+
+
+# ----------------------------
+# Query budgets: one query per page, not per row
+# ----------------------------
+class PlaylistQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_playlists(self):
+        def add(n):
+            for _ in range(n):
+                playlist = Playlist.objects.create(name='most_liked', user=make_user())
+                PlaylistTrack.objects.bulk_create(
+                    [PlaylistTrack(playlist=playlist, track=track) for track in make_tracks(3)]
+                )
+        # Page count and page, plus the version query for the ETag
+        self.assertQueryBudget('/api/v1/playlists/', 3, add)
+
+    def test_playlists_track_count(self):
+        playlist = Playlist.objects.create(name='admin_picks')
+        PlaylistTrack.objects.bulk_create(
+            [PlaylistTrack(playlist=playlist, track=track) for track in make_tracks(4)]
+        )
+        Playlist.objects.create(name='most_liked')
+        response, _ = self.count_queries('/api/v1/playlists/')
+        counts = {row['name']: row['track_count'] for row in response.data['results']}
+        self.assertEqual(counts, {'admin_picks': 4, 'most_liked': 0})
+
+    def test_playlist_tracks(self):
+        user = make_user()
+        playlist = Playlist.objects.create(name='liked_songs', user=user)
+        self.client.force_authenticate(user)
+        self.assertQueryBudget(
+            '/api/v1/playlist-tracks/', 2,
+            lambda n: PlaylistTrack.objects.bulk_create(
+                [PlaylistTrack(playlist=playlist, track=track) for track in make_tracks(n)]
+            ),
+        )
+
+    def test_recommendations(self):
+        self.assertQueryBudget(
+            '/api/v1/recommendations/', 2,
+            lambda n: Recommendation.objects.bulk_create([Recommendation(track=track) for track in make_tracks(n)]),
+        )
+
+    def test_recommendations_sparse(self):
+        self.assertQueryBudget(
+            '/api/v1/recommendations/?fields=track', 2,
+            lambda n: Recommendation.objects.bulk_create([Recommendation(track=track) for track in make_tracks(n)]),
+        )
+
+
+# ----------------------------
+# Conditional GETs
+# ----------------------------
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class PlaylistConditionalGetTests(APITestCase):
+
+    def test_detail_changes_when_a_track_is_removed(self):
+        playlist = Playlist.objects.create(name='admin_picks')
+        PlaylistTrack.objects.bulk_create(
+            [PlaylistTrack(playlist=playlist, track=track) for track in make_tracks(2)]
+        )
+        url = f'/api/v1/playlists/{playlist.id}/'
+        response = self.client.get(url)
+        # Removing a track moves no stored time forward: ETag only
+        self.assertNotIn('Last-Modified', response)
+        PlaylistTrack.objects.filter(playlist=playlist).order_by('id').first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+# ----------------------------
+# For You playlists
+# ----------------------------
+class GenerateForYouTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.tracks = make_tracks(12)
+        for track in self.tracks:
+            TrackFeature.objects.create(
+                track=track, danceability=0.5, energy=0.5, valence=0.5, tempo=120, speechiness=0.1,
+                instrumentalness=0.1, acousticness=0.1, liveness=0.1, mood='happy',
+                vector=rng.normal(size=VECTOR_SIZE).astype(VECTOR_DTYPE).tobytes(),
+            )
+        self.listener = make_user()
+        self.liked = [track.id for track in self.tracks[:3]]
+        Interaction.objects.bulk_create([
+            Interaction(user=self.listener, track_id=track_id, interaction_type='like') for track_id in self.liked
+        ])
+        # Start from a fresh searcher of this test's tracks
+        similarity._state['searcher'] = None
+        self.addCleanup(similarity._state.update, searcher=None)
+
+    def generate(self, *args):
+        call_command('generate_for_you', '--size', '5', *args, stdout=StringIO())
+        playlist = Playlist.objects.get(name='for_you', user=self.listener)
+        return list(playlist.playlist_tracks.order_by('position').values_list('track_id', flat=True))
+
+    def check(self, track_ids):
+        self.assertEqual(len(track_ids), 5)
+        self.assertFalse(set(track_ids) & set(self.liked))
+
+    def test_exact_scoring(self):
+        self.check(self.generate())
+
+    def test_index_scoring(self):
+        with tempfile.TemporaryDirectory() as path, self.settings(SIMILARITY_INDEX_DIR=path):
+            # Exact search without a build, then the published ANN build
+            exact = self.generate('--probes', '2')
+            self.check(exact)
+            # Few, large buckets: a dozen tracks would be spread thin by default
+            call_command('build_similarity_index', '--output', path, '--bits', '2', stdout=StringIO())
+            similarity._state['searcher'] = None
+            self.check(self.generate('--probes', '2'))
+
+    def test_regeneration_deletes_in_one_statement(self):
+        self.generate()
+        playlist = Playlist.objects.get(name='for_you', user=self.listener)
+        with CaptureQueriesContext(connection) as queries:
+            write_playlists({self.listener.id: [track.id for track in self.tracks[3:]]})
+        statements = [query['sql'] for query in queries if 'playlists_playlisttrack' in query['sql']]
+        # Delete, insert, stamp added_at
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(playlist.playlist_tracks.count(), 9)
+
+    def test_rewrite_invalidates_only_public_playlists(self):
+        command = 'playlists.management.commands.generate_for_you'
+        with mock.patch(f'{command}.invalidate') as invalidate:
+            write_playlists({self.listener.id: [self.tracks[5].id]})
+        invalidate.assert_not_called()
+
+        playlist = Playlist.objects.get(name='for_you', user=self.listener)
+        with mock.patch(f'{command}.public_playlist_ids', return_value={playlist.id}), \
+                mock.patch(f'{command}.invalidate') as invalidate:
+            write_playlists({self.listener.id: [self.tracks[5].id]})
+        invalidate.assert_called_once_with('playlists')
@@ -1,7 +1,11 @@
 from rest_framework import viewsets, permissions
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Count, Max, Q
+
+from backend.conditional import ConditionalGetMixin
+from backend.fieldsets import SparseFieldsetMixin
+from backend.response_cache import CachedResponseMixin
 
 from playlists.models import Playlist, PlaylistTrack, Recommendation
 from playlists.serializers import (
@@ -18,25 +22,51 @@ class IsPlaylistOwner(permissions.BasePermission):
         return obj.playlist.user == request.user
 
 
-class PlaylistViewSet(viewsets.ModelViewSet):
+class PlaylistViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Playlist.objects.all()
     serializer_class = PlaylistSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
+    cache_endpoint = 'playlists'
+
+    def _versions(self, queryset):
+        # What the serializer shows, with the track count and latest
+        # addition in place of the tracks: one grouped query
+        return list(
+            queryset.order_by('id')
+            .annotate(tracks=Count('playlist_tracks'), added=Max('playlist_tracks__added_at'))
+            .values_list('id', 'name', 'user_id', 'created_at', 'tracks', 'added')
+        )
+
+    def list_version(self, queryset):
+        return self._versions(queryset)
+
+    def object_version(self, queryset):
+        # No Last-Modified: removing a track changes the playlist without
+        # moving any stored time forward
+        rows = self._versions(queryset)
+        return (rows, None) if rows else None
+
+    def cache_role(self, request):
+        # Signed-in users also see their own playlists
+        return None if request.user.is_authenticated else 'anonymous'
 
     def get_queryset(self):
         user = self.request.user
-        public_playlists = Q(name__in=['most_liked', 'admin_picks'])
+        public_playlists = Q(name__in=Playlist.PUBLIC_NAMES)
 
         if not user.is_authenticated:
-            return Playlist.objects.filter(public_playlists)
-        return Playlist.objects.filter(public_playlists | Q(user=user))
+            playlists = Playlist.objects.filter(public_playlists)
+        else:
+            playlists = Playlist.objects.filter(public_playlists | Q(user=user))
+        # Read by PlaylistSerializer.get_track_count
+        return playlists.annotate(track_count=Count('playlist_tracks'))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class PlaylistTrackViewSet(viewsets.ModelViewSet):
+class PlaylistTrackViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = PlaylistTrack.objects.all()
     serializer_class = PlaylistTrackSerializer
     permission_classes = [permissions.IsAuthenticated, IsPlaylistOwner]
@@ -44,7 +74,7 @@ class PlaylistTrackViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Only allow the user to see tracks in their own playlists
-        return PlaylistTrack.objects.filter(playlist__user=self.request.user)
+        return PlaylistTrack.objects.filter(playlist__user=self.request.user).select_related('track')
 
     def perform_create(self, serializer):
         playlist = serializer.validated_data['playlist']
@@ -59,16 +89,21 @@ class PlaylistTrackViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class RecommendationViewSet(viewsets.ModelViewSet):
+class RecommendationViewSet(CachedResponseMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     Global, admin‐curated recommendations visible to all users.
     List/read is open to anyone; create/update/delete restricted to admins/moderators.
     """
-    queryset = Recommendation.objects.all()
+    queryset = Recommendation.objects.select_related('track')
     serializer_class = RecommendationSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['track__title']
+    cache_endpoint = 'recommendations'
+
+    def cache_role(self, request):
+        # The same for everyone
+        return 'public'
 
     def perform_create(self, serializer):
         if self.request.user.role not in ['admin', 'moderator']:
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+benchmark_feature_extraction.py
+
+Compare the per-feature librosa calls the extractor used to make with the
+single-STFT engine in music.utils.feature_extraction.
+
+For every input it reports wall time (best of --repeat runs), peak traced
+memory and the largest difference between the two sets of TrackFeature
+values. Without file arguments it benchmarks synthetic signals.
+
+Usage:
+    python scripts/benchmark_feature_extraction.py [--repeat 3] [file ...]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music.utils.feature_extraction import compute_summary, features_from_summary  # noqa: E402
+
+
+def legacy_features(y, sr):
+    """The pre-engine extractor: one librosa call (and FFT pass) per feature."""
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    tempo = float(np.atleast_1d(tempo)[0])
+    energy = np.mean(librosa.feature.rms(y=y))
+    zcr = np.mean(librosa.feature.zero_crossing_rate(y))
+    spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+    spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr))
+    chroma_stft = np.mean(librosa.feature.chroma_stft(y=y, sr=sr))
+    np.mean(librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13))
+    bandwidth = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
+
+    return {
+        "tempo": tempo,
+        "energy": float(energy),
+        "danceability": min(1.0, tempo / 250.0),
+        "valence": float(spectral_centroid / sr),
+        "speechiness": float(zcr),
+        "instrumentalness": float(max(0.0, 1.0 - chroma_stft)),
+        "acousticness": float(max(0.0, 1.0 - spectral_rolloff / sr)),
+        "liveness": float(bandwidth / sr),
+    }
+
+
+def engine_features(y, sr):
+    return features_from_summary(compute_summary(y, sr), sr)
+
+
+def measure(fn, y, sr, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(y, sr)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(y, sr)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def synthetic_signal(seconds, sr=22050, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    clicks = (np.sin(2 * np.pi * 2 * t) > 0.99).astype(np.float32)
+    tone = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.1 * np.sin(2 * np.pi * 660 * t)
+    return (tone + 0.5 * clicks + 0.02 * rng.standard_normal(t.size)).astype(np.float32), sr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-STFT feature extraction.")
+    parser.add_argument('files', nargs='*', help="Audio files to analyse (default: synthetic signals)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per input")
+    args = parser.parse_args()
+
+    if args.files:
+        inputs = [(path, *librosa.load(path, sr=None)) for path in args.files]
+    else:
+        inputs = [(f"synthetic {s}s", *synthetic_signal(s)) for s in (30, 180)]
+
+    # Warm up numba so the first input doesn't pay JIT compilation
+    engine_features(*synthetic_signal(1))
+    legacy_features(*synthetic_signal(1))
+
+    header = f"{'input':<28}{'legacy s':>10}{'engine s':>10}{'speedup':>9}{'legacy MB':>11}{'engine MB':>11}{'max diff':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, y, sr in inputs:
+        old, old_time, old_peak = measure(legacy_features, y, sr, args.repeat)
+        new, new_time, new_peak = measure(engine_features, y, sr, args.repeat)
+        max_diff = max(abs(old[key] - new[key]) for key in old)
+        print(
+            f"{name[-28:]:<28}{old_time:>10.3f}{new_time:>10.3f}{old_time / new_time:>8.2f}x"
+            f"{old_peak / 2**20:>11.1f}{new_peak / 2**20:>11.1f}{max_diff:>10.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+benchmark_pagination.py
+
+Page latency of GET /api/v1/listening-history/ at page 1 and at a deep page
+(page 10,000 by default) with page-number pagination (COUNT(*) plus
+OFFSET) and with keyset cursor pagination (?pagination=cursor).
+
+The deep cursor is the one a client would hold after following ``next``
+links that far; it is built directly from the row just before that page
+rather than by walking every page. Cursor pages are checked against the
+same rows fetched by OFFSET in (listened_at, id) order.
+
+Everything runs in a throwaway test database (``test_<NAME>``) created from
+the configured settings, so a MySQL account needs CREATE DATABASE rights.
+
+Usage:
+    python scripts/benchmark_pagination.py
+    python scripts/benchmark_pagination.py --page 50000 --requests 50
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page-number vs keyset cursor pagination.")
+    parser.add_argument('--page', type=int, default=10_000, help="Deep page to measure")
+    parser.add_argument('--requests', type=int, default=20, help="Requests per measurement")
+    parser.add_argument('--tracks', type=int, default=1000, help="Tracks in the catalogue")
+    parser.add_argument('--users', type=int, default=1000, help="Listeners")
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from django.utils import timezone
+    from rest_framework.pagination import Cursor
+    from rest_framework.settings import api_settings
+    from rest_framework.test import APIClient
+
+    from backend.pagination import KeysetCursorPagination
+    from music.models import ListeningHistory, Track
+    from music.serializers import ListeningHistorySerializer
+    from music.views import ListeningHistoryViewSet
+    from users.models import Artist, User
+
+    setup_test_environment()
+    database = connection.creation.create_test_db(verbosity=0)
+    try:
+        rng = np.random.default_rng(0)
+        page_size = api_settings.PAGE_SIZE
+        rows = (args.page + 1) * page_size
+        owner = User.objects.create(username='bench-artist', email='bench-artist@example.com', role='artist')
+        artist = Artist.objects.create(user=owner, display_name='bench')
+        Track.objects.bulk_create(
+            [Track(artist=artist, title=f't{i}', audio_url='http://example.com/a.mp3', approval_status='approved')
+             for i in range(args.tracks)],
+            batch_size=5000,
+        )
+        track_ids = np.array(Track.objects.values_list('id', flat=True))
+        User.objects.bulk_create(
+            [User(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(args.users)],
+            batch_size=5000,
+        )
+        user_ids = np.array(User.objects.filter(role='listener').values_list('id', flat=True))
+
+        # Second resolution, so neighbouring rows share a listened_at and
+        # the id tiebreaker matters
+        now = timezone.now().replace(microsecond=0)
+        offsets = np.sort(rng.integers(0, 30 * 86400, size=rows))
+        ListeningHistory.objects.bulk_create(
+            [
+                ListeningHistory(user_id=int(user), track_id=int(track), listened_at=now - timedelta(seconds=int(s)))
+                for user, track, s in zip(rng.choice(user_ids, size=rows), rng.choice(track_ids, size=rows), offsets)
+            ],
+            batch_size=5000,
+        )
+        print(f"{rows} listening history rows, {page_size} per page")
+
+        admin = User.objects.create(username='bench-admin', email='bench-admin@example.com', role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = '/api/v1/listening-history/'
+
+        # The cursor for the deep page: the position of the last row before it
+        ordering = ListeningHistoryViewSet.cursor_ordering
+        paginator = KeysetCursorPagination()
+        paginator.base_url = f'http://testserver{url}'
+        before = ListeningHistory.objects.order_by(*ordering)[(args.page - 1) * page_size - 1]
+        deep_cursor = paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=paginator._get_position_from_instance(before, ordering))
+        )
+
+        cases = [
+            ('page', 1, f'{url}?page=1'),
+            ('page', args.page, f'{url}?page={args.page}'),
+            ('cursor', 1, f'{url}?pagination=cursor'),
+            ('cursor', args.page, deep_cursor),
+        ]
+        pages = {}
+        for mode, number, target in cases:
+            latencies = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = client.get(target)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+            pages[mode, number] = response.data['results']
+            p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+            print(f"{mode:<7} page {number:>7}  p50 {p50:8.2f} ms  p95 {p95:8.2f} ms")
+
+        for number in (1, args.page):
+            start = (number - 1) * page_size
+            expected = ListeningHistorySerializer(
+                ListeningHistory.objects.order_by(*ordering)[start:start + page_size], many=True,
+            ).data
+            same = pages['cursor', number] == expected
+            print(f"cursor page {number}: {'matches' if same else 'DIFFERS FROM'} rows {start + 1}-{start + page_size}")
+    finally:
+        connection.creation.destroy_test_db(database, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
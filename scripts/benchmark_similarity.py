@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+benchmark_similarity.py
+
+Latency of the similar-tracks indexes on synthetic catalogues of packed
+feature vectors: the exact in-memory index (music.utils.similarity) and the
+memory-mapped LSH index (music.utils.ann).
+
+For every catalogue size it reports the build time, the memory held by the
+exact index, query latency percentiles per metric, and the time to apply a
+batch of incremental changes. For the LSH index it reports recall@k against
+exact search and latency for each --probes setting. No database is needed.
+
+The synthetic vectors are drawn around --clusters centres, since uniform
+noise has no neighbourhoods for an approximate index to find.
+
+Usage:
+    python scripts/benchmark_similarity.py
+    python scripts/benchmark_similarity.py --sizes 100000 1000000 --queries 500 --k 20
+    python scripts/benchmark_similarity.py --probes 0 2 4 8 16
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music.utils import ann  # noqa: E402
+from music.utils.feature_vectors import VECTOR_SIZE  # noqa: E402
+from music.utils.similarity import METRICS, VectorIndex  # noqa: E402
+
+
+def index_bytes(index):
+    return sum(array.nbytes for array in (index.vectors, index.norms, index.ids, index.active,
+                                          index._sorted_ids, index._sorted_rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the similar-tracks index.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000],
+                        help="Catalogue sizes to benchmark")
+    parser.add_argument('--queries', type=int, default=200, help="Queries per metric")
+    parser.add_argument('--k', type=int, default=10, help="Results per query")
+    parser.add_argument('--changes', type=int, default=1000,
+                        help="Rows updated/added/removed in the incremental refresh test")
+    parser.add_argument('--probes', type=int, nargs='+', default=[0, 2, 4, 8],
+                        help="LSH probe settings to compare")
+    parser.add_argument('--tables', type=int, default=8, help="LSH hash tables")
+    parser.add_argument('--clusters', type=int, default=1000, help="Cluster centres of the synthetic data")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        ids = np.arange(1, size + 1, dtype=np.int64)
+        centres = 2.0 * rng.normal(size=(args.clusters, VECTOR_SIZE))
+        matrix = (centres[rng.integers(0, args.clusters, size)]
+                  + rng.normal(size=(size, VECTOR_SIZE))).astype(np.float32)
+
+        start = time.perf_counter()
+        index = VectorIndex(ids, matrix)
+        build = time.perf_counter() - start
+        print(f"{size:>9} tracks  build {build:.2f}s  index {index_bytes(index) / 2 ** 20:.0f} MiB")
+
+        targets = rng.choice(ids, size=args.queries)
+        for metric in METRICS:
+            latencies = []
+            for track_id in targets:
+                start = time.perf_counter()
+                index.nearest(int(track_id), k=args.k, metric=metric)
+                latencies.append(time.perf_counter() - start)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+            print(f"{'':>9}  {metric:<10} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  p99 {p99:7.2f} ms")
+
+        exact = {int(track_id): index.nearest(int(track_id), k=args.k)[0] for track_id in targets}
+        with tempfile.TemporaryDirectory() as path:
+            start = time.perf_counter()
+            lsh = ann.LSHIndex(ann.build(path, ids, matrix, tables=args.tables))
+            print(f"{'':>9}  LSH build {time.perf_counter() - start:.2f}s "
+                  f"({args.tables} tables x {lsh.meta['bits']} bits)")
+            for probes in args.probes:
+                latencies = []
+                recall = []
+                for track_id in targets:
+                    start = time.perf_counter()
+                    found, _ = lsh.search(lsh.vector(track_id), k=args.k, probes=probes, exclude=[track_id])
+                    latencies.append(time.perf_counter() - start)
+                    recall.append(len(np.intersect1d(found, exact[int(track_id)])) / args.k)
+                p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+                print(f"{'':>9}  probes {probes:<3} recall@{args.k} {np.mean(recall):6.1%}  "
+                      f"p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+            del lsh
+
+        # A refresh: some rows re-extracted, some new tracks, some unapproved
+        third = args.changes // 3
+        updated = rng.choice(ids, size=third, replace=False)
+        added = np.arange(size + 1, size + 1 + third, dtype=np.int64)
+        start = time.perf_counter()
+        index.upsert(np.concatenate([updated, added]),
+                     rng.normal(size=(2 * third, VECTOR_SIZE)).astype(np.float32))
+        index.remove(rng.choice(ids, size=third, replace=False))
+        refresh = time.perf_counter() - start
+        print(f"{'':>9}  refresh of {args.changes} changes {refresh * 1000:.1f} ms\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+benchmark_track_payloads.py
+
+Size and cost of a 100-track page in the track representations:
+'full' (TrackSerializer over every column, the list format before compact
+tracks), 'compact' (TrackCompactSerializer over .only() its columns, the
+list default) and a sparse fieldset (?fields=id,title,artist,audio_url).
+The same comparison is made for 100 listening history entries, whose
+nested track used to be the full one.
+
+Each variant is timed end to end: the query, serialization and JSON
+rendering. Tracks carry lyrics of --lyrics-chars characters, and a
+rejection reason on every fifth track.
+
+Everything runs in a throwaway test database (``test_<NAME>``) created from
+the configured settings, so a MySQL account needs CREATE DATABASE rights.
+
+Usage:
+    python scripts/benchmark_track_payloads.py
+    python scripts/benchmark_track_payloads.py --lyrics-chars 4000 --repeat 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def measure(build, repeat):
+    """
+    Rendered size and p50 time in ms of ``build()``, which returns bytes.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = build()
+        timings.append(time.perf_counter() - start)
+    return len(body), float(np.percentile(np.array(timings) * 1000, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs compact vs sparse track payloads.")
+    parser.add_argument('--items', type=int, default=100, help="Items per page")
+    parser.add_argument('--lyrics-chars', type=int, default=2000, help="Length of each track's lyrics")
+    parser.add_argument('--repeat', type=int, default=100, help="Timed runs per variant")
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from rest_framework import serializers
+    from rest_framework.renderers import JSONRenderer
+
+    from music.models import ListeningHistory, Track
+    from music.serializers import ListeningHistorySerializer, TrackCompactSerializer, TrackSerializer
+    from users.models import Artist, User
+
+    class FullHistorySerializer(serializers.ModelSerializer):
+        # ListeningHistorySerializer as it was, nesting the full track
+        track = TrackSerializer(read_only=True)
+
+        class Meta:
+            model = ListeningHistory
+            fields = ['track', 'listened_at']
+
+    setup_test_environment()
+    database = connection.creation.create_test_db(verbosity=0)
+    try:
+        owner = User.objects.create(username='bench-artist', email='bench-artist@example.com', role='artist')
+        artist = Artist.objects.create(user=owner, display_name='bench')
+        verse = "la la la, we sing along tonight\n"
+        lyrics = (verse * (args.lyrics_chars // len(verse) + 1))[:args.lyrics_chars]
+        Track.objects.bulk_create([
+            Track(artist=artist, title=f'Track {i}', genre='pop', duration=200 + i, audio_url=f'http://example.com/{i}.mp3',
+                  artwork_url=f'http://example.com/{i}.jpg', lyrics=lyrics, approval_status='approved',
+                  rejection_reason="Audio clipping in the chorus, please remaster." if i % 5 == 0 else None)
+            for i in range(args.items)
+        ])
+        listener = User.objects.create(username='bench-listener', email='bench-listener@example.com')
+        ListeningHistory.objects.bulk_create(
+            [ListeningHistory(user=listener, track=track) for track in Track.objects.all()]
+        )
+        renderer = JSONRenderer()
+        sparse = ['id', 'title', 'artist', 'audio_url']
+
+        def tracks(serializer_class, queryset, keep=None):
+            def build():
+                serializer = serializer_class(list(queryset[:args.items]), many=True)
+                if keep is not None:
+                    # As SparseFieldsetMixin trims the view's serializer
+                    for name in list(serializer.child.fields):
+                        if name not in keep:
+                            serializer.child.fields.pop(name)
+                return renderer.render(serializer.data)
+            return build
+
+        def history(serializer_class, only):
+            queryset = ListeningHistory.objects.select_related('track').order_by('-id')
+            if only:
+                queryset = queryset.only('listened_at', *(f'track__{name}' for name in only))
+            return lambda: renderer.render(serializer_class(list(queryset[:args.items]), many=True).data)
+
+        variants = [
+            ('tracks', 'full', tracks(TrackSerializer, Track.objects.order_by('-id'))),
+            ('tracks', 'compact', tracks(
+                TrackCompactSerializer, Track.objects.only(*TrackCompactSerializer.Meta.fields).order_by('-id'))),
+            ('tracks', 'sparse', tracks(
+                TrackSerializer, Track.objects.only(*sparse).order_by('-id'), keep=sparse)),
+            ('history', 'full', history(FullHistorySerializer, None)),
+            ('history', 'compact', history(ListeningHistorySerializer, TrackCompactSerializer.Meta.fields)),
+        ]
+        print(f"{args.items} items, {args.lyrics_chars}-character lyrics")
+        baseline = {}
+        for resource, name, build in variants:
+            size, p50 = measure(build, args.repeat)
+            base_size, base_p50 = baseline.setdefault(resource, (size, p50))
+            print(f"{resource:<8} {name:<8} {size / 1024:8.1f} KiB ({size / base_size:6.1%})  "
+                  f"p50 {p50:7.2f} ms ({p50 / base_p50:6.1%})")
+    finally:
+        connection.creation.destroy_test_db(database, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+benchmark_trending.py
+
+Cost of the trending scores at a given event rate. One simulated day of
+listens and likes is written in --interval batches; after each batch the
+incremental trending job runs, as Celery beat would run it.
+
+It reports the job's time per run and its throughput, the size of the
+trending table, and the latency of /api/v1/tracks/trending/ with a cold and a
+warm response cache. For comparison it also times the per-request query the
+endpoint replaces: counting the last day's listens per track.
+
+Everything runs in a throwaway test database (``test_<NAME>``) created from
+the configured settings, so a MySQL account needs CREATE DATABASE rights.
+
+Usage:
+    python scripts/benchmark_trending.py
+    python scripts/benchmark_trending.py --events-per-day 1000000 --tracks 50000
+    DJANGO_SETTINGS_MODULE=backend.settings_local python scripts/benchmark_trending.py --hours 2
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def percentiles(samples):
+    return np.percentile(np.array(samples) * 1000, [50, 95, 99])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trending job and endpoint.")
+    parser.add_argument('--events-per-day', type=int, default=1_000_000, help="Listens and likes per day")
+    parser.add_argument('--hours', type=float, default=24.0, help="Simulated hours of traffic")
+    parser.add_argument('--interval', type=int, default=300, help="Seconds between job runs")
+    parser.add_argument('--tracks', type=int, default=50_000, help="Approved tracks in the catalogue")
+    parser.add_argument('--users', type=int, default=5_000, help="Listeners")
+    parser.add_argument('--like-ratio', type=float, default=0.1, help="Share of events that are likes")
+    parser.add_argument('--requests', type=int, default=200, help="Endpoint requests per measurement")
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.db.models import Count
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.utils import timezone
+
+    from music.models import Interaction, ListeningHistory, Track, TrackFeature, TrackTrending
+    from music.trending import update_trending
+    from users.models import Artist, User
+
+    setup_test_environment()
+    database = connection.creation.create_test_db(verbosity=0)
+    try:
+        rng = np.random.default_rng(0)
+        owner = User.objects.create(username='bench-artist', email='bench-artist@example.com', role='artist')
+        artist = Artist.objects.create(user=owner, display_name='bench')
+        genres = ['pop', 'rock', 'jazz', 'hip-hop', 'electronic', 'classical', 'folk', 'metal']
+        moods = [mood for mood, _ in TrackFeature.MOOD_CHOICES]
+        Track.objects.bulk_create(
+            [
+                Track(artist=artist, title=f't{i}', audio_url='http://example.com/a.mp3',
+                      genre=genres[i % len(genres)], approval_status='approved')
+                for i in range(args.tracks)
+            ],
+            batch_size=5000,
+        )
+        track_ids = np.array(Track.objects.order_by('id').values_list('id', flat=True))
+        TrackFeature.objects.bulk_create(
+            [
+                TrackFeature(track_id=int(track_id), danceability=0.5, energy=0.5, valence=0.5, tempo=120.0,
+                             speechiness=0.1, instrumentalness=0.1, acousticness=0.1, liveness=0.1,
+                             mood=moods[i % len(moods)])
+                for i, track_id in enumerate(track_ids)
+            ],
+            batch_size=5000,
+        )
+        User.objects.bulk_create(
+            [User(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(args.users)],
+            batch_size=5000,
+        )
+        user_ids = np.array(User.objects.filter(role='listener').values_list('id', flat=True))
+
+        # Popularity follows a power law, and shifts every few hours
+        weights = 1.0 / np.arange(1, len(track_ids) + 1) ** 1.1
+        weights /= weights.sum()
+        settings.TRENDING_LAG_SECONDS = 0
+
+        per_run = int(args.events_per_day * args.interval / 86400)
+        runs = int(args.hours * 3600 / args.interval)
+        print(f"{args.events_per_day} events/day: {runs} runs of {per_run} events over {args.tracks} tracks")
+        update_trending()
+        job_times, write_times = [], []
+        for run in range(runs):
+            if run % max(1, 3 * 3600 // args.interval) == 0:
+                popularity = rng.permutation(track_ids)
+            tracks = popularity[rng.choice(len(track_ids), size=per_run, p=weights)]
+            users = rng.choice(user_ids, size=per_run)
+            likes = rng.random(per_run) < args.like_ratio
+
+            start = time.perf_counter()
+            ListeningHistory.objects.bulk_create(
+                [ListeningHistory(user_id=int(u), track_id=int(t)) for u, t in zip(users[~likes], tracks[~likes])],
+                batch_size=5000,
+            )
+            Interaction.objects.bulk_create(
+                [Interaction(user_id=int(u), track_id=int(t), interaction_type='like')
+                 for u, t in zip(users[likes], tracks[likes])],
+                batch_size=5000,
+            )
+            write_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            update_trending()
+            job_times.append(time.perf_counter() - start)
+
+        p50, p95, p99 = percentiles(job_times)
+        total = sum(job_times)
+        print(f"job       p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  "
+              f"({per_run * runs / total if total else 0.0:.0f} events/sec, "
+              f"{total / (args.hours * 3600):.3%} of wall time)")
+        print(f"writes    {sum(write_times):.1f}s for {per_run * runs} events (not part of the job)")
+        print(f"table     {TrackTrending.objects.count()} rows")
+
+        client = Client()
+        for label, query in [('all', ''), ('genre', '?genre=rock'), ('mood', '?mood=calm')]:
+            for cold in (True, False):
+                latencies = []
+                for _ in range(args.requests):
+                    if cold:
+                        cache.clear()
+                    start = time.perf_counter()
+                    response = client.get(f'/api/v1/tracks/trending/{query}')
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.status_code
+                p50, p95, _ = percentiles(latencies)
+                print(f"endpoint  {label:<6} {'cold' if cold else 'warm':<5} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+
+        since = timezone.now() - timedelta(days=1)
+        latencies = []
+        for _ in range(max(1, args.requests // 20)):
+            start = time.perf_counter()
+            list(
+                ListeningHistory.objects.filter(listened_at__gte=since).order_by()
+                .values('track_id').annotate(plays=Count('id')).order_by('-plays')[:20]
+            )
+            latencies.append(time.perf_counter() - start)
+        p50, p95, _ = percentiles(latencies)
+        print(f"scan      last day's listens per request  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms")
+    finally:
+        connection.creation.destroy_test_db(database, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,74 +2,88 @@
 """
 extract_features.py
 
-Standalone script to extract audio features using librosa.
+Command-line front end to the feature extraction engine in
+music/utils/feature_extraction.py, the same code the Celery task runs.
+
+Without --features it prints the TrackFeature values (including mood) the
+task would store. With --features it prints the named features only, and
+only the representations those features need are computed.
+
 Usage:
-    python extract_features.py /path/to/audio/file.mp3
+    python scripts/extract_features.py /path/to/audio/file.mp3
+    python scripts/extract_features.py --features tempo,chroma a.mp3 b.wav
+    python scripts/extract_features.py --stream /path/to/long/mix.wav
+    python scripts/extract_features.py --list
 """
 
 import argparse
 import json
 import os
+import sys
 
-import librosa
 import numpy as np
 
-def extract_features(file_path):
-    """
-    Extract audio features from a given file path.
-
-    Returns a dictionary with:
-      - tempo (BPM)
-      - energy (RMS)
-      - zero_crossing_rate
-      - spectral_centroid
-      - spectral_rolloff
-      - chroma_stft mean values
-    """
-    # Load audio
-    y, sr = librosa.load(file_path, sr=None)
-
-    # Tempo (BPM)
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-
-    # Energy (RMS)
-    energy = float(np.mean(librosa.feature.rms(y=y)))
-
-    # Zero Crossing Rate
-    zcr = float(np.mean(librosa.feature.zero_crossing_rate(y)))
-
-    # Spectral Centroid
-    spectral_centroid = float(np.mean(librosa.feature.spectral_centroid(y=y, sr=sr)))
-
-    # Spectral Rolloff
-    spectral_rolloff = float(np.mean(librosa.feature.spectral_rolloff(y=y, sr=sr)))
-
-    # Chroma STFT
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-    chroma_mean = [float(np.mean(chroma[i])) for i in range(chroma.shape[0])]
-
-    features = {
-        'tempo': tempo,
-        'energy': energy,
-        'zero_crossing_rate': zcr,
-        'spectral_centroid': spectral_centroid,
-        'spectral_rolloff': spectral_rolloff,
-        'chroma_mean': chroma_mean,
-    }
-    return features
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music.utils.feature_extraction import (  # noqa: E402
+    FEATURES,
+    extract,
+    extract_features,
+    extract_features_fast,
+)
+from music.utils.feature_vectors import unpack  # noqa: E402
+
+
+def to_json(value):
+    if isinstance(value, bytes):
+        # The packed TrackFeature.vector
+        return unpack(value).tolist()
+    return value.tolist() if isinstance(value, np.ndarray) else value
+
 
 def main():
-    parser = argparse.ArgumentParser(description="Extract audio features from a file.")
-    parser.add_argument('file_path', type=str, help="Path to the audio file")
+    parser = argparse.ArgumentParser(description="Extract audio features from one or more files.")
+    parser.add_argument('files', nargs='*', help="Paths to audio files")
+    parser.add_argument('--features', default=None,
+                        help="Comma-separated feature names (default: the TrackFeature values)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Analyse each file block by block in constant memory")
+    parser.add_argument('--fast', action='store_true',
+                        help="Analyse a bounded excerpt at the fast-mode rate")
+    parser.add_argument('--list', action='store_true', help="List the available features and exit")
     args = parser.parse_args()
-    file_path = args.file_path
 
-    if not os.path.isfile(file_path):
-        print(f"Error: file '{file_path}' does not exist.")
+    if args.list:
+        for name, registered in FEATURES.items():
+            print(f"{name:<20} needs {', '.join(registered.requires)}")
         return
+    if not args.files:
+        parser.error("no audio files given")
+
+    names = args.features.split(',') if args.features else None
+    if names:
+        unknown = [name for name in names if name not in FEATURES]
+        if unknown:
+            parser.error(f"unknown features: {', '.join(unknown)} (see --list)")
+
+    results = {}
+    for file_path in args.files:
+        if not os.path.isfile(file_path):
+            print(f"Error: file '{file_path}' does not exist.", file=sys.stderr)
+            continue
+        fast = {} if args.fast else None
+        if names:
+            values = extract(file_path, names, stream=args.stream, fast=fast)
+        elif args.fast:
+            values = extract_features_fast(file_path)
+        else:
+            values = extract_features(file_path, stream=args.stream)
+        results[file_path] = {name: to_json(value) for name, value in values.items()}
+
+    if len(args.files) == 1:
+        results = next(iter(results.values()), {})
+    print(json.dumps(results, indent=2))
 
-    features = extract_features(file_path)
-    print(json.dumps(features, indent=2))
 
 if __name__ == "__main__":
     main()
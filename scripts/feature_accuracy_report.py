@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+feature_accuracy_report.py
+
+Compare fast-mode TrackFeature values and mood labels against a full
+analysis over a corpus of audio files.
+
+For every numeric field the report shows the mean and worst absolute error
+and the mean relative error; for moods it shows the agreement rate and the
+label pairs that disagree. Timings give the speed-up fast mode buys.
+
+Usage:
+    python scripts/feature_accuracy_report.py /path/to/corpus
+    python scripts/feature_accuracy_report.py --windows 3 --excerpt 45 a.mp3 b.wav
+"""
+
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music.utils.feature_extraction import (  # noqa: E402
+    FAST_EXCERPT_SECONDS,
+    FAST_SAMPLE_RATE,
+    extract_features,
+    extract_features_fast,
+)
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg', '.m4a', '.aiff')
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(
+                    os.path.join(root, name) for name in sorted(names)
+                    if name.lower().endswith(AUDIO_EXTENSIONS)
+                )
+        else:
+            files.append(path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy of fast-mode feature extraction.")
+    parser.add_argument('paths', nargs='+', help="Audio files or directories")
+    parser.add_argument('--sr', type=int, default=FAST_SAMPLE_RATE, help="Fast-mode analysis rate")
+    parser.add_argument('--excerpt', type=float, default=FAST_EXCERPT_SECONDS,
+                        help="Seconds of audio analysed in fast mode")
+    parser.add_argument('--windows', type=int, default=1, help="Number of evenly spaced windows")
+    parser.add_argument('--start', type=float, default=0.0,
+                        help="Excerpt start in seconds (stands in for Track.demo_start_time)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print("No audio files found.")
+        return
+
+    errors = collections.defaultdict(list)
+    mood_pairs = collections.Counter()
+    full_seconds = fast_seconds = 0.0
+
+    for file_path in files:
+        start = time.perf_counter()
+        full = extract_features(file_path)
+        full_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = extract_features_fast(
+            file_path, start=args.start, sr=args.sr,
+            excerpt_seconds=args.excerpt, windows=args.windows,
+        )
+        fast_seconds += time.perf_counter() - start
+
+        for field, value in full.items():
+            if field != 'mood':
+                errors[field].append((abs(fast[field] - value), abs(value)))
+        mood_pairs[(full['mood'], fast['mood'])] += 1
+
+    fields = {}
+    for field, pairs in errors.items():
+        absolute = [error for error, _ in pairs]
+        relative = [error / reference for error, reference in pairs if reference]
+        fields[field] = {
+            'mean_abs_error': sum(absolute) / len(absolute),
+            'max_abs_error': max(absolute),
+            'mean_rel_error': sum(relative) / len(relative) if relative else 0.0,
+        }
+    agreeing = sum(count for (full_mood, fast_mood), count in mood_pairs.items() if full_mood == fast_mood)
+    report = {
+        'tracks': len(files),
+        'settings': {'sr': args.sr, 'excerpt': args.excerpt, 'windows': args.windows, 'start': args.start},
+        'full_seconds': full_seconds,
+        'fast_seconds': fast_seconds,
+        'speedup': full_seconds / fast_seconds if fast_seconds else 0.0,
+        'fields': fields,
+        'mood_agreement': agreeing / len(files),
+        'mood_mismatches': {
+            f"{full_mood} -> {fast_mood}": count
+            for (full_mood, fast_mood), count in mood_pairs.most_common()
+            if full_mood != fast_mood
+        },
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Tracks: {report['tracks']}  settings: {report['settings']}")
+    print(f"Full: {full_seconds:.1f}s  fast: {fast_seconds:.1f}s  speed-up: {report['speedup']:.1f}x\n")
+    print(f"{'field':<18}{'mean abs':>12}{'max abs':>12}{'mean rel':>10}")
+    for field, stats in fields.items():
+        print(
+            f"{field:<18}{stats['mean_abs_error']:>12.4f}{stats['max_abs_error']:>12.4f}"
+            f"{stats['mean_rel_error']:>9.1%}"
+        )
+    print(f"\nMood agreement: {report['mood_agreement']:.1%}")
+    for pair, count in report['mood_mismatches'].items():
+        print(f"  {pair}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+load_test_listening.py
+
+Play-logging latency of POST /api/v1/listening-history/ in both listening
+history modes: 'sync' (one INSERT per request) and 'buffered' (a Redis
+append per request, written by the consumer in batches).
+
+--threads clients send --requests plays each, through the full Django/DRF
+stack in-process. For each mode it reports request latency percentiles and
+throughput. For buffered mode it also reports how long the consumer takes
+to write the backlog, and checks that every play landed exactly once.
+
+Everything runs in a throwaway test database (``test_<NAME>``). Buffered
+mode needs a Redis server; point --redis-url at a scratch database, since
+the buffer keys are cleared first. Drain tasks that enqueue() would send
+go to an in-memory broker.
+
+Usage:
+    python scripts/load_test_listening.py
+    python scripts/load_test_listening.py --threads 16 --requests 500 --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def run_clients(users, track_ids, requests, barrier_timeout=60):
+    """
+    One thread per user, each posting ``requests`` plays. Returns the
+    latencies of every request and the wall time of the whole run.
+    """
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    latencies = [[] for _ in users]
+    errors = []
+    barrier = threading.Barrier(len(users) + 1, timeout=barrier_timeout)
+
+    def client_thread(slot, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        rng = np.random.default_rng(slot)
+        barrier.wait()
+        try:
+            for track_id in rng.choice(track_ids, size=requests):
+                start = time.perf_counter()
+                try:
+                    response = client.post('/api/v1/listening-history/', {'track_id': int(track_id)}, format='json')
+                except Exception as exc:
+                    errors.append(repr(exc))
+                    continue
+                latencies[slot].append(time.perf_counter() - start)
+                if response.status_code not in (201, 202):
+                    errors.append(f"HTTP {response.status_code}")
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client_thread, args=(slot, user)) for slot, user in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise SystemExit(f"{len(errors)} failed requests, e.g. {errors[0]}")
+    return np.concatenate([np.array(samples) for samples in latencies]), time.perf_counter() - start
+
+
+def report(mode, latencies, elapsed):
+    p50, p95, p99 = np.percentile(latencies * 1000, [50, 95, 99])
+    print(f"{mode:<9} p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  p99 {p99:7.2f} ms  "
+          f"{len(latencies) / elapsed:8.0f} plays/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test sync vs buffered listening history writes.")
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=250, help="Plays per client")
+    parser.add_argument('--tracks', type=int, default=1000, help="Tracks to play")
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15',
+                        help="Scratch Redis database for the buffer (its buffer keys are cleared)")
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+
+    import redis
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    from backend.celery import app
+    from music import play_buffer
+    from music.models import ListeningHistory, Track
+    from users.models import Artist, User
+
+    app.conf.broker_url = 'memory://'
+    setup_test_environment()
+    database = connection.creation.create_test_db(verbosity=0)
+    try:
+        owner = User.objects.create(username='load-artist', email='load-artist@example.com', role='artist')
+        artist = Artist.objects.create(user=owner, display_name='load')
+        Track.objects.bulk_create(
+            [Track(artist=artist, title=f't{i}', audio_url='http://example.com/a.mp3', approval_status='approved')
+             for i in range(args.tracks)],
+            batch_size=5000,
+        )
+        track_ids = np.array(Track.objects.values_list('id', flat=True))
+        User.objects.bulk_create([User(username=f'load{i}', email=f'load{i}@example.com') for i in range(args.threads)])
+        users = list(User.objects.filter(role='listener').order_by('id'))
+        total = args.threads * args.requests
+        print(f"{args.threads} clients x {args.requests} plays")
+
+        settings.LISTENING_HISTORY_MODE = 'sync'
+        latencies, elapsed = run_clients(users, track_ids, args.requests)
+        report('sync', latencies, elapsed)
+        assert ListeningHistory.objects.count() == total
+        ListeningHistory.objects.all().delete()
+
+        settings.LISTENING_HISTORY_MODE = 'buffered'
+        settings.LISTEN_BUFFER_URL = args.redis_url
+        try:
+            client, _ = play_buffer._redis()
+            client.ping()
+        except redis.RedisError as exc:
+            print(f"buffered  skipped: Redis unavailable at {args.redis_url} ({exc})")
+            return
+        client.delete(play_buffer.BUFFER_KEY, play_buffer.PROCESSING_KEY, play_buffer.LOCK_KEY)
+
+        latencies, elapsed = run_clients(users, track_ids, args.requests)
+        report('buffered', latencies, elapsed)
+        print(f"{'':<9} backlog {play_buffer.backlog()} plays, {ListeningHistory.objects.count()} written so far")
+
+        start = time.perf_counter()
+        written = play_buffer.drain()
+        drained = time.perf_counter() - start
+        print(f"{'':<9} drain   {written} plays in {drained:.2f}s ({written / drained if drained else 0.0:.0f} rows/sec)")
+        stored = ListeningHistory.objects.count()
+        print(f"{'':<9} stored  {stored} of {total} plays"
+              f" ({'ok' if stored == total else 'MISMATCH'})")
+    finally:
+        connection.creation.destroy_test_db(database, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
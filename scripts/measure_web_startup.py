@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+measure_web_startup.py
+
+Measure what a web (gunicorn) process pays at startup: wall time to set up
+Django and load the URLconf, peak resident memory, and whether any of the
+heavy audio-analysis modules were imported.
+
+Each measurement runs in a fresh interpreter. ``--with-audio`` additionally
+imports the feature extractor to show the cost the web process avoids.
+
+Usage:
+    python scripts/measure_web_startup.py [--runs 5] [--with-audio]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['librosa', 'numba', 'llvmlite', 'scipy', 'sklearn', 'soundfile']
+
+PROBE = """
+import json, os, resource, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.conf import settings
+__import__(settings.ROOT_URLCONF)
+if {with_audio}:
+    import music.utils.feature_extraction
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform != 'darwin':
+    rss *= 1024  # Linux reports kilobytes
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_bytes': rss,
+    'heavy_modules': [name for name in {heavy} if name in sys.modules],
+}}))
+"""
+
+
+def probe(with_audio):
+    code = PROBE.format(with_audio=with_audio, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=BASE_DIR, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure web process startup time and RSS.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument('--with-audio', action='store_true',
+                        help="Also measure a process that imports the feature extractor")
+    args = parser.parse_args()
+
+    variants = [('web process', False)]
+    if args.with_audio:
+        variants.append(('web + feature extractor', True))
+
+    for label, with_audio in variants:
+        results = [probe(with_audio) for _ in range(args.runs)]
+        seconds = statistics.median(result['seconds'] for result in results)
+        rss = statistics.median(result['rss_bytes'] for result in results)
+        heavy = results[-1]['heavy_modules']
+        print(f"{label:<26} startup {seconds:6.3f}s   peak RSS {rss / 2**20:7.1f} MB   "
+              f"heavy modules: {', '.join(heavy) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
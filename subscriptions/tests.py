@@ -1,3 +1,28 @@
-from django.test import TestCase
+from backend.testing import QueryBudgetTestCase
+from music.tests import make_artist
+from subscriptions.models import Subscription, SubscriptionPlan
 
-# Create your tests here.
+
+# ----------------------------
+# Query budgets: one query per page, not per row
+# ----------------------------
+class SubscriptionQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_subscription_plans(self):
+        def add(n):
+            start = SubscriptionPlan.objects.count()
+            SubscriptionPlan.objects.bulk_create([
+                SubscriptionPlan(name=f'Plan {start + i}', max_upload_rate=4, price=0) for i in range(n)
+            ])
+        self.assertQueryBudget('/api/v1/subscription-plans/', 2, add)
+
+    def test_subscription(self):
+        # An artist has a single subscription, shown with its plan
+        artist = make_artist()
+        plan = SubscriptionPlan.objects.create(name='Free', max_upload_rate=4, price=0)
+        Subscription.objects.create(artist=artist, plan=plan)
+        self.client.force_authenticate(artist.user)
+        response, queries = self.count_queries('/api/v1/subscriptions/')
+        self.assertEqual(response.data['results'][0]['plan']['name'], 'Free')
+        # The artist profile, then the page count and page
+        self.assertLessEqual(queries, 3)
@@ -27,7 +27,7 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         # Only return the subscription belonging to this user’s artist profile
         user = self.request.user
         if hasattr(user, 'artist'):
-            return Subscription.objects.filter(artist=user.artist)
+            return Subscription.objects.filter(artist=user.artist).select_related('plan')
         return Subscription.objects.none()
 
     def perform_create(self, serializer):
@@ -1,3 +1,30 @@
-from django.test import TestCase
+from django.contrib.auth.models import Group
 
-# Create your tests here.
+from backend.testing import QueryBudgetTestCase
+from music.tests import make_artist, make_user
+
+
+# ----------------------------
+# Query budgets: one query per page, not per row
+# ----------------------------
+class UserQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_users(self):
+        group = Group.objects.create(name='Listener')
+        def add(n):
+            for _ in range(n):
+                make_user().groups.add(group)
+        # Page count and page, plus the groups and permissions prefetches
+        self.assertQueryBudget('/api/v1/users/users/', 4, add)
+
+    def test_artists(self):
+        self.client.force_authenticate(make_user(role='moderator'))
+        self.assertQueryBudget('/api/v1/users/artists/', 2, lambda n: [make_artist() for _ in range(n)])
+
+    def test_follows(self):
+        moderator = make_user(role='moderator')
+        self.client.force_authenticate(moderator)
+        self.assertQueryBudget(
+            '/api/v1/users/follows/', 2,
+            lambda n: [moderator.followers.create(follower=make_user()) for _ in range(n)],
+        )
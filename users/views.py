@@ -31,7 +31,8 @@ logger = logging.getLogger('users')
 # User CRUD (Used by admin / profile screen)
 # ----------------------------
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    # The serializer lists every user's groups and permissions
+    queryset = User.objects.prefetch_related('groups', 'user_permissions')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
@@ -92,7 +93,7 @@ class LoginView(generics.GenericAPIView):
 # View All Artists (moderator/admin only)
 # ----------------------------
 class ArtistViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Artist.objects.all()
+    queryset = Artist.objects.select_related('user')
     serializer_class = ArtistSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]